@@ -1,26 +1,31 @@
 import sounddevice as sd
 import soundfile as sf
 import os
-import time
+import sys
 import datetime
 import logging
 import threading
 import keyboard  # pip install keyboard
-import numpy as np
+if not __package__:
+    # Run as a script (python dependencies/audio_module.py): make the dependencies package importable
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dependencies.capture_backend_module import SoundDeviceBackend
+from dependencies.ring_buffer_module import AudioRing
 
 
 # Configuration
 SAMPLE_RATE = 44100
-CHUNK_DURATION = 5  # seconds
-NUM_CHUNKS_TO_KEEP = 5
+BUFFER_DURATION = 25  # seconds of audio kept
+BLOCK_SIZE = 1024  # samples per stream callback
 RECORD_DIR = "aMRec"
 LOG_DIR = "amLog"
 HOTKEY = 'ctrl+shift+space'
 
 # Global variables
-recording_active = True  # controls the recording thread
-audio_data_chunks = []   # Stores the raw audio data of recent chunks
-chunk_index = 0
+audio_ring = AudioRing(SAMPLE_RATE * BUFFER_DURATION)  # The most recent audio, written by the stream callback
+ring_lock = threading.Lock()  # Held only while the callback writes or a snapshot is taken
+stream_stats = {"blocks": 0, "overflows": 0, "callback_errors": 0}
+audio_backend = None  # The running input stream
 device_index = None
 
 def setup_logging():
@@ -63,71 +68,89 @@ def select_input_device():
         logging.warning("Invalid input (not a number).")
         return None
 
-def record_audio_chunk(device_index):
-    """Records audio for a single chunk."""
-    logging.info(f"Recording audio chunk for {CHUNK_DURATION} seconds.")
+def store_block(samples, latency, overflow, underflow):
+    """
+    Stream callback: copies one block of samples into the ring. Runs on the audio
+    driver's thread, so it never raises; an exception would stop the stream.
+    """
     try:
-        audio_data = sd.rec(int(SAMPLE_RATE * CHUNK_DURATION), samplerate=SAMPLE_RATE, channels=1, dtype='int16', device=device_index)
-        sd.wait()  # Wait until recording is finished
-        logging.info("Finished recording audio chunk.")
-        return audio_data
+        with ring_lock:
+            audio_ring.write(samples)
+            stream_stats["blocks"] += 1
+            if overflow:
+                stream_stats["overflows"] += 1  # The driver dropped input, the ring has a gap here
+    except Exception:
+        stream_stats["callback_errors"] += 1
+
+
+def start_recording(device_index, backend=None):
+    """
+    Starts a continuous input stream feeding the ring. The stream runs until
+    stop_recording(), so there are no gaps between blocks.
+
+    Args:
+        device_index (int): sounddevice input device.
+        backend (optional): Audio backend to record from instead, e.g. a
+            SyntheticAudioBackend (see capture_backend_module).
+
+    Returns:
+        bool: True if the stream started.
+    """
+    global audio_backend
+    try:
+        audio_backend = backend or SoundDeviceBackend(device=device_index)
+        audio_backend.start(SAMPLE_RATE, BLOCK_SIZE, store_block)
+        logging.info(f"Recording from device {device_index} into a {BUFFER_DURATION} s ring.")
+        return True
     except Exception as e:
-        logging.error(f"Error during recording: {e}")
-        return None
-
-def combine_audio_chunks(audio_data_chunks, output_filename):
-    """Combines multiple audio chunks into a single file."""
-    if not audio_data_chunks:
-         logging.warning("No audio to combine.")
+        logging.error(f"Error starting the audio stream: {e}")
+        audio_backend = None
+        return False
+
+
+def stop_recording():
+    """Stops the input stream."""
+    global audio_backend
+    if audio_backend is not None:
+        audio_backend.stop()
+        audio_backend = None
+        logging.info(f"Recording stopped. {stream_stats['blocks']} blocks, "
+                     f"{stream_stats['overflows']} input overflows, {stream_stats['callback_errors']} callback errors.")
+
+
+def snapshot_audio():
+    """
+    Returns a copy of the buffered audio, oldest sample first. The lock is only held
+    to record the ring position; the copy runs while the stream keeps writing.
+
+    Returns:
+        np.ndarray: (samples, 1) int16 array.
+    """
+    with ring_lock:
+        snapshot = audio_ring.snapshot()
+    return snapshot.to_array()
+
+
+def save_audio_snapshot(output_filename):
+    """Writes the buffered audio to a file without interrupting the recording."""
+    audio_data = snapshot_audio()
+    if not len(audio_data):
+         logging.warning("No audio to save.")
          return False
     try:
-        # concatenate all the audio data
-        combined_data = np.concatenate(audio_data_chunks, axis=0)
-        sf.write(output_filename, combined_data, SAMPLE_RATE)
-        logging.info(f"Combined audio saved to: {output_filename}")
+        sf.write(output_filename, audio_data, SAMPLE_RATE)
+        logging.info(f"Saved {len(audio_data) / SAMPLE_RATE:.1f} s of audio to: {output_filename}")
         return True
     except Exception as e:
-         logging.error(f"Error combining audio chunks: {e}")
+         logging.error(f"Error saving audio: {e}")
          return False
 
 
-def recording_thread():
-    """Thread that continuously records audio chunks."""
-    global recording_active, audio_data_chunks, chunk_index, device_index
-    while recording_active:
-        audio_data = record_audio_chunk(device_index)
-        if audio_data is not None:
-            audio_data_chunks.append(audio_data)
-            if len(audio_data_chunks) > NUM_CHUNKS_TO_KEEP:
-                 audio_data_chunks.pop(0)  # remove the oldest
-
-            chunk_index += 1
-
-
-
 def hotkey_callback():
     """Callback function for the hotkey."""
-    global recording_active, audio_data_chunks
-    logging.info("Hotkey pressed: combining audio chunks")
-    recording_active = False  # Stop the recording thread
-    time.sleep(0.5) # allow the recording thread to stop
-
+    logging.info("Hotkey pressed: saving the buffered audio")
     output_filename = os.path.join(RECORD_DIR, f"combined_audio_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.wav")
-    combine_audio_chunks(audio_data_chunks, output_filename)
-
-    audio_data_chunks = [] #clear the stored chunk files
-
-    recording_active = True  # Restart the recording thread
-    start_recording_thread()
-
-
-def start_recording_thread():
-     """Starts the recording thread"""
-     global recording_active
-     recording_active = True
-     thread = threading.Thread(target=recording_thread)
-     thread.daemon = True  # Allow the main thread to exit without waiting
-     thread.start()
+    save_audio_snapshot(output_filename)
 
 
 def main():
@@ -136,13 +159,14 @@ def main():
     if not os.path.exists(RECORD_DIR):
         os.makedirs(RECORD_DIR)
     
-    global recording_active, device_index
+    global device_index
     device_index = select_input_device()
     if device_index is None:
         logging.error("No input device selected. Exiting.")
         return
 
-    start_recording_thread()
+    if not start_recording(device_index):
+        return
 
     keyboard.add_hotkey(HOTKEY, hotkey_callback)
     logging.info(f"Listening for hotkey: {HOTKEY}")
@@ -150,7 +174,8 @@ def main():
         keyboard.wait()  # Keep the main thread alive until we receive a hotkey combo.
     except KeyboardInterrupt:
         logging.info("Program interrupted by user.  Stopping recording.")
-        recording_active = False
+    finally:
+        stop_recording()
 
     logging.info("Program finished.")
 
@@ -5,11 +5,11 @@ import logging
 import sys
 import threading
 import time
-from moviepy.audio.AudioClip import AudioClip
 import moviepy.audio.tools.cuts as cuts
 import cv2  # Import OpenCV
 import mss  # Import MSS for screen capture
 import mss.tools # Needed to use the to_png method
+from dependencies.encoder_module import StreamingEncoder
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -26,53 +26,6 @@ global selected_input_device
 selected_input_device = None
 
 
-class AudioArrayClip(AudioClip):
-    """
-    A custom Audio Clip that can read raw audio data from a Numpy array.
-    """
-    def __init__(self, arr, fps):
-        """
-        Args:
-            arr (np.ndarray): Raw audio data of shape (n_frames, n_channels).
-            fps (int): Number of frames per second.
-        """
-        if len(arr.shape) != 2:
-            raise ValueError(f"Audio array must have 2 dimensions (n_frames, n_channels), but has {len(arr.shape)} dimensions.")
-        if arr.shape[1] <= 0:
-            raise ValueError(f"Number of channels must be greater than 0, but it was {arr.shape[1]}")
-        
-        self.arr = arr
-        self.fps = fps
-        duration = len(self.arr) / fps
-
-        AudioClip.__init__(self) # Call parent __init__ method.
-        self.duration = duration # Set duration.
-        self.nchannels = arr.shape[1] # Set number of channels.
-
-    def make_frame(self, t):
-        """
-        Returns the frame corresponding to time t (in seconds).
-        """
-        if isinstance(t, np.ndarray):
-            frame = []
-            for time_val in t:
-                time_val = float(time_val)  # Ensure time_val is treated as a single float
-                if time_val > self.duration or time_val < 0:
-                    frame_val = np.zeros(self.nchannels).tolist() # Return silence
-                else:
-                    i = int(time_val * self.fps)
-                    frame_val = self.arr[i].tolist()
-                frame.append(frame_val)
-            return frame
-        else:
-            t = float(t)  # Ensure 't' is treated as a single float
-            if t > self.duration or t < 0:
-                return np.zeros(self.nchannels).tolist() # Return silence
-            else:
-                i = int(t * self.fps)
-                return self.arr[i].tolist()
-
-
 def get_available_devices():
     """
     Returns a list of available audio input devices.
@@ -181,29 +134,17 @@ def convert_rolling_buffer(buffer):
         video_frame = first_frame[1]
         height, width, _ = video_frame.shape
 
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')  # Define codec
-        out = cv2.VideoWriter(output_filename, fourcc, frame_rate, (width, height))  # Create writer
-
-        all_audio = []
-        # Write video and save audio
-        for frame_pair in buffer:
-            audio_frame, video_frame = frame_pair
-            if video_frame is not None:
-                out.write(video_frame)
-            if audio_frame is not None:
-                all_audio.append(audio_frame)
-        out.release()  # Release writer
-
+        all_audio = [audio_frame for audio_frame, _ in buffer if audio_frame is not None]
         # Ensure audio is not empty
         if not all_audio:
             raise ValueError("Audio buffer is empty. Cannot add to video file.")
         audio = np.concatenate(all_audio, axis=0)  # Combine audio frames
+        audio = (np.clip(audio, -1, 1) * 32767).astype(np.int16)  # sd.rec() records float32
 
-        # Save audio to an audio clip, and then to the video file
-        audio_clip = AudioArrayClip(audio, fps=sample_rate)
-        video_clip = VideoFileClip(output_filename)
-        video_clip = video_clip.set_audio(audio_clip)
-        video_clip.write_videofile(output_filename, codec='libx264', audio_codec='aac')  # Writes to the output file.
+        # Pipe the frames and audio through a single ffmpeg pass, instead of writing an mp4v
+        # file and re-encoding it with moviepy to add the audio
+        encoder = StreamingEncoder(width, height, frame_rate, audio_rate=sample_rate, audio_channels=audio.shape[1])
+        encoder.encode((video_frame for _, video_frame in buffer if video_frame is not None), output_filename, audio)
 
         return output_filename
     except Exception as e:
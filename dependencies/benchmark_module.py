@@ -0,0 +1,364 @@
+# benchmark_module.py
+"""
+Benchmarks the capture -> buffer -> dump path with synthetic sources.
+
+Usage:
+    python -m dependencies.benchmark_module --resolutions 1280x720,1920x1080 --frame-rates 5,30 \
+        --output results.json --baseline baseline.json
+    python -m dependencies.benchmark_module --audio-clip
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import numpy as np
+try:
+    import resource  # Not available on Windows
+except ImportError:
+    resource = None
+from dependencies.capture_backend_module import SyntheticAudioBackend, SyntheticVideoBackend
+from dependencies.media_converter import AudioArrayClip
+from dependencies.recording_module import RollingVideoBuffer
+
+DEFAULT_RESOLUTIONS = [(640, 360), (1280, 720)]
+DEFAULT_FRAME_RATES = [5, 15]
+DEFAULT_BUFFER_SECONDS = [10, 30]
+
+# Metrics compared against a baseline: 1 if higher is better, -1 if lower is better
+COMPARED_METRICS = {
+    "achieved_fps": 1,
+    "append_p50_ms": -1,
+    "append_p99_ms": -1,
+    "lock_hold_p99_ms": -1,
+    "cpu_ms_per_frame": -1,
+    "peak_traced_mb": -1,
+    "dump_ms": -1,
+}
+
+
+class TimedLock:
+    """A lock that records how long it is held each time it is released."""
+    def __init__(self, lock=None):
+        self._lock = lock or threading.Lock()
+        self._acquired_at = None
+        self.hold_times = []
+
+    def acquire(self, blocking=True, timeout=-1):
+        acquired = self._lock.acquire(blocking, timeout)
+        if acquired:
+            self._acquired_at = time.perf_counter()
+        return acquired
+
+    def release(self):
+        self.hold_times.append(time.perf_counter() - self._acquired_at)
+        self._lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class _TimedVideoBackend:
+    # Wraps a video backend so the time from the end of each grab to its commit can be measured
+    def __init__(self, backend):
+        self.backend = backend
+        self.grab_end = None
+        self.append_latencies = []
+
+    def open(self, source):
+        grabber = self.backend.open(source)
+        probe = self
+
+        class TimedGrabber:
+            size = grabber.size
+
+            def grab(self):
+                frame = grabber.grab()
+                probe.grab_end = time.perf_counter()
+                return frame
+
+            def close(self):
+                grabber.close()
+
+        ring = source.video_buffer
+        for name in ("commit", "commit_duplicate"):
+            ring.__dict__[name] = self._timed_commit(getattr(ring, name))
+        return TimedGrabber()
+
+    def _timed_commit(self, commit):
+        def timed(timestamp):
+            commit(timestamp)
+            self.append_latencies.append(time.perf_counter() - self.grab_end)
+        return timed
+
+
+def _percentile_ms(values, q):
+    return float(np.percentile(values, q) * 1000) if values else 0.0
+
+
+def _max_rss_mb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 / 1024 if sys.platform == "darwin" else rss / 1024  # Bytes on macOS, KiB elsewhere
+
+
+def run_case(width, height, frame_rate, buffer_seconds, run_seconds=3.0, storage="raw", motion=8, noise=0.0,
+             **buffer_options):
+    """
+    Captures synthetic frames and audio into a RollingVideoBuffer for a while, then dumps it.
+
+    Args:
+        width (int): Frame width.
+        height (int): Frame height.
+        frame_rate (float): Capture frame rate.
+        buffer_seconds (float): Seconds of video and audio the buffer holds.
+        run_seconds (float): How long to capture before dumping.
+        storage (str): Frame storage mode of the buffer.
+        motion (int): Pixels the synthetic box moves per frame.
+        noise (float): Standard deviation of the synthetic frame noise.
+        **buffer_options: Further RollingVideoBuffer arguments, e.g. dedup=True.
+
+    Returns:
+        dict: The case parameters and its measurements.
+    """
+    video_backend = _TimedVideoBackend(SyntheticVideoBackend(width, height, motion=motion, noise=noise))
+    buffer = RollingVideoBuffer(video_duration=buffer_seconds, audio_duration=buffer_seconds, frame_rate=frame_rate,
+                                storage=storage, video_backend=video_backend, audio_backend=SyntheticAudioBackend(),
+                                **buffer_options)
+    lock = TimedLock()
+    buffer.lock = lock
+    buffer.frame_ready = threading.Condition(lock)
+
+    tracemalloc.start()
+    cpu_start = time.process_time()
+    buffer.start()
+    time.sleep(run_seconds)
+
+    # Dump while capture keeps running, as the hotkey does
+    output_dir = tempfile.mkdtemp(prefix="benchmark_")
+    try:
+        dump_start = time.perf_counter()
+        buffer.dump_to_disk(os.path.join(output_dir, "video.mp4"), os.path.join(output_dir, "audio.wav"))
+        dump_seconds = time.perf_counter() - dump_start
+    finally:
+        buffer.stop()
+        shutil.rmtree(output_dir, ignore_errors=True)
+    cpu_seconds = time.process_time() - cpu_start
+    _, peak_traced = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    stats = buffer.get_capture_stats()
+    frames = stats["frames_captured"]
+    return {
+        "resolution": f"{width}x{height}",
+        "frame_rate": frame_rate,
+        "buffer_seconds": buffer_seconds,
+        "storage": storage,
+        "frames_captured": frames,
+        "achieved_fps": stats["achieved_fps"],
+        "late_frames": stats["late_frames"],
+        "dropped_frames": stats["dropped_frames"],
+        "append_p50_ms": _percentile_ms(video_backend.append_latencies, 50),
+        "append_p99_ms": _percentile_ms(video_backend.append_latencies, 99),
+        "lock_hold_p50_ms": _percentile_ms(lock.hold_times, 50),
+        "lock_hold_p99_ms": _percentile_ms(lock.hold_times, 99),
+        "lock_hold_max_ms": max(lock.hold_times, default=0.0) * 1000,
+        "cpu_ms_per_frame": 1000 * cpu_seconds / frames if frames else 0.0,
+        "buffer_mb": buffer.get_storage_report()["stored_bytes"] / 1024 / 1024,
+        "peak_traced_mb": peak_traced / 1024 / 1024,
+        "max_rss_mb": _max_rss_mb(),
+        "dump_ms": dump_seconds * 1000,
+        "audio_blocks": buffer.get_audio_stats()["blocks"],
+    }
+
+
+def run_matrix(resolutions=None, frame_rates=None, buffer_seconds=None, run_seconds=3.0, storage="raw",
+               **case_options):
+    """
+    Runs run_case() over every combination of resolution, frame rate and buffer length.
+
+    Returns:
+        dict: {"environment": ..., "cases": [...]}, ready to be written as JSON.
+    """
+    cases = []
+    for width, height in resolutions or DEFAULT_RESOLUTIONS:
+        for frame_rate in frame_rates or DEFAULT_FRAME_RATES:
+            for seconds in buffer_seconds or DEFAULT_BUFFER_SECONDS:
+                case = run_case(width, height, frame_rate, seconds, run_seconds, storage, **case_options)
+                print(f"{case['resolution']} @ {frame_rate} fps, {seconds} s buffer: "
+                      f"{case['achieved_fps']:.1f} fps, append p99 {case['append_p99_ms']:.2f} ms, "
+                      f"dump {case['dump_ms']:.0f} ms", file=sys.stderr)
+                cases.append(case)
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "run_seconds": run_seconds,
+        },
+        "cases": cases,
+    }
+
+
+def _case_key(case):
+    return (case["resolution"], case["frame_rate"], case["buffer_seconds"], case["storage"])
+
+
+def compare(results, baseline, tolerance=0.1):
+    """
+    Compares a run against a baseline run.
+
+    Args:
+        results (dict): Output of run_matrix().
+        baseline (dict): An earlier output of run_matrix().
+        tolerance (float): Relative change allowed before a metric counts as a regression.
+
+    Returns:
+        list: One dict per regressed metric, with the case, metric, baseline and current values.
+    """
+    baseline_cases = {_case_key(case): case for case in baseline["cases"]}
+    regressions = []
+    for case in results["cases"]:
+        previous = baseline_cases.get(_case_key(case))
+        if previous is None:
+            continue
+        for metric, direction in COMPARED_METRICS.items():
+            old, new = previous.get(metric), case.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / abs(old)
+            if change * direction < -tolerance:
+                regressions.append({"case": "{} @ {} fps, {} s, {}".format(*_case_key(case)),
+                                    "metric": metric, "baseline": old, "current": new,
+                                    "change": change})
+    return regressions
+
+
+def _per_sample_frames(clip, t):
+    # AudioArrayClip.make_frame before it was vectorized: one Python iteration and list per time
+    frames = []
+    for time_value in t:
+        if time_value > clip.duration or time_value < 0:
+            frames.append(np.zeros(clip.nchannels).tolist())
+        else:
+            frames.append(clip.arr[int(time_value * clip.fps)].tolist())
+    return frames
+
+
+def run_audio_clip(seconds=30.0, rate=44100, channels=2, chunk_size=2000):
+    """
+    Times a full pass over an AudioArrayClip in consecutive chunks of times, the way moviepy
+    reads a clip when writing its audio, with make_frame and with the per-sample loop it replaced.
+
+    Args:
+        seconds (float): Length of the clip.
+        rate (int): Sample rate in Hz.
+        channels (int): Number of channels.
+        chunk_size (int): Times looked up per call (moviepy writes audio in chunks of 2000).
+
+    Returns:
+        dict: The clip parameters, both pass times in milliseconds and the speedup.
+    """
+    rng = np.random.default_rng(0)
+    clip = AudioArrayClip(rng.integers(-32768, 32768, (int(seconds * rate), channels), dtype=np.int16), rate)
+    times = np.arange(len(clip.arr)) / rate
+    chunks = [times[offset:offset + chunk_size] for offset in range(0, len(times), chunk_size)]
+
+    def time_pass(lookup):
+        start = time.perf_counter()
+        for chunk in chunks:
+            lookup(chunk)
+        return (time.perf_counter() - start) * 1000
+
+    if not np.array_equal(clip.make_frame(chunks[-1]), _per_sample_frames(clip, chunks[-1])):
+        raise AssertionError("AudioArrayClip.make_frame differs from the per-sample lookup")
+    per_sample_ms = time_pass(lambda chunk: _per_sample_frames(clip, chunk))
+    vectorized_ms = time_pass(clip.make_frame)
+    return {
+        "seconds": seconds,
+        "rate": rate,
+        "channels": channels,
+        "chunk_size": chunk_size,
+        "per_sample_ms": round(per_sample_ms, 1),
+        "vectorized_ms": round(vectorized_ms, 2),
+        "speedup": round(per_sample_ms / vectorized_ms, 1),
+    }
+
+
+def _parse_list(text, convert):
+    return [convert(item) for item in text.split(",") if item]
+
+
+def _parse_resolution(text):
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the capture -> buffer -> dump path with synthetic sources.")
+    parser.add_argument("--resolutions", type=lambda text: _parse_list(text, _parse_resolution),
+                        default=DEFAULT_RESOLUTIONS, help="Comma separated WIDTHxHEIGHT list.")
+    parser.add_argument("--frame-rates", type=lambda text: _parse_list(text, float), default=DEFAULT_FRAME_RATES)
+    parser.add_argument("--buffer-seconds", type=lambda text: _parse_list(text, float), default=DEFAULT_BUFFER_SECONDS)
+    parser.add_argument("--run-seconds", type=float, default=3.0, help="Capture time per case before the dump.")
+    parser.add_argument("--storage", default="raw", help="Frame storage mode: raw, jpeg or webp.")
+    parser.add_argument("--motion", type=int, default=8, help="Pixels the synthetic box moves per frame.")
+    parser.add_argument("--noise", type=float, default=0.0, help="Synthetic frame noise standard deviation.")
+    parser.add_argument("--adaptive-floor", type=float,
+                        help="Capture with a motion-adaptive rate between this floor and the frame rate.")
+    parser.add_argument("--encoder-workers", type=int,
+                        help="Dump through the ffmpeg encoder with this many segment workers (0 for one per core).")
+    parser.add_argument("--output", help="Write the JSON results here instead of stdout.")
+    parser.add_argument("--baseline", help="Compare against this earlier JSON result.")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed relative regression (default 0.1).")
+    parser.add_argument("--audio-clip", action="store_true",
+                        help="Only time AudioArrayClip.make_frame over a 30 s stereo clip.")
+    args = parser.parse_args(argv)
+
+    if args.audio_clip:
+        text = json.dumps(run_audio_clip(), indent=2)
+        if args.output:
+            with open(args.output, 'w') as f:
+                f.write(text)
+        else:
+            print(text)
+        return 0
+
+    options = {"motion": args.motion, "noise": args.noise}
+    if args.adaptive_floor:
+        options["adaptive_rate"] = {"floor": args.adaptive_floor}
+    if args.encoder_workers is not None:
+        options["encoder"] = {"workers": args.encoder_workers or None}
+    results = run_matrix(args.resolutions, args.frame_rates, args.buffer_seconds, args.run_seconds, args.storage,
+                         **options)
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        results["regressions"] = regressions
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+
+    for regression in regressions:
+        print(f"REGRESSION {regression['case']}: {regression['metric']} {regression['baseline']:.3f} -> "
+              f"{regression['current']:.3f} ({regression['change']:+.0%})", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
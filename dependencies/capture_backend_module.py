@@ -0,0 +1,347 @@
+# capture_backend_module.py
+import threading
+import time
+import numpy as np
+# Capture libraries are optional so the buffering code can run on machines without a display or microphone
+try:
+    import mss  # For screen capture
+except ImportError:
+    mss = None
+try:
+    import pyaudio
+except ImportError:
+    pyaudio = None
+try:
+    import sounddevice as sd
+except ImportError:
+    sd = None
+
+
+class MssVideoBackend:
+    """Screen capture with mss. Grabs are BGRA."""
+    def __init__(self):
+        if mss is None:
+            raise ImportError("The 'mss' video backend requires the mss package.")
+
+    def open(self, source):
+        """
+        Args:
+            source (VideoSource): The area to capture.
+
+        Returns:
+            MssGrabber: A grabber for the calling thread (mss instances are not thread safe).
+        """
+        return MssGrabber(source)
+
+
+class MssGrabber:
+    def __init__(self, source):
+        self.sct = mss.mss()
+        self.area = source.resolve(self.sct)
+
+    @property
+    def size(self):
+        """(width, height) of the grabbed frames."""
+        return self.area["width"], self.area["height"]
+
+    def grab(self):
+        """
+        Returns:
+            np.ndarray: A (height, width, 4) BGRA view of the mss buffer.
+        """
+        return np.asarray(self.sct.grab(self.area))
+
+    def close(self):
+        self.sct.close()
+
+
+class SyntheticVideoBackend:
+    """
+    Deterministic generated frames for headless testing and benchmarking: a
+    gradient background with optional per-pixel noise and a box that moves a
+    fixed number of pixels per frame. The frame rate is the capture source's.
+    """
+    NOISE_FRAMES = 4  # Precomputed noisy backgrounds cycled through, so grabs stay cheap
+
+    def __init__(self, width=1280, height=720, motion=8, noise=0.0, seed=0):
+        """
+        Args:
+            width (int): Frame width for monitor sources. Region sources use the region size.
+            height (int): Frame height for monitor sources.
+            motion (int): Pixels the box moves per frame. 0 gives a static screen.
+            noise (float): Standard deviation of the per-pixel noise, in grey levels.
+            seed (int): Seed for the noise, so runs are reproducible.
+        """
+        if width <= 0 or height <= 0:
+            raise ValueError(f"Synthetic frame size must be positive, but it was {width}x{height}")
+        self.width = width
+        self.height = height
+        self.motion = motion
+        self.noise = noise
+        self.seed = seed
+
+    def open(self, source):
+        """
+        Args:
+            source (VideoSource): The source being captured; only the size of a region is used.
+
+        Returns:
+            SyntheticGrabber: A frame generator.
+        """
+        width, height = self.width, self.height
+        if "region" in source.area:
+            width, height = source.area["region"][2:]
+        return SyntheticGrabber(width, height, self.motion, self.noise, self.seed)
+
+
+class SyntheticGrabber:
+    def __init__(self, width, height, motion, noise, seed):
+        self.width = width
+        self.height = height
+        self.motion = motion
+        self.index = 0  # Frames generated so far
+
+        base = np.empty((height, width, 4), dtype=np.uint8)
+        base[..., 0] = np.linspace(0, 255, width, dtype=np.uint8)[None, :]
+        base[..., 1] = np.linspace(0, 255, height, dtype=np.uint8)[:, None]
+        base[..., 2] = 128
+        base[..., 3] = 255
+        self.backgrounds = [base]
+        if noise > 0:
+            rng = np.random.default_rng(seed)
+            self.backgrounds = []
+            for _ in range(SyntheticVideoBackend.NOISE_FRAMES):
+                grain = rng.normal(0, noise, (height, width, 1))
+                self.backgrounds.append(np.clip(base + grain, 0, 255).astype(np.uint8))
+        self.box = max(1, min(width, height) // 8)
+        self.frame = np.empty_like(base)
+
+    @property
+    def size(self):
+        """(width, height) of the generated frames."""
+        return self.width, self.height
+
+    def grab(self):
+        """
+        Returns:
+            np.ndarray: The next (height, width, 4) BGRA frame. The array is reused and
+            only valid until the next grab.
+        """
+        np.copyto(self.frame, self.backgrounds[self.index % len(self.backgrounds)])
+        x = (self.index * self.motion) % (self.width - self.box + 1)
+        y = (self.index * self.motion // 2) % (self.height - self.box + 1)
+        self.frame[y:y + self.box, x:x + self.box] = (0, 0, 255, 255)
+        self.index += 1
+        return self.frame
+
+    def close(self):
+        pass
+
+
+class PyAudioBackend:
+    """Microphone capture with PyAudio in callback mode."""
+    def __init__(self):
+        if pyaudio is None:
+            raise ImportError("The 'pyaudio' audio backend requires the pyaudio package.")
+        self._audio = None
+        self._stream = None
+        self._callback = None
+        self._running = False
+
+    def start(self, rate, block_size, callback):
+        """
+        Starts delivering audio.
+
+        Args:
+            rate (int): Sample rate in Hz.
+            block_size (int): Samples per block.
+            callback (callable): Called from the driver's thread as
+                callback(samples, latency, overflow, underflow) with int16 mono samples and the
+                seconds between the first sample and the call (0 if unknown).
+        """
+        self._callback = callback
+        self._running = True
+        self._audio = pyaudio.PyAudio()
+        self._stream = self._audio.open(format=pyaudio.paInt16,
+                                        channels=1,
+                                        rate=rate,
+                                        input=True,
+                                        frames_per_buffer=block_size,
+                                        stream_callback=self._on_block)
+        self._stream.start_stream()
+
+    def _on_block(self, in_data, frame_count, time_info, status_flags):
+        samples = np.frombuffer(in_data, dtype=np.int16)
+        latency = time_info.get("current_time", 0) - time_info.get("input_buffer_adc_time", 0)
+        self._callback(samples, latency,
+                       bool(status_flags & pyaudio.paInputOverflow),
+                       bool(status_flags & pyaudio.paInputUnderflow))
+        return (None, pyaudio.paContinue if self._running else pyaudio.paComplete)
+
+    def stop(self):
+        """Stops the stream and releases the device."""
+        self._running = False
+        if self._stream:
+            self._stream.stop_stream()
+            self._stream.close()
+            self._stream = None
+        if self._audio:
+            self._audio.terminate()
+            self._audio = None
+
+
+class SoundDeviceBackend:
+    """Microphone capture with a sounddevice InputStream."""
+    def __init__(self, device=None):
+        """
+        Args:
+            device (int or str, optional): sounddevice input device. Defaults to the system default.
+        """
+        if sd is None:
+            raise ImportError("The 'sounddevice' audio backend requires the sounddevice package.")
+        self.device = device
+        self._stream = None
+        self._callback = None
+        self._running = False
+
+    def start(self, rate, block_size, callback):
+        """Starts delivering audio. See PyAudioBackend.start()."""
+        self._callback = callback
+        self._running = True
+        self._stream = sd.InputStream(samplerate=rate,
+                                      channels=1,
+                                      dtype='int16',
+                                      blocksize=block_size,
+                                      device=self.device,
+                                      callback=self._on_block)
+        self._stream.start()
+
+    def _on_block(self, indata, frames, time_info, status):
+        latency = time_info.currentTime - time_info.inputBufferAdcTime
+        self._callback(indata, latency, status.input_overflow, status.input_underflow)
+        if not self._running:
+            raise sd.CallbackStop()
+
+    def stop(self):
+        """Stops the stream and releases the device."""
+        self._running = False
+        if self._stream:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+
+
+class SyntheticAudioBackend:
+    """
+    Deterministic generated audio: a sine tone plus optional seeded noise,
+    delivered in real time from a thread paced against monotonic deadlines.
+    """
+    def __init__(self, frequency=440.0, amplitude=0.3, noise=0.0, seed=0):
+        """
+        Args:
+            frequency (float): Tone frequency in Hz.
+            amplitude (float): Tone amplitude as a fraction of full scale.
+            noise (float): Standard deviation of the noise as a fraction of full scale.
+            seed (int): Seed for the noise, so runs are reproducible.
+        """
+        self.frequency = frequency
+        self.amplitude = amplitude
+        self.noise = noise
+        self.seed = seed
+        self._thread = None
+        self._running = False
+
+    def block(self, index, rate, block_size, rng=None):
+        """
+        Args:
+            index (int): Number of the block since the start.
+            rate (int): Sample rate in Hz.
+            block_size (int): Samples per block.
+            rng (np.random.Generator, optional): Noise source. Required when noise is set.
+
+        Returns:
+            np.ndarray: The block as int16 mono samples.
+        """
+        t = (index * block_size + np.arange(block_size)) / rate
+        signal = self.amplitude * np.sin(2 * np.pi * self.frequency * t)
+        if self.noise > 0:
+            signal += rng.normal(0, self.noise, block_size)
+        return (np.clip(signal, -1, 1) * 32767).astype(np.int16)
+
+    def start(self, rate, block_size, callback):
+        """Starts delivering audio. See PyAudioBackend.start()."""
+        self._running = True
+        self._thread = threading.Thread(target=self._run, args=(rate, block_size, callback), daemon=True)
+        self._thread.start()
+
+    def _run(self, rate, block_size, callback):
+        rng = np.random.default_rng(self.seed)
+        period = block_size / rate
+        start = time.monotonic()
+        index = 0
+        while self._running:
+            # A block is delivered once its last sample would have been recorded
+            delay = start + (index + 1) * period - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            callback(self.block(index, rate, block_size, rng), period, False, False)
+            index += 1
+
+    def stop(self):
+        """Stops generating audio."""
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+VIDEO_BACKENDS = {"mss": MssVideoBackend, "synthetic": SyntheticVideoBackend}
+AUDIO_BACKENDS = {"pyaudio": PyAudioBackend, "sounddevice": SoundDeviceBackend, "synthetic": SyntheticAudioBackend}
+
+
+def _make_backend(spec, backends, kind):
+    if isinstance(spec, str):
+        spec = {"type": spec}
+    if not isinstance(spec, dict):
+        return spec  # Already a backend instance
+    options = dict(spec)
+    name = options.pop("type", None)
+    if name not in backends:
+        raise ValueError(f"Unknown {kind} backend '{name}'. Must be one of {sorted(backends)}")
+    return backends[name](**options)
+
+
+def make_video_backend(spec):
+    """
+    Creates a video capture backend.
+
+    Args:
+        spec: A backend name from VIDEO_BACKENDS, a dict with a "type" name and the backend's
+            options (e.g. {"type": "synthetic", "width": 640, "height": 480}), or a backend instance.
+
+    Returns:
+        A backend with open(source), returning a grabber with grab(), size and close().
+
+    Raises:
+        ValueError: If the backend name is unknown.
+        ImportError: If the library the backend needs is not installed.
+    """
+    return _make_backend(spec, VIDEO_BACKENDS, "video")
+
+
+def make_audio_backend(spec):
+    """
+    Creates an audio capture backend.
+
+    Args:
+        spec: A backend name from AUDIO_BACKENDS, a dict with a "type" name and the backend's
+            options, or a backend instance.
+
+    Returns:
+        A backend with start(rate, block_size, callback) and stop().
+
+    Raises:
+        ValueError: If the backend name is unknown.
+        ImportError: If the library the backend needs is not installed.
+    """
+    return _make_backend(spec, AUDIO_BACKENDS, "audio")
@@ -2,6 +2,66 @@ import json
 import os
 import sys
 
+# Defaults for the optional "recording" section of config.json
+DEFAULT_RECORDING_SETTINGS = {
+    "video_duration": 30,
+    "audio_duration": 30,
+    "frame_rate": 5,
+    "storage": "raw",
+    "quality": 80,
+    "capture_resolution": {"mode": "native"},
+    "interpolation": "area",
+    "dedup": False,  # Store unchanged frames as references to the previous one
+    "dedup_threshold": 0.0,  # Fraction of sampled pixels that must change for a frame to be stored again
+    "defer_color": False,  # Store grabs as BGRA and convert them on export; needs "raw" storage
+    "sources": [1],
+    "audio_backend": "pyaudio",
+    "audio_block_size": 1024,
+    "capture_process": False,
+    "video_backend": "mss",
+    "adaptive_rate": None,
+    # "workers" above 1, or None for one per core, encodes long file exports in a process pool.
+    # Requests are encoded in memory by one ffmpeg, so by default no pool is started.
+    "encoder": {"codec": "libx264", "preset": "veryfast", "crf": 23, "workers": 1},
+    "segment_recording": False,  # Also encode the capture into rolling segment files on disk, for debugging
+}
+
+# Defaults for the optional "request" section: how a recording is sent to Gemini
+DEFAULT_REQUEST_SETTINGS = {
+    "mode": "video",
+    "keyframes": 8,
+    "max_dimension": 1024,
+    "target_bytes": 100000,
+    "audio": True,
+    "silence": "keep",
+    "min_speech_ratio": 0.0,
+    "debug_dir": None,  # Directory to also save every uploaded video to; videos are otherwise only kept in memory
+    # Size the uploaded video is fitted to. Inline requests are capped at 20 MB, and the video
+    # grows by a third when it is base64 encoded for the request
+    "max_video_bytes": 14000000,
+}
+
+# "video" uploads the muxed recording, "keyframes" a storyboard of JPEG frames (see storyboard_module)
+REQUEST_MODES = ["video", "keyframes"]
+
+# Handling of the audio between speech, see vad_module.SILENCE_MODES
+SILENCE_MODES = ["keep", "mute", "drop"]
+
+# Capture resolution modes and the key each one reads its value from
+CAPTURE_RESOLUTION_MODES = {
+    "native": None,
+    "width": "width",
+    "max_pixels": "max_pixels",
+    "scale": "scale",
+    "auto": "byte_budget",
+}
+
+INTERPOLATION_MODES = ["nearest", "linear", "area", "cubic", "lanczos"]
+
+# Capture backends by name; a backend can also be given as {"type": name, ...options}
+VIDEO_BACKENDS = ["mss", "synthetic"]
+AUDIO_BACKENDS = ["pyaudio", "sounddevice", "synthetic"]
+
 def load_config(config_path=None):
     """
     Loads configuration from a JSON file.
@@ -49,6 +109,113 @@ def load_config(config_path=None):
     return config_data
 
 
+def get_recording_settings(config_data):
+    """
+    Returns the recording settings from a loaded config, filled in with defaults.
+
+    Args:
+        config_data (dict): The dictionary returned by load_config().
+
+    Returns:
+        dict: The recording settings.
+
+    Raises:
+        ValueError: If the capture resolution, sources, interpolation, dedup, deferred colour conversion,
+            adaptive rate, audio or segment recording settings are invalid.
+    """
+    settings = dict(DEFAULT_RECORDING_SETTINGS)
+    settings.update(config_data.get("recording", {}))
+
+    resolution = settings["capture_resolution"]
+    if not isinstance(resolution, dict) or resolution.get("mode") not in CAPTURE_RESOLUTION_MODES:
+        raise ValueError(f"Invalid capture_resolution. 'mode' must be one of {list(CAPTURE_RESOLUTION_MODES)}")
+    value_key = CAPTURE_RESOLUTION_MODES[resolution["mode"]]
+    if value_key is not None:
+        value = resolution.get(value_key)
+        if not isinstance(value, (int, float)) or value <= 0:
+            raise ValueError(f"capture_resolution mode '{resolution['mode']}' requires a positive '{value_key}' value.")
+
+    sources = settings["sources"]
+    if not isinstance(sources, list) or not sources:
+        raise ValueError("recording 'sources' must be a non-empty list of monitor indexes, regions or \"all\".")
+
+    if settings["interpolation"] not in INTERPOLATION_MODES:
+        raise ValueError(f"Invalid interpolation '{settings['interpolation']}'. Must be one of {INTERPOLATION_MODES}")
+
+    if not isinstance(settings["dedup"], bool):
+        raise ValueError("dedup must be true or false.")
+    threshold = settings["dedup_threshold"]
+    if isinstance(threshold, bool) or not isinstance(threshold, (int, float)) or not 0 <= threshold < 1:
+        raise ValueError("dedup_threshold must be a fraction of the screen, at least 0 and below 1.")
+    if not isinstance(settings["defer_color"], bool):
+        raise ValueError("defer_color must be true or false.")
+    if settings["defer_color"] and settings["storage"] != "raw":
+        raise ValueError("defer_color requires storage 'raw', compressed frames must be converted before encoding.")
+
+    for key, backends in (("video_backend", VIDEO_BACKENDS), ("audio_backend", AUDIO_BACKENDS)):
+        backend = settings[key]
+        name = backend.get("type") if isinstance(backend, dict) else backend
+        if name not in backends:
+            raise ValueError(f"Invalid {key} '{name}'. Must be one of {backends}")
+    adaptive_rate = settings["adaptive_rate"]
+    if adaptive_rate is not None:
+        if not isinstance(adaptive_rate, dict):
+            raise ValueError("adaptive_rate must be null or an object with 'floor' and 'ceiling' frame rates.")
+        floor = adaptive_rate.get("floor", 0.5)
+        ceiling = adaptive_rate.get("ceiling", settings["frame_rate"])
+        if not 0 < floor <= ceiling:
+            raise ValueError("adaptive_rate needs 0 < floor <= ceiling.")
+    encoder = settings["encoder"]
+    if encoder is not None:
+        if not isinstance(encoder, dict):
+            raise ValueError("encoder must be null or an object with 'codec', 'preset' and 'crf' settings.")
+        workers = encoder.get("workers", 1)
+        if workers is not None and (not isinstance(workers, int) or workers < 1):
+            raise ValueError("encoder 'workers' must be a positive integer, or null for one per CPU core.")
+    if not isinstance(settings["audio_block_size"], int) or settings["audio_block_size"] <= 0:
+        raise ValueError("audio_block_size must be a positive integer.")
+    if not isinstance(settings["segment_recording"], bool):
+        raise ValueError("segment_recording must be true or false.")
+
+    return settings
+
+
+def get_request_settings(config_data):
+    """
+    Returns the request settings from a loaded config, filled in with defaults.
+
+    Args:
+        config_data (dict): The dictionary returned by load_config().
+
+    Returns:
+        dict: The request settings.
+
+    Raises:
+        ValueError: If the mode or silence handling is unknown, a keyframe setting is not a
+            positive integer, min_speech_ratio is outside 0-1, debug_dir is not a path or
+            max_video_bytes is neither a positive integer nor None.
+    """
+    settings = dict(DEFAULT_REQUEST_SETTINGS)
+    settings.update(config_data.get("request", {}))
+
+    if settings["mode"] not in REQUEST_MODES:
+        raise ValueError(f"Invalid request mode '{settings['mode']}'. Must be one of {REQUEST_MODES}")
+    for key in ("keyframes", "max_dimension", "target_bytes"):
+        if not isinstance(settings[key], int) or settings[key] <= 0:
+            raise ValueError(f"request '{key}' must be a positive integer.")
+    if settings["silence"] not in SILENCE_MODES:
+        raise ValueError(f"Invalid request silence '{settings['silence']}'. Must be one of {SILENCE_MODES}")
+    if not isinstance(settings["min_speech_ratio"], (int, float)) or not 0 <= settings["min_speech_ratio"] <= 1:
+        raise ValueError("request 'min_speech_ratio' must be between 0 and 1.")
+    if settings["debug_dir"] is not None and not isinstance(settings["debug_dir"], str):
+        raise ValueError("request 'debug_dir' must be a directory path or null.")
+    max_video_bytes = settings["max_video_bytes"]
+    if max_video_bytes is not None and (not isinstance(max_video_bytes, int) or max_video_bytes <= 0):
+        raise ValueError("request 'max_video_bytes' must be a positive integer or null.")
+
+    return settings
+
+
 if __name__ == '__main__':
     try:
         config = load_config()
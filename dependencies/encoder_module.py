@@ -0,0 +1,539 @@
+# encoder_module.py
+import logging
+import multiprocessing
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+import numpy as np
+from dependencies.ring_buffer_module import RingSnapshot, SharedFrameRing
+
+logger = logging.getLogger(__name__)
+
+FFMPEG_BINARY = os.environ.get("FFMPEG_BINARY", "ffmpeg")
+
+# Codecs that understand x264-style -preset and -crf
+RATE_CONTROLLED_CODECS = ["libx264", "libx265"]
+
+DEFAULT_ENCODER_SETTINGS = {
+    "codec": "libx264",
+    "preset": "veryfast",
+    "crf": 23,
+    "audio_codec": "aac",
+}
+
+
+def run_ffmpeg(arguments, input=None):
+    """
+    Runs ffmpeg to completion.
+
+    Args:
+        arguments (list): Command line arguments, without the ffmpeg binary itself.
+        input (bytes, optional): Data written to ffmpeg's stdin, for a "pipe:0" input.
+
+    Raises:
+        FileNotFoundError: If ffmpeg is not installed (set FFMPEG_BINARY to its path).
+        RuntimeError: If ffmpeg exits with an error.
+    """
+    try:
+        result = subprocess.run([FFMPEG_BINARY, "-y", "-loglevel", "error"] + arguments, input=input,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"ffmpeg not found at '{FFMPEG_BINARY}'. Install it or set FFMPEG_BINARY.")
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {result.stderr.decode(errors='replace').strip()}")
+
+
+def video_codec_arguments(codec="libx264", preset="veryfast", crf=23, pad=True):
+    """
+    Args:
+        codec (str): ffmpeg video encoder name.
+        preset (str): Speed preset, for the codecs in RATE_CONTROLLED_CODECS.
+        crf (int): Constant rate factor, for the codecs in RATE_CONTROLLED_CODECS.
+        pad (bool): Pad odd sizes to even ones. Callers with their own filter graph turn this
+            off, as ffmpeg does not allow -vf next to -filter_complex.
+
+    Returns:
+        list: ffmpeg output arguments selecting the codec and its quality settings.
+    """
+    arguments = ["-c:v", codec]
+    if codec in RATE_CONTROLLED_CODECS:
+        arguments += ["-preset", preset, "-crf", str(crf)]
+    if pad:
+        # 4:2:0 needs even dimensions; pad odd-sized regions by a pixel instead of failing
+        arguments += ["-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2"]
+    return arguments + ["-pix_fmt", "yuv420p"]
+
+
+def _free_port():
+    # Another process could take the port before ffmpeg binds it; unlikely on loopback and
+    # reported as an encoder error if it happens
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+class StreamingEncoder:
+    """
+    One ffmpeg process, started ahead of time, that encodes raw frames written to
+    its stdin in a single pass. Audio, when enabled, is streamed as PCM over a
+    loopback socket ffmpeg listens on, so both tracks are encoded and muxed by the
+    same process without temporary files and on every platform.
+
+    The process is spawned in the constructor and waits for input, so encode()
+    does not pay for ffmpeg start-up. Each encoder produces one file, or with
+    in_memory one encoded video read back from ffmpeg's stdout.
+    """
+    def __init__(self, width, height, frame_rate, pixel_format="bgr24", audio_rate=None, audio_channels=1,
+                 container="mp4", codec="libx264", preset="veryfast", crf=23, audio_codec="aac", threads=None,
+                 in_memory=False, audio_bitrate=None, frame_fragments=False):
+        """
+        Args:
+            width (int): Frame width.
+            height (int): Frame height.
+            frame_rate (float): Frames per second of the output.
+            pixel_format (str): ffmpeg name of the input frame layout, "bgr24" or "bgra".
+            audio_rate (int, optional): Sample rate of the int16 audio. None encodes video only.
+            audio_channels (int): Channels of the audio.
+            container (str): Output container extension, "mp4" or "mkv".
+            codec (str): Video codec, see video_codec_arguments().
+            preset (str): Encoder speed preset.
+            crf (int): Constant rate factor.
+            audio_codec (str): Audio codec.
+            threads (int, optional): Encoder threads. Defaults to ffmpeg's choice, one per core.
+            in_memory (bool): Stream the output through a pipe instead of writing a file, so
+                encode() returns the encoded bytes. An mp4 is then fragmented, since the index
+                of a regular mp4 is only known once the file is complete.
+            audio_bitrate (int, optional): Audio bits per second. Defaults to the codec's choice.
+            frame_fragments (bool): With in_memory mp4 output, put every frame in a fragment of its
+                own instead of every keyframe interval, so frame sizes can be read from the output.
+
+        Raises:
+            FileNotFoundError: If ffmpeg is not installed.
+        """
+        self.key = (width, height, frame_rate, pixel_format, audio_rate, audio_channels, container, in_memory,
+                    audio_bitrate)
+        self.frame_bytes = width * height * (4 if pixel_format == "bgra" else 3)
+        self.temp_path = None
+        if not in_memory:
+            handle, self.temp_path = tempfile.mkstemp(suffix=f".{container}", prefix="encode_")
+            os.close(handle)
+
+        arguments = [FFMPEG_BINARY, "-y", "-loglevel", "error"]
+        self.port = None
+        if audio_rate is not None:
+            self.port = _free_port()
+            arguments += ["-f", "s16le", "-ar", str(audio_rate), "-ac", str(audio_channels),
+                          "-listen", "1", "-i", f"tcp://127.0.0.1:{self.port}"]
+        arguments += ["-f", "rawvideo", "-pix_fmt", pixel_format, "-s", f"{width}x{height}",
+                      "-r", str(frame_rate), "-i", "pipe:0"]
+        if audio_rate is not None:
+            arguments += ["-map", "1:v:0", "-map", "0:a:0", "-c:a", audio_codec]
+            if audio_bitrate:
+                arguments += ["-b:a", str(audio_bitrate)]
+        arguments += video_codec_arguments(codec, preset, crf)
+        if threads:
+            arguments += ["-threads", str(threads)]
+        if in_memory:
+            if container == "mp4":
+                fragments = "frag_every_frame" if frame_fragments else "frag_keyframe"
+                arguments += ["-movflags", f"{fragments}+empty_moov+default_base_moof"]
+            arguments += ["-f", "matroska" if container == "mkv" else "mp4", "pipe:1"]
+        else:
+            if container == "mp4":
+                arguments += ["-movflags", "+faststart"]  # Index first, so uploads can be read as they stream
+            arguments.append(self.temp_path)
+
+        try:
+            self.process = subprocess.Popen(arguments, stdin=subprocess.PIPE,
+                                            stdout=subprocess.PIPE if in_memory else subprocess.DEVNULL,
+                                            stderr=subprocess.PIPE)
+        except FileNotFoundError:
+            if self.temp_path:
+                os.remove(self.temp_path)
+            raise FileNotFoundError(f"ffmpeg not found at '{FFMPEG_BINARY}'. Install it or set FFMPEG_BINARY.")
+
+    def _send_audio(self, audio, errors):
+        try:
+            deadline = time.monotonic() + 10
+            while True:
+                try:
+                    connection = socket.create_connection(("127.0.0.1", self.port), timeout=10)
+                    break
+                except ConnectionRefusedError:
+                    if time.monotonic() > deadline or self.process.poll() is not None:
+                        raise
+                    time.sleep(0.01)  # ffmpeg has not started listening yet
+            with connection:
+                connection.sendall(np.ascontiguousarray(audio, dtype=np.int16).data)
+        except Exception as e:
+            errors.append(e)
+
+    def _read_output(self, chunks):
+        # ffmpeg blocks once the stdout pipe is full, so the output is drained while frames are written
+        for chunk in iter(lambda: self.process.stdout.read(1 << 20), b""):
+            chunks.append(chunk)
+
+    def encode(self, frames, filename=None, audio=None):
+        """
+        Streams the frames (and audio) through ffmpeg. A file encoder moves the result to
+        filename; an in_memory encoder returns it.
+
+        Args:
+            frames (iterable): (height, width, channels) uint8 frames in the encoder's pixel format.
+            filename (str, optional): Output path. Required unless the encoder is in_memory.
+            audio (np.ndarray, optional): int16 samples, required when the encoder was created
+                with an audio_rate. Should last as long as the frames at the output frame rate.
+
+        Returns:
+            str or bytes: filename, or the encoded video for an in_memory encoder.
+
+        Raises:
+            RuntimeError: If ffmpeg fails.
+        """
+        in_memory = self.temp_path is None
+        if not in_memory and filename is None:
+            self.close()
+            raise ValueError("A filename is required unless the encoder is in_memory.")
+        errors = []
+        sender = None
+        if self.port is not None:
+            if audio is None:
+                audio = np.zeros(0, dtype=np.int16)
+            sender = threading.Thread(target=self._send_audio, args=(audio, errors), daemon=True)
+            sender.start()
+        chunks = []
+        reader = None
+        if in_memory:
+            reader = threading.Thread(target=self._read_output, args=(chunks,), daemon=True)
+            reader.start()
+        try:
+            for frame in frames:
+                if frame.nbytes != self.frame_bytes:
+                    raise ValueError(f"Frame of {frame.nbytes} bytes does not match the encoder's {self.frame_bytes}")
+                self.process.stdin.write(np.ascontiguousarray(frame).data)
+            self.process.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass  # ffmpeg exited early; its error is reported below
+        except Exception:
+            self.close()
+            raise
+        if sender is not None:
+            sender.join()
+        stderr = self.process.stderr.read()
+        self.process.wait()
+        if reader is not None:
+            reader.join()
+        if self.process.returncode != 0 or errors:
+            self.close()
+            detail = stderr.decode(errors='replace').strip() or errors
+            raise RuntimeError(f"ffmpeg encoding failed: {detail}")
+        if in_memory:
+            self.process.stdout.close()
+            return b"".join(chunks)
+        shutil.move(self.temp_path, filename)
+        return filename
+
+    def close(self):
+        """Stops the process without producing a file, e.g. for an unused pre-spawned encoder."""
+        if self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+        for stream in (self.process.stdin, self.process.stdout, self.process.stderr):
+            if stream and not stream.closed:
+                stream.close()
+        if self.temp_path and os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+
+class EncoderPool:
+    """
+    Keeps one StreamingEncoder spawned and waiting, so the next dump starts
+    encoding immediately. Handing it out spawns the next spare right away.
+    """
+    def __init__(self, codec="libx264", preset="veryfast", crf=23, audio_codec="aac"):
+        """
+        Args:
+            codec (str): Video codec, see video_codec_arguments().
+            preset (str): Encoder speed preset.
+            crf (int): Constant rate factor.
+            audio_codec (str): Audio codec.
+        """
+        self.options = {"codec": codec, "preset": preset, "crf": crf, "audio_codec": audio_codec}
+        self._spare = None
+        self._lock = threading.Lock()
+
+    def prepare(self, width, height, frame_rate, pixel_format="bgr24", audio_rate=None, audio_channels=1,
+                container="mp4", in_memory=False, audio_bitrate=None):
+        """Spawns a spare encoder for these settings unless one is already waiting. Arguments as StreamingEncoder."""
+        key = (width, height, frame_rate, pixel_format, audio_rate, audio_channels, container, in_memory,
+               audio_bitrate)
+        with self._lock:
+            if self._spare is not None and self._spare.key == key and self._spare.process.poll() is None:
+                return
+            if self._spare is not None:
+                self._spare.close()
+            self._spare = self._spawn(key)
+
+    def _spawn(self, key):
+        *settings, in_memory, audio_bitrate = key
+        return StreamingEncoder(*settings, in_memory=in_memory, audio_bitrate=audio_bitrate, **self.options)
+
+    def acquire(self, width, height, frame_rate, pixel_format="bgr24", audio_rate=None, audio_channels=1,
+                container="mp4", in_memory=False, audio_bitrate=None):
+        """
+        Returns:
+            StreamingEncoder: A ready encoder for these settings, the spare if it matches.
+            A new spare with the same settings is spawned for the next call.
+        """
+        key = (width, height, frame_rate, pixel_format, audio_rate, audio_channels, container, in_memory,
+               audio_bitrate)
+        with self._lock:
+            encoder, self._spare = self._spare, None
+        if encoder is None or encoder.key != key or encoder.process.poll() is not None:
+            if encoder is not None:
+                encoder.close()
+            encoder = self._spawn(key)
+        self.prepare(*key)
+        return encoder
+
+    def close(self):
+        """Stops the spare encoder."""
+        with self._lock:
+            if self._spare is not None:
+                self._spare.close()
+                self._spare = None
+
+
+def _audio_input_arguments(audio_rate, audio_channels, audio_codec, video_input=0):
+    return ["-f", "s16le", "-ar", str(audio_rate), "-ac", str(audio_channels), "-i", "pipe:0",
+            "-map", f"{video_input}:v:0", "-map", f"{1 - video_input}:a:0", "-c:a", audio_codec]
+
+
+def concat_videos(paths, filename, audio=None, audio_rate=None, audio_channels=1, audio_codec="aac",
+                  inpoint=None, outpoint=None):
+    """
+    Joins videos encoded with the same settings by copying their streams, without re-encoding.
+
+    Args:
+        paths (list): Input files, in playback order.
+        filename (str): Output path. The container follows the extension.
+        audio (np.ndarray, optional): int16 samples encoded as the audio track of the result.
+        audio_rate (int, optional): Sample rate of the audio.
+        audio_channels (int): Channels of the audio.
+        audio_codec (str): Audio codec.
+        inpoint (float, optional): Seconds into the first file at which the result starts.
+            Copying has to begin at a keyframe, so earlier packets back to the keyframe
+            before inpoint are kept; mp4 and mkv hide them with an edit list.
+        outpoint (float, optional): Seconds into the last file at which the result ends.
+
+    Returns:
+        str: filename.
+
+    Raises:
+        RuntimeError: If ffmpeg fails, e.g. because the inputs do not share a codec.
+    """
+    handle, list_path = tempfile.mkstemp(suffix=".txt", prefix="concat_")
+    try:
+        with os.fdopen(handle, 'w') as f:
+            for index, path in enumerate(paths):
+                escaped = os.path.abspath(path).replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+                if inpoint is not None and index == 0:
+                    f.write(f"inpoint {inpoint:.6f}\n")
+                if outpoint is not None and index == len(paths) - 1:
+                    f.write(f"outpoint {outpoint:.6f}\n")
+        arguments = ["-f", "concat", "-safe", "0", "-i", list_path]
+        data = None
+        if audio is not None:
+            arguments += _audio_input_arguments(audio_rate, audio_channels, audio_codec)
+            data = np.ascontiguousarray(audio, dtype=np.int16).tobytes()
+        arguments += ["-c:v", "copy"]
+        if filename.lower().endswith(".mp4"):
+            arguments += ["-movflags", "+faststart"]
+        run_ffmpeg(arguments + [filename], input=data)
+    finally:
+        os.remove(list_path)
+    return filename
+
+
+def _worker_ready():
+    return os.getpid()
+
+
+def _decode_frames(blobs, positions):
+    last_position, frame = None, None
+    for position in positions:
+        if position != last_position:
+            frame = cv2.imdecode(np.frombuffer(blobs[position], dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+            last_position = position
+        yield frame
+
+
+def _encode_segment(ring, entries, generations, positions, frame_shape, frame_rate, filename, options):
+    """
+    Worker entry point of SegmentEncoder: encodes one run of output frames.
+
+    Args:
+        ring (SharedFrameRing): Ring holding the raw frames, attached by name. None for
+            compressed frames, which are then passed as blobs in entries.
+        entries (np.ndarray or list): Slot indices into the ring, or the encoded blobs.
+        generations (np.ndarray): Slot generations at snapshot time, see RingSnapshot.
+        positions (np.ndarray): Indices into entries to encode, one per output frame.
+        frame_shape (tuple): (height, width, channels) of the frames.
+        frame_rate (float): Output frame rate.
+        filename (str): Output path of the segment.
+        options (dict): StreamingEncoder keyword arguments.
+
+    Returns:
+        int: Frames overwritten by capture before they could be read.
+    """
+    height, width, channels = frame_shape
+    encoder = StreamingEncoder(width, height, frame_rate, "bgra" if channels == 4 else "bgr24", **options)
+    if ring is None:
+        snapshot = None
+        frames = _decode_frames(entries, positions)
+    else:
+        snapshot = RingSnapshot(ring, ring.frames, entries, None, generations)
+        frames = snapshot.iter_frames(positions)
+    try:
+        encoder.encode(frames, filename)
+    finally:
+        if ring is not None:
+            ring.close()
+    return snapshot.lost_frames if snapshot is not None else 0
+
+
+def _stage_frames(snapshot, positions):
+    # Copies the frames a plain in-process ring holds into shared memory, once per distinct frame
+    unique = np.unique(positions)
+    staging = SharedFrameRing(len(unique), snapshot.frame_shape)
+    for frame in snapshot.iter_frames(unique):
+        staging.append(frame, 0.0)
+    # iter_frames only skips leading frames that were lost; later ones repeat the previous frame
+    skipped = len(unique) - len(staging)
+    local = np.clip(np.searchsorted(unique, positions) - skipped, 0, max(len(staging) - 1, 0))
+    return staging, local
+
+
+class SegmentEncoder:
+    """
+    Encodes a snapshot as several time segments at once, one per worker process,
+    and joins them with a stream-copy concat, so the time from hotkey to file
+    shrinks with the number of cores.
+
+    Workers read raw frames straight from shared memory: a SharedFrameRing is
+    attached by name, and frames of an ordinary ring are first copied into a
+    temporary shared block. Compressed frames are sent as their blobs and decoded
+    in the workers. Each segment starts with a keyframe, so the segments join
+    without re-encoding; the audio is encoded once while they are joined.
+    """
+    def __init__(self, workers=None, min_segment_seconds=2.0, codec="libx264", preset="veryfast", crf=23,
+                 audio_codec="aac"):
+        """
+        Args:
+            workers (int, optional): Worker processes, and at most as many segments. Defaults to one per core.
+            min_segment_seconds (float): Shortest segment worth a worker of its own.
+            codec (str): Video codec, see video_codec_arguments().
+            preset (str): Encoder speed preset.
+            crf (int): Constant rate factor.
+            audio_codec (str): Audio codec.
+        """
+        cores = os.cpu_count() or 1
+        self.workers = workers or cores
+        self.min_segment_seconds = min_segment_seconds
+        # Share the cores between the segments instead of every ffmpeg starting one thread per core
+        self.options = {"codec": codec, "preset": preset, "crf": crf, "threads": max(1, cores // self.workers)}
+        self.audio_codec = audio_codec
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def segment_count(self, frame_count, frame_rate):
+        """
+        Returns:
+            int: Segments encode() splits frame_count output frames into.
+        """
+        min_frames = max(1, int(round(self.min_segment_seconds * frame_rate)))
+        return max(1, min(self.workers, frame_count // min_frames))
+
+    def prepare(self):
+        """
+        Starts the worker processes ahead of the first encode.
+
+        Returns:
+            ProcessPoolExecutor: The worker pool.
+        """
+        with self._lock:
+            if self._executor is None:
+                # Spawned rather than forked: the capture threads are running, and forking a
+                # threaded process can leave a lock held in the child
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+                for _ in range(self.workers):
+                    self._executor.submit(_worker_ready)
+            return self._executor
+
+    def encode(self, snapshot, positions, frame_rate, filename, audio=None, audio_rate=None, audio_channels=1):
+        """
+        Encodes the snapshot frames at positions in parallel segments and joins them.
+
+        Args:
+            snapshot (RingSnapshot): Frames to encode.
+            positions (np.ndarray): Chronological positions in the snapshot, one per output frame.
+            frame_rate (float): Output frame rate.
+            filename (str): Output path (.mp4 or .mkv).
+            audio (np.ndarray, optional): int16 samples muxed in while the segments are joined.
+            audio_rate (int, optional): Sample rate of the audio.
+            audio_channels (int): Channels of the audio.
+
+        Returns:
+            int: Frames overwritten by capture before they could be read.
+
+        Raises:
+            RuntimeError: If encoding a segment or joining them fails.
+        """
+        executor = self.prepare()
+        positions = np.asarray(positions)
+        count = self.segment_count(len(positions), frame_rate)
+        temp_dir = tempfile.mkdtemp(prefix="segments_")
+        staging = None
+        try:
+            source = None
+            if snapshot.frames is not None:
+                if isinstance(snapshot.ring, SharedFrameRing):
+                    source = snapshot
+                else:
+                    staging, positions = _stage_frames(snapshot, positions)
+                    source = staging.snapshot()
+            futures, paths = [], []
+            for index, segment in enumerate(np.array_split(positions, count)):
+                path = os.path.join(temp_dir, f"segment_{index:03d}.mp4")
+                if source is None:
+                    # Only this segment's blobs are sent along, already compressed
+                    first = segment[0]
+                    arguments = (None, snapshot.entries[first:segment[-1] + 1], None, segment - first)
+                else:
+                    # The ring pickles as the name of its block; only the index arrays are copied
+                    arguments = (source.ring, source.entries, source.generations, segment)
+                futures.append(executor.submit(_encode_segment, *arguments, snapshot.frame_shape, frame_rate, path,
+                                               self.options))
+                paths.append(path)
+            lost_frames = sum(future.result() for future in futures)
+            concat_videos(paths, filename, audio, audio_rate, audio_channels, self.audio_codec)
+        finally:
+            if staging is not None:
+                staging.close()
+                staging.unlink()
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        return lost_frames
+
+    def close(self):
+        """Stops the worker processes."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
@@ -1,4 +1,5 @@
 import logging
+import time
 import google.generativeai as genai
 import os
 from dependencies import config_module  # Import config_module to load API key
@@ -7,6 +8,37 @@ from dependencies import config_module  # Import config_module to load API key
 logger = logging.getLogger(__name__)
 
 
+def _load_model():
+    # Load the config so we get the API key
+    config = config_module.load_config()
+    api_key = config["gemini_api_key"]
+    gemini_model = config["gemini_model"]
+
+    if not api_key:
+        raise ValueError("No API key was found in the config file.")
+
+    genai.configure(api_key=api_key)  # Initialize the Gemini API with the API key.
+    return genai.GenerativeModel(
+        gemini_model
+    )  # Get Gemini model, uses gemini-pro-vision if not specified in config
+
+
+def _generate(model, contents, payload_bytes):
+    # Streams the response so the time to the first token can be logged next to the payload size
+    start = time.perf_counter()
+    response = model.generate_content(contents, stream=True)
+    first_chunk = None
+    parts = []
+    for chunk in response:
+        if first_chunk is None:
+            first_chunk = time.perf_counter() - start
+        parts.append(chunk.text)
+    total = time.perf_counter() - start
+    logger.info(f"Sent {payload_bytes / 1024:.0f} KiB; first token after {first_chunk or total:.2f} s, "
+                f"response complete after {total:.2f} s.")
+    return "".join(parts)
+
+
 def generate_text(prompt, video_filepath):
     """
     Sends a prompt and video to the Gemini API and returns the response.
@@ -21,19 +53,6 @@ def generate_text(prompt, video_filepath):
     try:
         logger.info(f"Attempting to process the video at {video_filepath} with prompt: {prompt}")
 
-        # Load the config so we get the API key
-        config = config_module.load_config()
-        api_key = config["gemini_api_key"]
-        gemini_model = config["gemini_model"]
-
-        if not api_key:
-            raise ValueError("No API key was found in the config file.")
-
-        genai.configure(api_key=api_key)  # Initialize the Gemini API with the API key.
-        model = genai.GenerativeModel(
-            gemini_model
-        )  # Get Gemini model, uses gemini-pro-vision if not specified in config
-
         # Check if the video file exists
         if not os.path.exists(video_filepath):
             raise FileNotFoundError(f"Video file not found at: {video_filepath}")
@@ -41,18 +60,83 @@ def generate_text(prompt, video_filepath):
         # Read the video file
         with open(video_filepath, "rb") as video_file:
             video_data = video_file.read()
+    except Exception as e:
+        logger.error(f"Error generating text from Gemini API: {e}")
+        return None
+    return generate_text_from_media(prompt, video_data)
+
+
+def generate_text_from_media(prompt, media, mime_type="video/mp4"):
+    """
+    Sends a prompt and a video held in memory to the Gemini API, e.g. the output of
+    RecordingModule.export_media(), so nothing has to be written to disk and read back.
+
+    Args:
+        prompt (str): The prompt for the Gemini API.
+        media: The encoded video as bytes, a memoryview, or a binary file object such as
+            io.BytesIO, which is read from its current position.
+        mime_type (str): MIME type of the video.
+
+    Returns:
+        str: The response from the Gemini API, or None on error.
+    """
+    try:
+        if hasattr(media, "read"):
+            media = media.read()
+        media = bytes(media)  # The request needs bytes; a bytes object is passed through without a copy
+        logger.info(f"Attempting to process {len(media) / 1024:.0f} KiB of {mime_type} with prompt: {prompt}")
+        model = _load_model()
 
         # Generate Content
-        response = model.generate_content(
+        text = _generate(model,
             [
                 prompt,
-                {"mime_type": "video/mp4", "data": video_data},
-            ]  # pass video data and mime type
+                {"mime_type": mime_type, "data": media},
+            ],  # pass video data and mime type
+            len(media),
         )
 
-        if response.text:
+        if text:
+            logger.info(f"Gemini API returned a response.")
+            return text
+        else:
+            logger.error("Gemini API returned an empty response.")
+            return None
+    except Exception as e:
+        logger.error(f"Error generating text from Gemini API: {e}")
+        return None
+
+
+def generate_text_from_storyboard(prompt, storyboard):
+    """
+    Sends a prompt with keyframes of a recording instead of the video itself. Each
+    frame is preceded by its time, and the audio of the same window follows when the
+    storyboard has it, each clip after its start time, so the model can relate speech
+    to what was on screen.
+
+    Args:
+        prompt (str): The prompt for the Gemini API.
+        storyboard (storyboard_module.Storyboard): Keyframes and optional audio.
+
+    Returns:
+        str: The response from the Gemini API, or None on error.
+    """
+    try:
+        logger.info(f"Attempting to process a storyboard of {len(storyboard.frames)} keyframes with prompt: {prompt}")
+        model = _load_model()
+
+        contents = [prompt, f"Keyframes of the last {storyboard.duration:.1f} seconds of the screen, oldest first. "
+                            "Each image is preceded by its time from the start of the recording."]
+        for seconds, jpeg in storyboard.frames:
+            contents += [f"t = {seconds:.1f} s", {"mime_type": "image/jpeg", "data": jpeg}]
+        for seconds, wav in storyboard.audio:
+            contents += [f"Audio of the same recording, starting at t = {seconds:.1f} s:",
+                         {"mime_type": "audio/wav", "data": wav}]
+
+        text = _generate(model, contents, storyboard.payload_bytes)
+        if text:
             logger.info(f"Gemini API returned a response.")
-            return response.text
+            return text
         else:
             logger.error("Gemini API returned an empty response.")
             return None
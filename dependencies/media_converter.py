@@ -1,46 +1,451 @@
 # media_converter.py
 import logging
-from dependencies import recording_module
+import os
+import shutil
+import struct
+import tempfile
+import time
+import cv2
+import numpy as np
+from dependencies import encoder_module
+# moviepy is optional; without it AudioArrayClip only serves frame lookups
+try:
+    from moviepy.audio.AudioClip import AudioClip
+except ImportError:
+    AudioClip = object
 
 logger = logging.getLogger(__name__)
 
-def convert_to_mp4(buffer):
+# Settings tried, best first, when an export has to fit a byte budget: (scale, frame step,
+# CRF increase). Quality goes first, then frame rate, and resolution last, since text on
+# screen stays legible longest that way.
+BUDGET_LADDER = [
+    (1.0, 1, 0), (1.0, 1, 4), (1.0, 1, 8),
+    (1.0, 2, 8), (0.75, 2, 8), (0.75, 4, 8),
+    (0.5, 4, 8), (0.5, 4, 12), (0.35, 4, 12), (0.25, 8, 14),
+]
+BUDGET_MARGIN = 0.9  # Share of the budget planned for, so estimate errors rarely cost a second encode
+SAFE_BITS_PER_PIXEL = 2.0  # More than even noisy screens take at CRF 23; exports that fit at this rate are not probed
+KEYFRAME_INTERVAL = 250  # Frames between keyframes in x264 and x265 exports, ffmpeg's default
+BUDGET_AUDIO_BITRATE = 64000  # Audio bits per second of budgeted exports, plenty for speech
+
+
+def probe_video(path):
     """
-    Converts the rolling buffer of audio and video frames to an MP4 file.
+    Reads the stream parameters of a video file from its container header, without
+    decoding any frames.
 
     Args:
-        buffer (deque): A deque of (audio_frame, video_frame) tuples
+        path (str): The video file.
 
     Returns:
-        str: The file path to the created MP4 file, or None on failure
+        dict: codec (the fourcc OpenCV reports for the stream, e.g. "FMP4" for MPEG-4 part 2
+        or "h264"), width, height, frame_rate and duration in seconds, or None if the file
+        cannot be opened or holds no frames.
     """
+    capture = cv2.VideoCapture(path)
     try:
-        logger.debug("Calling recording_module.convert_rolling_buffer with buffer")
-        file_path = recording_module.convert_rolling_buffer(buffer)
-        logger.debug(f"Returned file_path = {file_path}")
-        return file_path
+        if not capture.isOpened():
+            return None
+        fourcc = int(capture.get(cv2.CAP_PROP_FOURCC))
+        width = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        frame_rate = capture.get(cv2.CAP_PROP_FPS)
+        frame_count = capture.get(cv2.CAP_PROP_FRAME_COUNT)
+    finally:
+        capture.release()
+    if frame_rate <= 0 or frame_count <= 0:
+        return None
+    return {"codec": "".join(chr((fourcc >> (8 * i)) & 0xFF) for i in range(4)),
+            "width": width,
+            "height": height,
+            "frame_rate": frame_rate,
+            "duration": frame_count / frame_rate}
+
+
+def _stream_signature(info):
+    # Streams can only be copied into one file when all of these agree
+    return info["codec"], info["width"], info["height"], round(info["frame_rate"], 3)
+
+
+def _select_segments(durations, t_start, t_end):
+    """
+    Finds the segments overlapping a window of the joined timeline.
+
+    Returns:
+        tuple: (indices, inpoint, outpoint). inpoint is the start of the window in seconds
+        into the first kept segment, outpoint its end in the last one; either is None when
+        the window does not cut into that segment.
+    """
+    starts = np.concatenate(([0.0], np.cumsum(durations)))
+    total = starts[-1]
+    t_start = max(0.0, t_start or 0.0)
+    t_end = total if t_end is None else min(t_end, total)
+    if t_end <= t_start:
+        raise ValueError(f"Empty window: {t_start:.3f} s to {t_end:.3f} s of {total:.3f} s of video")
+    indices = [i for i in range(len(durations)) if starts[i] < t_end and starts[i + 1] > t_start]
+    inpoint = t_start - starts[indices[0]]
+    outpoint = t_end - starts[indices[-1]]
+    return (indices,
+            float(inpoint) if inpoint > 0 else None,
+            float(outpoint) if outpoint < durations[indices[-1]] else None)
+
+
+def _reencode_videos(paths, infos, filename, inpoint, outpoint, codec, preset, crf):
+    """
+    Joins videos that cannot be stream copied by decoding them and encoding one new
+    stream, scaled (with letterboxing) to the size and frame rate of the first video.
+    """
+    width = infos[0]["width"] + infos[0]["width"] % 2  # 4:2:0 needs even dimensions
+    height = infos[0]["height"] + infos[0]["height"] % 2
+    frame_rate = infos[0]["frame_rate"]
+    arguments, chains = [], []
+    for index, path in enumerate(paths):
+        start = inpoint if index == 0 and inpoint is not None else 0.0
+        if start:
+            arguments += ["-ss", f"{start:.6f}"]
+        if index == len(paths) - 1 and outpoint is not None:
+            arguments += ["-t", f"{outpoint - start:.6f}"]
+        arguments += ["-i", path]
+        chains.append(f"[{index}:v]scale={width}:{height}:force_original_aspect_ratio=decrease,"
+                      f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1,fps={frame_rate}[v{index}]")
+    inputs = "".join(f"[v{index}]" for index in range(len(paths)))
+    graph = ";".join(chains) + f";{inputs}concat=n={len(paths)}:v=1:a=0[v]"
+    arguments += ["-filter_complex", graph, "-map", "[v]"]
+    arguments += encoder_module.video_codec_arguments(codec, preset, crf, pad=False)
+    if filename.lower().endswith(".mp4"):
+        arguments += ["-movflags", "+faststart"]
+    encoder_module.run_ffmpeg(arguments + [filename])
+
+
+def combine_videos(segment_list, output_filename=None, t_start=None, t_end=None, codec="libx264",
+                   preset="veryfast", crf=23):
+    """
+    Joins recorded segments into one video file.
+
+    Segments that share codec, size and frame rate are joined by copying their
+    compressed streams into a new container, so nothing is decoded or re-encoded and
+    30 s of segments take milliseconds. Only when the segments differ are they decoded
+    and re-encoded.
+
+    Args:
+        segment_list (list): Segment files, oldest first, e.g. from
+            RecordingModule.stop_recording_and_get_files().
+        output_filename (str, optional): Output path (.mp4 or .mkv). Defaults to a new temporary mp4.
+        t_start (float, optional): Start of the window to keep, in seconds from the start of the
+            first segment. Segments wholly outside the window are left out. A stream copy has
+            to begin at a keyframe, so the data back to the keyframe before t_start is kept
+            and hidden by the container's edit list; a re-encode cuts exactly.
+        t_end (float, optional): End of the window to keep. Defaults to the end of the last segment.
+        codec (str): Video codec used when re-encoding, see encoder_module.video_codec_arguments().
+        preset (str): Speed preset used when re-encoding.
+        crf (int): Constant rate factor used when re-encoding.
+
+    Returns:
+        str: The file path of the combined video, or None on failure.
+    """
+    try:
+        started = time.perf_counter()
+        paths, infos = [], []
+        for path in segment_list:
+            info = probe_video(path)
+            if info is None:
+                logger.warning(f"Skipping unreadable or empty segment {path}")
+                continue
+            paths.append(path)
+            infos.append(info)
+        if not paths:
+            logger.error("No readable video segments to combine.")
+            return None
+
+        indices, inpoint, outpoint = _select_segments([info["duration"] for info in infos], t_start, t_end)
+        paths = [paths[i] for i in indices]
+        infos = [infos[i] for i in indices]
+
+        if output_filename is None:
+            handle, output_filename = tempfile.mkstemp(suffix=".mp4", prefix="combined_")
+            os.close(handle)
+
+        if len({_stream_signature(info) for info in infos}) == 1:
+            method = "stream copy"
+            encoder_module.concat_videos(paths, output_filename, inpoint=inpoint, outpoint=outpoint)
+        else:
+            method = "re-encode"
+            logger.info("Segments differ in codec, size or frame rate; re-encoding them.")
+            _reencode_videos(paths, infos, output_filename, inpoint, outpoint, codec, preset, crf)
+
+        logger.info(f"Combined {len(paths)} segments into {output_filename} by {method} "
+                    f"in {(time.perf_counter() - started) * 1000:.0f} ms.")
+        return output_filename
     except Exception as e:
-         logger.error(f"Error converting to MP4: {e}")
-         return None
+        logger.error(f"Error combining videos: {e}")
+        return None
+
+
+class AudioArrayClip(AudioClip):
+    """
+    A moviepy audio clip reading raw audio data from a Numpy array.
+
+    Exports are muxed by ffmpeg (see encoder_module), so no export path builds one;
+    the clip serves moviepy scripts and benchmark_module.run_audio_clip().
+    """
+    def __init__(self, arr, fps):
+        """
+        Args:
+            arr (np.ndarray): Raw audio data of shape (n_frames, n_channels).
+            fps (int): Number of frames per second.
+        """
+        if len(arr.shape) != 2:
+            raise ValueError(f"Audio array must have 2 dimensions (n_frames, n_channels), but has {len(arr.shape)} dimensions.")
+        if arr.shape[1] <= 0:
+            raise ValueError(f"Number of channels must be greater than 0, but it was {arr.shape[1]}")
+        if len(arr) == 0:
+            raise ValueError("Audio array must hold at least one frame.")
+
+        if AudioClip is not object:
+            AudioClip.__init__(self)
+        self.arr = arr
+        self.fps = fps
+        self.duration = len(arr) / fps
+        self.end = self.duration
+        self.nchannels = arr.shape[1]
+
+    def make_frame(self, t):
+        """
+        Returns the frames at the times t (in seconds), silence outside the clip.
+
+        moviepy reads audio in chunks of thousands of times at once, so the lookup is one
+        indexing operation over the whole chunk.
+
+        Args:
+            t (float or np.ndarray): A time, or an array of times.
+
+        Returns:
+            np.ndarray: (n_channels,) frame for a single time, (len(t), n_channels) for an array.
+        """
+        single = np.ndim(t) == 0
+        t = np.atleast_1d(np.asarray(t, dtype=np.float64))
+        indices = np.clip((t * self.fps).astype(np.int64), 0, len(self.arr) - 1)
+        frames = self.arr[indices]  # Fancy indexing copies, so silencing below leaves arr alone
+        frames[(t < 0) | (t > self.duration)] = 0
+        return frames[0] if single else frames
+
+    frame_function = make_frame  # The name moviepy 2 reads
+
+
+class BudgetEncoding:
+    """An encoded video fitted to a byte budget, with the settings that were chosen for it."""
+    def __init__(self, data, target_bytes, width, height, frame_rate, crf, attempts, estimate):
+        self.data = data  # The encoded mp4
+        self.target_bytes = target_bytes
+        self.width = width
+        self.height = height
+        self.frame_rate = frame_rate
+        self.crf = crf
+        self.attempts = attempts  # Full encodes made, 1 when the first choice fitted
+        self.estimate = estimate  # Predicted size in bytes, None when the export was small enough not to probe
+
+    @property
+    def size(self):
+        """Bytes of the encoded video."""
+        return len(self.data)
+
+    def __str__(self):
+        return (f"{self.width}x{self.height} at {self.frame_rate:g} fps, CRF {self.crf}: "
+                f"{self.size / 1024:.0f} of {self.target_bytes / 1024:.0f} KiB after {self.attempts} encode(s)")
+
+
+def _scaled_size(width, height, scale):
+    # 4:2:0 needs even dimensions
+    return max(2, int(width * scale) // 2 * 2), max(2, int(height * scale) // 2 * 2)
+
+
+def _resized_frames(frames, size):
+    resized = None  # Reused target
+    for frame in frames:
+        if (frame.shape[1], frame.shape[0]) == size:
+            yield frame
+        else:
+            resized = cv2.resize(frame, size, dst=resized, interpolation=cv2.INTER_AREA)
+            yield resized
+
+
+def _probe_positions(positions, count, runs=3):
+    """
+    Returns:
+        tuple: (sample, run_length). The sample is a few runs of consecutive frames spread over
+        the window, so the probe sees motion the way the encoder will.
+    """
+    if len(positions) <= count:
+        return positions, len(positions)
+    length = max(1, count // runs)
+    starts = np.linspace(0, len(positions) - length, runs).astype(int)
+    return np.concatenate([positions[start:start + length] for start in starts]), length
+
+
+def _frame_sizes(data):
+    # Payload of every mdat box of an mp4 written with frame_fragments, i.e. the size of every frame
+    sizes = []
+    offset = 0
+    while offset + 8 <= len(data):
+        size, kind = struct.unpack_from(">I4s", data, offset)
+        if size == 1:
+            size = struct.unpack_from(">Q", data, offset + 8)[0]  # 64-bit box size
+        elif size == 0:
+            size = len(data) - offset  # Box runs to the end
+        if kind == b"mdat":
+            sizes.append(size - 8)
+        offset += size
+    return np.array(sizes, dtype=np.float64)
+
+
+def _estimate_bytes(sizes, run_length, frame_count):
+    # Every probe run starts with a keyframe, while the export has one every KEYFRAME_INTERVAL
+    # frames, so keyframes and the frames between them are scaled up separately. On a static
+    # screen a keyframe can outweigh a hundred other frames.
+    starts = np.zeros(len(sizes), dtype=bool)
+    starts[::run_length] = True
+    keyframe = sizes[starts].mean()
+    inter = sizes[~starts].mean() if (~starts).any() else keyframe
+    keyframes = min(frame_count, int(np.ceil(frame_count / KEYFRAME_INTERVAL)))
+    return keyframe * keyframes + inter * (frame_count - keyframes)
+
+
+def encode_to_budget(video, positions, frame_rate, target_bytes, audio=None, audio_rate=None, codec="libx264",
+                     preset="veryfast", crf=23, audio_codec="aac", audio_bitrate=BUDGET_AUDIO_BITRATE,
+                     min_frame_rate=1.0, max_attempts=3, max_probes=4, probe_frames=15, pool=None):
+    """
+    Encodes frames into an mp4 in memory that fits a byte budget, e.g. the payload limit
+    of an upload, choosing resolution, frame rate and quality along BUDGET_LADDER.
+
+    Exports small enough to fit at SAFE_BITS_PER_PIXEL are encoded at the best rung
+    straight away. Otherwise the size of a rung is estimated by encoding probe_frames of
+    its frames, measuring keyframes and the frames between them apart, and scaling each
+    up to the whole export. The best rung is probed first; when it is too large, the
+    next probe goes to the rung a simple model (linear in the pixel count, halving every
+    6 CRF, and sqrt(k) times the bytes per frame for every k-th frame) expects to fit,
+    and the search then bisects between the rungs known to be too large and to fit, for
+    at most max_probes probes. Should the full encode still exceed the budget, the next
+    smaller rung expected to fit is encoded, at most max_attempts encodes in all.
+
+    Args:
+        video (RingSnapshot): Frames to encode.
+        positions (np.ndarray): Indices into video, one per output frame at frame_rate.
+        frame_rate (float): Frames per second of positions.
+        target_bytes (int): Size the encoded video must not exceed.
+        audio (np.ndarray, optional): int16 mono samples encoded as the audio track.
+        audio_rate (int, optional): Sample rate of the audio.
+        codec (str): Video codec, see encoder_module.video_codec_arguments(). Quality steps
+            only apply to the codecs in encoder_module.RATE_CONTROLLED_CODECS.
+        preset (str): Encoder speed preset.
+        crf (int): Constant rate factor of the best rung.
+        audio_codec (str): Audio codec.
+        audio_bitrate (int): Audio bits per second, fixed so the audio's share of the budget is known.
+        min_frame_rate (float): Lowest frame rate the ladder may drop to.
+        max_attempts (int): Maximum number of full encodes.
+        max_probes (int): Maximum number of probe encodes.
+        probe_frames (int): Frames encoded per probe.
+        pool (encoder_module.EncoderPool, optional): Pool the full encode of the best rung is
+            acquired from, so a spare it keeps for these settings saves ffmpeg's start-up. Its
+            options then replace codec, preset, crf and audio_codec.
+
+    Returns:
+        BudgetEncoding: The encoded video and the settings used.
+
+    Raises:
+        ValueError: If the budget does not even hold the audio.
+        RuntimeError: If the video does not fit within max_attempts encodes, or ffmpeg fails.
+    """
+    if pool is not None:
+        codec, preset, crf, audio_codec = (pool.options[key] for key in ("codec", "preset", "crf", "audio_codec"))
+    height, width, channels = video.frame_shape
+    pixel_format = "bgra" if channels == 4 else "bgr24"
+    frame_count = len(positions)
+    duration = frame_count / frame_rate
+    audio_bytes = audio_bitrate / 8 * duration if audio is not None else 0
+    budget = target_bytes * BUDGET_MARGIN - audio_bytes
+    if budget <= 0:
+        raise ValueError(f"A budget of {target_bytes} bytes does not hold the audio of {duration:.1f} s.")
+    options = {"codec": codec, "preset": preset, "audio_codec": audio_codec, "audio_bitrate": audio_bitrate}
+
+    rungs = [(scale, step, crf + increase) for scale, step, increase in BUDGET_LADDER
+             if step == 1 or frame_rate / step >= min_frame_rate]
+    # Model of the size of each rung, in units of one full-size frame at the base CRF
+    relative = [np.ceil(frame_count / step) * np.sqrt(step) * scale ** 2 * 2 ** (-(rung_crf - crf) / 6)
+                for scale, step, rung_crf in rungs]
+
+    def encode(index, rung_positions, rung_audio, frame_fragments=False):
+        scale, step, rung_crf = rungs[index]
+        size = _scaled_size(width, height, scale)
+        settings = (size[0], size[1], frame_rate / step, pixel_format, audio_rate if rung_audio is not None else None)
+        if pool is not None and index == 0 and not frame_fragments:
+            # The best rung is the export as captured, the settings the pool keeps a spare for
+            encoder = pool.acquire(*settings, in_memory=True, audio_bitrate=audio_bitrate)
+        else:
+            encoder = encoder_module.StreamingEncoder(*settings, crf=rung_crf, in_memory=True,
+                                                      frame_fragments=frame_fragments, **options)
+        return encoder.encode(_resized_frames(video.iter_frames(rung_positions), size), audio=rung_audio)
+
+    def expected_fit(per_frame, after):
+        # First rung past after that the model expects to fit the budget
+        return next((i for i in range(after + 1, len(rungs)) if per_frame * relative[i] <= budget), len(rungs) - 1)
+
+    estimates = {}  # Probed size of the video track of a rung
+    index = 0
+    if width * height * frame_count * SAFE_BITS_PER_PIXEL / 8 > budget:
+        too_large, index = -1, len(rungs) - 1  # The smallest rung is taken on trust unless probed
+        candidate = 0
+        for _ in range(max_probes):
+            rung_positions = positions[::rungs[candidate][1]]
+            sample, run_length = _probe_positions(rung_positions, probe_frames)
+            sizes = _frame_sizes(encode(candidate, sample, None, frame_fragments=True))
+            estimates[candidate] = _estimate_bytes(sizes, run_length, len(rung_positions))
+            if estimates[candidate] <= budget:
+                index = candidate
+            else:
+                too_large = candidate
+            if index - too_large <= 1:
+                break
+            guess = expected_fit(estimates[candidate] / relative[candidate], too_large)
+            candidate = guess if candidate == too_large and guess < index else (too_large + index) // 2
+
+    data = b""
+    for attempt in range(1, max_attempts + 1):
+        data = encode(index, positions[::rungs[index][1]], audio)
+        scale, step, rung_crf = rungs[index]
+        size = _scaled_size(width, height, scale)
+        if len(data) <= target_bytes:
+            estimate = estimates[index] + audio_bytes if index in estimates else None
+            result = BudgetEncoding(data, target_bytes, size[0], size[1], frame_rate / step, rung_crf, attempt,
+                                    estimate)
+            logger.info(f"Encoded to the byte budget: {result}, {len(estimates)} probe(s).")
+            return result
+        if index == len(rungs) - 1:
+            break
+        # Scale the model by the miss and move on to the best smaller rung that should fit now
+        logger.info(f"{size[0]}x{size[1]} at {frame_rate / step:g} fps, CRF {rung_crf} took {len(data) / 1024:.0f} "
+                    f"KiB, over the {target_bytes / 1024:.0f} KiB budget; retrying smaller.")
+        index = expected_fit(max(len(data) - audio_bytes, 1) / relative[index], index)
+    raise RuntimeError(f"Could not fit the video into {target_bytes} bytes in {max_attempts} encodes; "
+                       f"the last one took {len(data)} bytes.")
+
 
 if __name__ == '__main__':
-    # Example Usage (this won't work without setting up recording_module to return a deque)
-    # and a way to import deque, and the rest of the dependencies
-    # Also, recording_module.convert_rolling_buffer can not return None
-    class FakeBuffer:
-         def __init__(self):
-            self.buffer = []
-            
-         def __getitem__(self, index):
-            return self.buffer[index]
-
-         def __len__(self):
-            return len(self.buffer)
-
-    fake_buffer = FakeBuffer()
-    fake_buffer.buffer = [("audio1","video1"),("audio2","video2")] 
-    output_path = convert_to_mp4(fake_buffer)
+    # Example usage: write three short segments and join them
+    segment_dir = tempfile.mkdtemp(prefix="pyassistant_segments_")
+    segments = []
+    try:
+        for index in range(3):
+            path = os.path.join(segment_dir, f"segment_{index:05d}.mp4")
+            writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), 30, (320, 240))
+            for frame_index in range(60):
+                writer.write(np.full((240, 320, 3), (index * 60 + frame_index) % 256, dtype=np.uint8))
+            writer.release()
+            segments.append(path)
+        output_path = combine_videos(segments, t_start=0.5, t_end=5.5)
+    finally:
+        shutil.rmtree(segment_dir, ignore_errors=True)
     if output_path:
-        print(f"MP4 file created at: {output_path}")
+        print(output_path)
     else:
-        print("MP4 conversion failed")
+        print("Combining the segments failed")
@@ -1,113 +1,730 @@
 import cv2
 import numpy as np
-import pyaudio
 import wave
 import time
 import threading
-from collections import deque
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import keyboard  # For detecting hotkeys
-import mss  # For screen capture
+from dependencies import config_module, media_converter
+from dependencies.capture_backend_module import make_audio_backend, make_video_backend
+from dependencies.encoder_module import EncoderPool, SegmentEncoder, StreamingEncoder, run_ffmpeg
+from dependencies.vad_module import mute_silence, speech_ratio, speech_segments
+from dependencies.ring_buffer_module import (AudioRing, SharedAudioRing, SharedFrameRing, make_frame_ring,
+                                             resample_positions)
+
+logger = logging.getLogger(__name__)
+
+# cv2 interpolation flags for the capture resolution policy
+INTERPOLATION_FLAGS = {
+    "nearest": cv2.INTER_NEAREST,
+    "linear": cv2.INTER_LINEAR,
+    "area": cv2.INTER_AREA,
+    "cubic": cv2.INTER_CUBIC,
+    "lanczos": cv2.INTER_LANCZOS4,
+}
+
+
+def compute_capture_size(native_width, native_height, capture_resolution=None, frame_count=1, channels=3):
+    """
+    Works out the resolution frames are stored at from the capture resolution policy.
+
+    Args:
+        native_width (int): Width of the captured screen.
+        native_height (int): Height of the captured screen.
+        capture_resolution (dict, optional): The policy, one of
+            {"mode": "native"},
+            {"mode": "width", "width": 1280},
+            {"mode": "max_pixels", "max_pixels": 1000000},
+            {"mode": "scale", "scale": 0.5} or
+            {"mode": "auto", "byte_budget": 300000000}, where the byte budget covers the whole window.
+            None means native.
+        frame_count (int): Number of frames in the buffer window, used by "auto".
+        channels (int): Bytes per stored pixel, used by "auto".
+
+    Returns:
+        tuple: (width, height) of the stored frames. Frames are never upscaled, and
+        downscaled sizes are rounded to even numbers for the video encoders.
+    """
+    mode = (capture_resolution or {}).get("mode", "native")
+    native_pixels = native_width * native_height
+
+    if mode == "native":
+        scale = 1.0
+    elif mode == "width":
+        scale = capture_resolution["width"] / native_width
+    elif mode == "max_pixels":
+        scale = (capture_resolution["max_pixels"] / native_pixels) ** 0.5
+    elif mode == "scale":
+        scale = capture_resolution["scale"]
+    elif mode == "auto":
+        pixels_per_frame = capture_resolution["byte_budget"] / (max(frame_count, 1) * channels)
+        scale = (pixels_per_frame / native_pixels) ** 0.5
+    else:
+        raise ValueError(f"Unknown capture resolution mode: {mode}")
+
+    if scale >= 1.0:
+        return native_width, native_height
+    width = max(2, int(native_width * scale) // 2 * 2)
+    height = max(2, int(native_height * scale) // 2 * 2)
+    return width, height
+
+
+def frame_signature(frame, step=8):
+    """
+    Returns a cheap fingerprint of a frame for change detection: every step-th
+    pixel in both directions, colour channels only.
+
+    Args:
+        frame (np.ndarray): Frame of shape (height, width, channels).
+        step (int): Sampling stride. 8 looks at 1/64th of the pixels.
+
+    Returns:
+        np.ndarray: The sampled pixels (a copy, so the frame may be reused afterwards).
+    """
+    return frame[::step, ::step, :3].copy()
+
+
+def frame_changed(signature, previous_signature, threshold=0.0):
+    """
+    Compares two frame signatures.
+
+    Args:
+        signature (np.ndarray): Signature of the new frame.
+        previous_signature (np.ndarray): Signature of the previous frame, or None.
+        threshold (float): Fraction of sampled pixels that must differ for the frame to
+            count as changed. 0 treats any difference as a change.
+
+    Returns:
+        bool: True if the frame differs from the previous one.
+    """
+    return frame_difference(signature, previous_signature) > threshold
+
+
+def frame_difference(signature, previous_signature):
+    """
+    Measures how much of the screen changed between two frame signatures.
+
+    Args:
+        signature (np.ndarray): Signature of the new frame.
+        previous_signature (np.ndarray): Signature of the previous frame, or None.
+
+    Returns:
+        float: Fraction of sampled pixels that differ, from 0 (identical) to 1. A missing
+        or differently sized previous signature counts as a full change.
+    """
+    if previous_signature is None or previous_signature.shape != signature.shape:
+        return 1.0
+    changed_pixels = np.count_nonzero(np.any(signature != previous_signature, axis=2))
+    return changed_pixels / (signature.shape[0] * signature.shape[1])
+
+
+class AdaptiveRate:
+    """
+    Picks the capture rate from how much the screen is changing: the floor rate
+    while it is static, rising linearly with the changed fraction of the screen
+    up to the ceiling. Increases take effect at once; after motion stops, the
+    rate is held for hold seconds before it drops, so brief pauses in scrolling
+    or video playback do not lose detail.
+    """
+    def __init__(self, floor=0.5, ceiling=5, saturation=0.02, hold=1.0):
+        """
+        Args:
+            floor (float): Captures per second while nothing changes.
+            ceiling (float): Highest captures per second.
+            saturation (float): Changed fraction of the sampled pixels that selects the ceiling.
+            hold (float): Seconds to keep a raised rate after the motion that caused it.
+        """
+        if not 0 < floor <= ceiling:
+            raise ValueError(f"Adaptive rate needs 0 < floor <= ceiling, but got floor={floor}, ceiling={ceiling}")
+        self.floor = floor
+        self.ceiling = ceiling
+        self.saturation = saturation
+        self.hold = hold
+        self.rate = ceiling  # Start high until the first comparison says otherwise
+        self.raised_at = None
+
+    def update(self, motion, now):
+        """
+        Args:
+            motion (float): Result of frame_difference() for the latest frame.
+            now (float): Monotonic time of the latest frame.
+
+        Returns:
+            float: The rate to capture at until the next frame.
+        """
+        target = self.floor + (self.ceiling - self.floor) * min(motion / self.saturation, 1.0)
+        if target >= self.rate:
+            self.rate = target
+            self.raised_at = now
+        elif self.raised_at is None or now - self.raised_at >= self.hold:
+            self.rate = target
+        return self.rate
+
+
+def to_bgr(frame, out=None):
+    """
+    Returns a frame as 3-channel BGR, converting deferred BGRA grabs on demand.
+
+    Args:
+        frame (np.ndarray): BGR or BGRA frame.
+        out (np.ndarray, optional): Reusable destination for the conversion.
+
+    Returns:
+        np.ndarray: The BGR frame (the input itself if it already was BGR).
+    """
+    if frame.shape[2] == 3:
+        return frame
+    return cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR, dst=out)
+
+
+def _warn_lost_frames(video):
+    # Frames capture overwrote mid-read were replaced by the previous frame in the output
+    if video.lost_frames:
+        logger.warning(f"{video.lost_frames} frames were overwritten by capture before they were written.")
+
+
+class FramePacer:
+    """
+    Paces a capture loop against absolute deadlines on the monotonic clock.
+
+    Time spent capturing is absorbed into the period instead of added to it, so
+    the loop runs at the configured rate. When it falls more than a period behind,
+    the missed ticks are skipped explicitly and counted as dropped frames rather
+    than being caught up in a burst.
+    """
+    def __init__(self, frame_rate, clock=time.monotonic, sleep=time.sleep):
+        """
+        Args:
+            frame_rate (float): Target ticks per second.
+            clock (callable): Monotonic clock returning seconds.
+            sleep (callable): Sleep function, replaceable for testing.
+        """
+        self.period = 1.0 / frame_rate
+        self.clock = clock
+        self.sleep = sleep
+        self.start_time = clock()
+        self.next_deadline = self.start_time + self.period
+        self.frames = 0  # Ticks completed
+        self.late_frames = 0  # Ticks whose work overran the deadline
+        self.dropped_frames = 0  # Ticks skipped because the loop fell behind
+
+    def set_rate(self, frame_rate):
+        """
+        Changes the rate from the next tick on. The next deadline moves to one new period after
+        the previous one, or one new period from now if that has already passed.
+
+        Args:
+            frame_rate (float): New ticks per second.
+        """
+        period = 1.0 / frame_rate
+        if period == self.period:
+            return
+        self.next_deadline += period - self.period
+        self.period = period
+        now = self.clock()
+        if self.next_deadline < now:
+            self.next_deadline = now + period
+
+    def wait(self):
+        """
+        Call once per completed frame. Sleeps until the next deadline, or skips ahead
+        if it has already passed.
+
+        Returns:
+            int: Number of ticks dropped before the next frame.
+        """
+        self.frames += 1
+        now = self.clock()
+        if now < self.next_deadline:
+            self.sleep(self.next_deadline - now)
+            self.next_deadline += self.period
+            return 0
+
+        self.late_frames += 1
+        dropped = int((now - self.next_deadline) // self.period)
+        self.dropped_frames += dropped
+        self.next_deadline += (dropped + 1) * self.period
+        return dropped
+
+    def stats(self):
+        """
+        Returns:
+            dict: achieved_fps, late_frames and dropped_frames since the pacer was created.
+        """
+        elapsed = self.clock() - self.start_time
+        return {
+            "target_fps": 1.0 / self.period,
+            "achieved_fps": self.frames / elapsed if elapsed > 0 else 0.0,
+            "late_frames": self.late_frames,
+            "dropped_frames": self.dropped_frames,
+        }
+
+
+def normalize_source(spec, default_frame_rate):
+    """
+    Turns a capture source description into a capture area and frame rate.
+
+    Args:
+        spec: One of
+            an int monitor index (1 is the main monitor, as numbered by mss),
+            "all" for every monitor stitched into one frame,
+            {"monitor": 2} or {"region": [left, top, width, height]} in absolute
+            desktop coordinates, optionally with a "frame_rate" key.
+        default_frame_rate (float): Frame rate for sources that do not set one.
+
+    Returns:
+        tuple: (area, frame_rate), where area is {"monitor": index} or {"region": (left, top, width, height)}.
+    """
+    if spec == "all":
+        spec = {"monitor": 0}  # mss lists the combined virtual screen as monitor 0
+    elif isinstance(spec, int):
+        spec = {"monitor": spec}
+    if not isinstance(spec, dict):
+        raise ValueError(f"Invalid capture source: {spec!r}")
+
+    frame_rate = spec.get("frame_rate", default_frame_rate)
+    if frame_rate <= 0:
+        raise ValueError(f"Capture source frame rate must be greater than 0, but it was {frame_rate}")
+    if "region" in spec:
+        left, top, width, height = (int(value) for value in spec["region"])
+        if width <= 0 or height <= 0:
+            raise ValueError(f"Capture region must have a positive size, but it was {width}x{height}")
+        return {"region": (left, top, width, height)}, frame_rate
+    if "monitor" in spec:
+        return {"monitor": int(spec["monitor"])}, frame_rate
+    raise ValueError(f"Capture source needs a 'monitor' or 'region' key: {spec!r}")
+
+
+class VideoSource:
+    """
+    One capture area (a monitor, a rectangle, or all monitors stitched) with its
+    own frame rate, ring buffer, pacer and statistics. Every source is captured
+    by its own thread, so a small region can run at a higher rate than the desktop.
+    """
+    def __init__(self, area, frame_rate, video_buffer):
+        """
+        Args:
+            area (dict): Capture area from normalize_source().
+            frame_rate (float): Captures per second for this source.
+            video_buffer: FrameRing or EncodedFrameRing the frames go into.
+        """
+        self.area = area
+        self.frame_rate = frame_rate
+        self.video_buffer = video_buffer
+        self.capture_size = None  # (width, height) frames are stored at, set on the first grab
+        self.capture_stats = {"frames_captured": 0, "duplicate_frames": 0}
+        self.pacer = None  # FramePacer of the running capture loop
+
+    @property
+    def name(self):
+        """A short description of the capture area, for logs and file names."""
+        if "region" in self.area:
+            return "region_{}_{}_{}x{}".format(*self.area["region"])
+        if self.area["monitor"] == 0:
+            return "all_monitors"
+        return f"monitor_{self.area['monitor']}"
+
+    def resolve(self, sct):
+        """
+        Args:
+            sct: An mss instance.
+
+        Returns:
+            dict: The area in the form mss.grab() expects.
+        """
+        if "region" in self.area:
+            left, top, width, height = self.area["region"]
+            return {"left": left, "top": top, "width": width, "height": height}
+        return sct.monitors[self.area["monitor"]]
+
 
 class RollingVideoBuffer:
-    def __init__(self, video_duration=30, audio_duration=30, frame_rate=5, audio_rate=44100):
+    def __init__(self, video_duration=30, audio_duration=30, frame_rate=5, audio_rate=44100, storage="raw", quality=80,
+                 capture_resolution=None, interpolation="area", dedup=False, dedup_threshold=0.0, defer_color=False,
+                 sources=None, audio_backend="pyaudio", audio_block_size=1024, capture_process=False,
+                 video_backend="mss", adaptive_rate=None, encoder=None):
+        """
+        Args:
+            video_duration (int): Seconds of video kept in the buffer.
+            audio_duration (int): Seconds of audio kept in the buffer.
+            frame_rate (int): Screen captures per second, for sources that do not set their own.
+            audio_rate (int): Audio sample rate in Hz.
+            storage (str): How frames are held in memory. "raw" keeps uncompressed frames in a
+                preallocated array, "jpeg" or "webp" encode each frame on capture and decode on dump.
+            quality (int): Encoder quality (0-100) for the "jpeg" and "webp" storage modes.
+            capture_resolution (dict, optional): Resolution frames are stored at, applied right
+                after each grab. See compute_capture_size() for the accepted policies.
+            interpolation (str): Resize filter, one of INTERPOLATION_FLAGS.
+            dedup (bool): If True, frames whose signature matches the newest stored frame are stored
+                as a reference to its slot instead of being converted and copied again.
+            dedup_threshold (float): Fraction of sampled pixels that must change for a frame to
+                be stored again (see frame_changed()).
+            defer_color (bool): If True, the raw BGRA grab is copied into the ring as-is and the
+                BGRA to BGR conversion only happens when frames are exported. Requires storage="raw".
+            sources (list, optional): Areas to capture, each with its own thread, ring buffer and
+                optional frame rate (see normalize_source()). Defaults to the main monitor. The first
+                source is the primary one used by video_buffer and the segment recorder.
+            audio_backend: Audio capture backend, "pyaudio", "sounddevice" or "synthetic", a dict with
+                a "type" and options, or a backend instance (see capture_backend_module). Every backend
+                delivers audio through a callback that copies each block straight into the audio ring.
+            audio_block_size (int): Samples per audio callback.
+            capture_process (bool): If True, capture runs in a child process that writes into
+                shared-memory rings, so encoding and uploads in this process cannot slow it down.
+                This process reads the rings through zero-copy views. Requires storage="raw", and
+                the capture and audio counters stay in the child.
+            video_backend: Screen capture backend, "mss" or "synthetic", a dict with a "type" and
+                options, or a backend instance (see capture_backend_module).
+            adaptive_rate (dict, optional): Enables motion-adaptive capture. Each source then captures
+                between "floor" fps (default 0.5) on a static screen and "ceiling" fps (default the
+                source's frame rate) during motion, see AdaptiveRate for the other keys. Frames keep
+                their capture timestamps, so exports still play back in real time.
+            encoder (dict, optional): Encode dumps and exports with a pre-spawned ffmpeg process fed
+                raw frames over a pipe, muxing the audio in the same pass. Keys are the EncoderPool
+                arguments ("codec", "preset", "crf", "audio_codec"). Defaults to cv2's mp4v writer.
+                A "workers" key other than 1 (None for one per core) splits long exports into time
+                segments encoded in parallel processes, see SegmentEncoder. Raw frames then live in
+                shared memory so the workers read them without copies.
+        """
+        if defer_color and storage != "raw":
+            raise ValueError("defer_color requires storage='raw', compressed frames must be converted before encoding.")
+        if capture_process and storage != "raw":
+            raise ValueError("capture_process requires storage='raw', only raw frames can be shared between processes.")
+
         self.video_duration = video_duration  # in seconds
         self.audio_duration = audio_duration  # in seconds
         self.frame_rate = frame_rate
         self.audio_rate = audio_rate
-        self.video_buffer = deque(maxlen=video_duration * frame_rate)  # buffer for frames
-        self.audio_buffer = deque(maxlen=audio_duration * audio_rate)  # buffer for audio samples
+        self.storage = storage
+        self.capture_resolution = capture_resolution
+        self.interpolation = INTERPOLATION_FLAGS[interpolation]
+        self.dedup = dedup
+        self.dedup_threshold = dedup_threshold
+        self.defer_color = defer_color
+        self.frame_format = "bgra" if defer_color else "bgr"  # Channel layout of the stored frames
+        self.adaptive_rate = adaptive_rate
+        self.sources = []
+        for spec in sources or [1]:
+            area, source_rate = normalize_source(spec, frame_rate)
+            # Size the ring so it holds the whole window even at the highest rate
+            capacity_rate = max(source_rate, (adaptive_rate or {}).get("ceiling", source_rate))
+            ring = make_frame_ring(int(video_duration * capacity_rate), storage, quality)  # ring of frames
+            self.sources.append(VideoSource(area, source_rate, ring))
+        self.video_buffer = self.sources[0].video_buffer  # Primary source
+        self.audio_buffer = AudioRing(audio_duration * audio_rate)  # exactly audio_duration seconds of int16 samples
+        self.video_backend = make_video_backend(video_backend)
+        self.audio_backend = make_audio_backend(audio_backend)
+        self.audio_block_size = audio_block_size
+        self.audio_stats = {"blocks": 0, "samples": 0, "overflows": 0, "underflows": 0, "callback_errors": 0}
         self.running = False
         #no more main monitor attribute
-        self.audio_stream = None
-        self.lock = threading.Lock()
+        self.capture_process = capture_process
+        # Everything the child process needs to rebuild this buffer
+        self._process_settings = {
+            "video_duration": video_duration, "audio_duration": audio_duration, "frame_rate": frame_rate,
+            "audio_rate": audio_rate, "storage": storage, "quality": quality,
+            "capture_resolution": capture_resolution, "interpolation": interpolation, "dedup": dedup,
+            "dedup_threshold": dedup_threshold, "defer_color": defer_color, "sources": sources,
+            "audio_backend": audio_backend, "audio_block_size": audio_block_size, "video_backend": video_backend,
+            "adaptive_rate": adaptive_rate, "encoder": None,  # The child never encodes
+        }
+        self._process = None
+        self._stop_event = None
+        self._frame_watcher = None  # Wakes frame_ready waiters for frames the capture process commits
+        self._threads = []
+        # A process lock also works between threads; it is only needed when capture runs in a child.
+        # The child is spawned, so the lock and stop event come from the spawn context too.
+        self._process_context = multiprocessing.get_context("spawn")
+        self.lock = self._process_context.Lock() if capture_process else threading.Lock()
+        self.frame_ready = threading.Condition(self.lock)  # Notified after every committed frame
+        self._dump_executor = None  # Worker for dump_async(), created on first use
+        self._encoder_pool = None
+        self._segment_encoder = None
+        if encoder:
+            encoder = dict(encoder)
+            workers = encoder.pop("workers", 1)
+            self._encoder_pool = EncoderPool(**encoder)
+            if workers != 1:
+                self._segment_encoder = SegmentEncoder(workers, **encoder)
+        self._shared_video = False  # True while the in-process rings are SharedFrameRings
 
     def start(self):
         self.running = True
+        if self.capture_process:
+            self._start_capture_process()
+            return
+        if self._segment_encoder is not None and self.storage == "raw":
+            self._share_video_rings()  # Lets the encoder workers read frames in place
         
-        # Setup PyAudio for audio capture
-        self.audio_stream = pyaudio.PyAudio()
-        self.stream = self.audio_stream.open(format=pyaudio.paInt16,
-                                             channels=1,
-                                             rate=self.audio_rate,
-                                             input=True,
-                                             frames_per_buffer=1024)
+        # Audio arrives through callbacks on the backend's thread, no capture thread needed
+        self.audio_backend.start(self.audio_rate, self.audio_block_size, self._store_audio_block)
         
-        # Start video capture thread
-        video_thread = threading.Thread(target=self._capture_video)
-        video_thread.start()
+        # Start one video capture thread per source
+        self._threads = []
+        for source in self.sources:
+            video_thread = threading.Thread(target=self._capture_video, args=(source,))
+            video_thread.start()
+            self._threads.append(video_thread)
+
+    def _share_video_rings(self):
+        # The shared rings are sized here; capture computes the same size from the same source
+        channels = 4 if self.defer_color else 3
+        for source in self.sources:
+            grabber = self.video_backend.open(source)
+            native_width, native_height = grabber.size
+            grabber.close()
+            source.capture_size = compute_capture_size(native_width, native_height, self.capture_resolution,
+                                                       source.video_buffer.capacity, channels)
+            width, height = source.capture_size
+            source.video_buffer = SharedFrameRing(source.video_buffer.capacity, (height, width, channels))
+        self.video_buffer = self.sources[0].video_buffer
+        self._shared_video = True
+
+    def _release_video_rings(self, detach=False):
+        for source in self.sources:
+            ring = source.video_buffer
+            if detach:
+                source.video_buffer = ring.detach()  # Keeps the frames readable after stop()
+            ring.close()
+            ring.unlink()
+        self.video_buffer = self.sources[0].video_buffer
+        self._shared_video = False
+
+    def _start_capture_process(self):
+        self._share_video_rings()
+        self.audio_buffer = SharedAudioRing(self.audio_buffer.capacity, self.audio_buffer.channels)
+
+        # Spawned rather than forked: the hotkey and audio threads are running, and forking a
+        # threaded process can leave a lock held in the child
+        self._stop_event = self._process_context.Event()
+        self._process = self._process_context.Process(target=_run_capture_process, name="capture",
+                                                      args=(self._process_settings,
+                                                            [source.video_buffer for source in self.sources],
+                                                            self.audio_buffer, self.lock, self._stop_event),
+                                                      daemon=True)
+        self._process.start()
+        logger.info(f"Capture process started (pid {self._process.pid}).")
+        self._frame_watcher = threading.Thread(target=self._watch_shared_rings, daemon=True)
+        self._frame_watcher.start()
+
+    def _watch_shared_rings(self):
+        # frame_ready is only notified in the process that commits the frame, so the parent polls
+        # the shared write counters, four times per frame at the highest rate, and notifies for the child
+        ceiling = (self.adaptive_rate or {}).get("ceiling", 0)
+        interval = 0.25 / max(max(source.frame_rate, ceiling) for source in self.sources)
+        rings = [source.video_buffer for source in self.sources]
+        sequences = [ring.sequence for ring in rings]
+        while not self._stop_event.wait(interval):
+            current = [ring.sequence for ring in rings]
+            if current != sequences:
+                sequences = current
+                with self.frame_ready:
+                    self.frame_ready.notify_all()
+
+    def _stop_capture_process(self):
+        self._stop_event.set()
+        self._frame_watcher.join()
+        self._frame_watcher = None
+        self._process.join(timeout=5)
+        if self._process.is_alive():
+            logger.warning("Capture process did not stop in time, terminating it.")
+            self._process.terminate()
+            self._process.join()
+        self._process = None
+        # Local copies keep the buffer readable after stop(), like the in-process shared rings
+        self._release_video_rings(detach=True)
+        shared_audio, self.audio_buffer = self.audio_buffer, self.audio_buffer.detach()
+        shared_audio.close()
+        shared_audio.unlink()
         
-        # Start audio capture thread
-        audio_thread = threading.Thread(target=self._capture_audio)
-        audio_thread.start()
 
-    def _capture_video(self):
-        # Create a new mss context for this thread
-        monitor = mss.mss()
+    def _capture_video(self, source):
+        # Each thread gets its own grabber (mss contexts are not thread safe)
+        grabber = self.video_backend.open(source)
+        ring = source.video_buffer
+        native_size = None
+        resized = None  # Reused BGRA frame the grab is downscaled into
+        previous_signature = None  # Of the previous grab, for the adaptive rate
+        stored_signature = None  # Of the newest stored frame, for dedup
+        adaptive = None
+        if self.adaptive_rate:
+            adaptive = AdaptiveRate(**dict({"ceiling": source.frame_rate}, **self.adaptive_rate))
+        source.pacer = FramePacer(adaptive.rate if adaptive else source.frame_rate)
+        warm_encoder = self._encoder_pool is not None and source is self.sources[0]
+        channels = 4 if self.defer_color else 3  # Deferred grabs are stored as BGRA
 
         while self.running:
              try:
-                # Capture screen using mss
-                screen_capture = monitor.grab(monitor.monitors[1])
-                frame = np.array(screen_capture)
-                frame = cv2.cvtColor(frame, cv2.COLOR_RGBA2BGR)  # Convert RGBA to BGR
+                # Capture the source area; the BGRA frame is a view of the grabber's buffer, no copy
+                frame = grabber.grab()
+                timestamp = time.monotonic()  # Shared clock for pacing and export
+
+                # Downscale right after the grab so everything downstream handles fewer bytes
+                if native_size != (frame.shape[1], frame.shape[0]):
+                    native_size = (frame.shape[1], frame.shape[0])
+                    source.capture_size = compute_capture_size(native_size[0], native_size[1], self.capture_resolution,
+                                                               ring.capacity, channels)
+                    resized = None
+                if source.capture_size != native_size:
+                    if resized is None:
+                        resized = np.empty((source.capture_size[1], source.capture_size[0], 4), dtype=np.uint8)
+                    cv2.resize(frame, source.capture_size, dst=resized, interpolation=self.interpolation)
+                    frame = resized
+
+                # A diff of a sparse pixel sample drives both dedup and the adaptive rate.
+                # Unchanged frames skip conversion and storage entirely. Dedup compares with the
+                # newest stored frame rather than the previous grab, so slow changes add up.
+                duplicate = False
+                if self.dedup or adaptive is not None:
+                    signature = frame_signature(frame)
+                    motion = frame_difference(signature, previous_signature)
+                    previous_signature = signature
+                    duplicate = self.dedup and frame_difference(signature, stored_signature) <= self.dedup_threshold
+
+                # Write straight into the oldest slot of the ring (or the encoder's scratch frame).
+                # Only the bookkeeping happens under the lock; snapshots detect a slot refilled mid-read.
+                duplicate = duplicate and len(ring) > 0
+                if not duplicate:
+                    with self.lock:
+                        slot = ring.next_slot((frame.shape[0], frame.shape[1], channels))
+                    if self.defer_color:
+                        # A single copy of the grab; conversion waits until the frame is exported
+                        np.copyto(slot, frame)
+                    else:
+                        cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR, dst=slot)  # mss grabs are BGRA
+                    ring.seal()  # Encodes the frame in the compressed storage modes
+                    if self.dedup:
+                        stored_signature = signature
 
-                # Store the frame in the video buffer
                 with self.lock:
-                    self.video_buffer.append(frame)
+                    if duplicate:
+                        ring.commit_duplicate(timestamp)
+                        source.capture_stats["duplicate_frames"] += 1
+                    else:
+                        ring.commit(timestamp)
+                    source.capture_stats["frames_captured"] += 1
+                    self.frame_ready.notify_all()
+
+                if warm_encoder:
+                    # Start ffmpeg now that the frame size is known, so the first dump does not wait for it
+                    warm_encoder = False
+                    self._prepare_encoder(ring.frame_shape, source.frame_rate)
 
-                # Sleep for the frame rate
-                time.sleep(1 / self.frame_rate)
+                # Sleep until the next deadline, skipping ticks if capture fell behind
+                if adaptive is not None:
+                    source.pacer.set_rate(adaptive.update(motion, timestamp))
+                source.pacer.wait()
              except Exception as e:
-                print(f"Error in _capture_video: {e}")
+                print(f"Error in _capture_video ({source.name}): {e}")
                 break # or handle appropriately
 
 
-        monitor.close() #Close mss context
+        grabber.close()
 
 
-    def _capture_audio(self):
-        while self.running:
-            audio_data = self.stream.read(1024)
-            audio_samples = np.frombuffer(audio_data, dtype=np.int16)
+    def _prepare_encoder(self, frame_shape, frame_rate):
+        height, width, channels = frame_shape
+        try:
+            # Requests are encoded in memory (export_bytes()), with the audio bitrate a byte budget is
+            # planned with; exports to files spawn their own encoder
+            self._encoder_pool.prepare(width, height, frame_rate, "bgra" if channels == 4 else "bgr24", self.audio_rate,
+                                       in_memory=True, audio_bitrate=media_converter.BUDGET_AUDIO_BITRATE)
+            if self._segment_encoder is not None:
+                self._segment_encoder.prepare()
+        except Exception as e:
+            logger.warning(f"Could not pre-spawn the encoder: {e}")
 
-            # Store the audio data in the audio buffer
+    def _store_audio_block(self, samples, latency, overflow, underflow):
+        # Runs on the audio driver's thread. An xrun is counted and capture carries on;
+        # an exception here would stop the stream, so every error is swallowed and counted.
+        try:
+            # Stamp the block on the video clock: the first sample was captured one block
+            # (or the driver-reported input latency) before the callback ran
+            if not 0 < latency < 1:
+                latency = len(samples) / self.audio_rate
+            timestamp = time.monotonic() - latency
             with self.lock:
-                self.audio_buffer.append(audio_samples)
+                self.audio_buffer.write(samples, timestamp)
+                self.audio_stats["blocks"] += 1
+                self.audio_stats["samples"] += len(samples)
+                if overflow:
+                    self.audio_stats["overflows"] += 1
+                if underflow:
+                    self.audio_stats["underflows"] += 1
+        except Exception:
+            self.audio_stats["callback_errors"] += 1
 
     def stop(self):
         self.running = False
-        if self.stream:
-            self.stream.stop_stream()
-            self.stream.close()
-        if self.audio_stream:
-            self.audio_stream.terminate()
+        if self._process is not None:
+            self._stop_capture_process()  # The child stops its own backends
+        else:
+            self.audio_backend.stop()
+        for video_thread in self._threads:
+            video_thread.join(timeout=5)
+        self._threads = []
+        if self._dump_executor is not None:
+            self._dump_executor.shutdown(wait=True)
+            self._dump_executor = None
+        if self._encoder_pool is not None:
+            self._encoder_pool.close()
+        if self._segment_encoder is not None:
+            self._segment_encoder.close()
+        if self._shared_video:
+            self._release_video_rings(detach=True)
+
+    def snapshot(self):
+        """
+        Takes an immutable view of the video and audio rings. The lock is only held while
+        index arrays are copied, so capture is not interrupted.
+
+        Returns:
+            BufferSnapshot: The snapshot, readable without the lock.
+        """
+        with self.lock:
+            return BufferSnapshot([source.video_buffer.snapshot() for source in self.sources],
+                                  [source.frame_rate for source in self.sources],
+                                  self.audio_buffer.snapshot(), self.audio_rate, self.video_duration)
+
+    def dump_to_disk(self, video_filename=None, audio_filename=None, snapshot=None):
+        """
+        Writes the buffer to disk. Encoding runs from a snapshot without holding the lock,
+        so both capture threads keep appending while the files are written.
+
+        Args:
+            video_filename (str, optional): Path for the mp4 video of the primary source. Further
+                sources are written next to it with a "_<source name>" suffix. With an encoder
+                configured, the primary video also carries the audio of the same time span.
+            audio_filename (str, optional): Path for the WAV audio.
+            snapshot (BufferSnapshot, optional): Snapshot to write. Defaults to a new one.
+        """
+        if snapshot is None:
+            snapshot = self.snapshot()
 
-    def dump_to_disk(self, video_filename=None, audio_filename=None):
         # Dump video buffer to disk
         if video_filename:
-            with self.lock:
-                if not self.video_buffer:  # Check if the buffer is empty
-                    print("No video frames in the buffer to write.")
-                    return
-                
-                # Get the dimensions from the first frame in the buffer
-                first_frame = self.video_buffer[0]
-                height, width, _ = first_frame.shape  # Correct unpacking for color frames
-                
-                # Choose a better codec and filename extension for wider compatibility
-                fourcc = cv2.VideoWriter_fourcc(*'mp4v')  # or 'avc1' for linux
-                out_video = cv2.VideoWriter(video_filename, fourcc, self.frame_rate, (width, height))
-
-                for frame in self.video_buffer:
-                    out_video.write(frame)
-
-                out_video.release()
-        
+            if not len(snapshot.video):  # Check if the buffer is empty
+                print("No video frames in the buffer to write.")
+                return
+
+            base, extension = os.path.splitext(video_filename)
+            for index, (video, frame_rate) in enumerate(zip(snapshot.videos, snapshot.frame_rates)):
+                filename = video_filename if index == 0 else f"{base}_{self.sources[index].name}{extension}"
+                t_start = snapshot.window(index)[0]
+                positions = resample_positions(video.timestamps, frame_rate, t_start)
+                audio = None
+                if index == 0 and self._encoder_pool is not None and snapshot.audio.time_range(self.audio_rate):
+                    audio = snapshot.audio.time_window(t_start, t_start + len(positions) / frame_rate, self.audio_rate)
+                self._write_video(video, frame_rate, filename, positions, audio)
+
         # Dump audio buffer to disk
         if audio_filename:
-            with self.lock:
-                audio_data = np.concatenate(list(self.audio_buffer))
+            audio_data = snapshot.audio.to_array()  # Two slice copies, oldest first
 
             with wave.open(audio_filename, 'wb') as wf:
                 wf.setnchannels(1)
@@ -115,13 +732,616 @@ class RollingVideoBuffer:
                 wf.setframerate(self.audio_rate)
                 wf.writeframes(audio_data.tobytes())
 
-    def get_video_buffer(self):
+    def _write_video(self, video, frame_rate, video_filename, positions=None, audio=None):
+        if not len(video):
+            print(f"No video frames to write to {video_filename}.")
+            return
+
+        # Map the capture timestamps onto a constant-rate timeline so the file plays back
+        # in real time. Duplicates repeat their source frame.
+        if positions is None:
+            positions = resample_positions(video.timestamps, frame_rate)
+
+        # Get the dimensions from the ring storage
+        height, width, channels = video.frame_shape
+
+        segments = self._segment_encoder
+        if segments is not None and segments.segment_count(len(positions), frame_rate) > 1:
+            video.lost_frames += segments.encode(video, positions, frame_rate, video_filename, audio,
+                                                 self.audio_rate if audio is not None else None)
+            _warn_lost_frames(video)
+            return
+
+        if self._encoder_pool is not None:
+            # Frames go straight from the snapshot into ffmpeg's pipe, BGRA included, in one pass with the audio
+            container = "mkv" if video_filename.lower().endswith(".mkv") else "mp4"
+            encoder = self._encoder_pool.acquire(width, height, frame_rate, "bgra" if channels == 4 else "bgr24",
+                                                 self.audio_rate if audio is not None else None, 1, container)
+            encoder.encode(video.iter_frames(positions), video_filename, audio)
+            _warn_lost_frames(video)
+            return
+
+        # Choose a better codec and filename extension for wider compatibility
+        fourcc = cv2.VideoWriter_fourcc(*'mp4v')  # or 'avc1' for linux
+        out_video = cv2.VideoWriter(video_filename, fourcc, frame_rate, (width, height))
+
+        bgr = np.empty((height, width, 3), dtype=np.uint8)  # Reused for deferred BGRA frames
+        for frame in video.iter_frames(positions):
+            out_video.write(to_bgr(frame, bgr))
+
+        out_video.release()
+        _warn_lost_frames(video)
+
+    def export_muxed(self, filename, t_start=None, t_end=None, snapshot=None, source=0, silence="keep",
+                     min_speech_ratio=0.0):
+        """
+        Writes one MP4 or MKV file holding video and audio cut to the same window of the
+        capture clock. Video frames are mapped onto a constant-rate timeline and audio is
+        cut by sample, so both tracks have the same duration and stay in sync. With an
+        encoder configured this is a single ffmpeg pass; otherwise the mp4v video is
+        written first and muxed with the audio afterwards.
+
+        Args:
+            filename (str): Output path. The container follows the extension (.mp4 or .mkv).
+            t_start (float, optional): Start of the window, in time.monotonic() seconds. Defaults
+                to the latest time both video and audio are available from. The window never
+                starts before the snapshot's default window, see BufferSnapshot.window().
+            t_end (float, optional): End of the window. Defaults to the earliest time either
+                track runs out.
+            snapshot (BufferSnapshot, optional): Snapshot to export. Defaults to a new one.
+            source (int): Index of the capture source to export.
+            silence (str): One of vad_module.SILENCE_MODES. "mute" and "drop" both replace the
+                audio between speech spans with digital silence: the track has to stay as long
+                as the video, and the encoder spends almost nothing on silence.
+            min_speech_ratio (float): The file gets no audio track when less of the window
+                than this holds speech.
+
+        Returns:
+            str: The path of the muxed file.
+
+        Raises:
+            ValueError: If the buffer holds no video or the window is empty.
+        """
+        if snapshot is None:
+            snapshot = self.snapshot()
+        video, frame_rate, positions, audio, duration = self._export_window(snapshot, source, t_start, t_end,
+                                                                            silence, min_speech_ratio)
+        if self._encoder_pool is not None:
+            self._write_video(video, frame_rate, filename, positions, audio)
+            return filename
+
+        temp_dir = tempfile.mkdtemp(prefix="export_")
+        video_path = os.path.join(temp_dir, "video.mp4")
+        audio_path = os.path.join(temp_dir, "audio.wav")
+        try:
+            self._write_video(video, frame_rate, video_path, positions)
+            arguments = ["-i", video_path]
+            if audio is not None:
+                with wave.open(audio_path, 'wb') as wf:
+                    wf.setnchannels(1)
+                    wf.setsampwidth(2)  # 16-bit samples
+                    wf.setframerate(snapshot.audio_rate)
+                    wf.writeframes(audio.tobytes())
+                arguments += ["-i", audio_path, "-map", "0:v:0", "-map", "1:a:0", "-c:a", "aac"]
+            # The video track is copied as is, only the container is written
+            run_ffmpeg(arguments + ["-c:v", "copy", "-t", f"{duration:.6f}", filename])
+        finally:
+            for path in (video_path, audio_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            os.rmdir(temp_dir)
+        return filename
+
+    def export_bytes(self, t_start=None, t_end=None, snapshot=None, source=0, silence="keep", min_speech_ratio=0.0,
+                     target_bytes=None):
+        """
+        Encodes the same window as export_muxed() into memory, so it can be uploaded
+        without a file being written and read back. The frames are piped into ffmpeg
+        and the fragmented mp4 it produces is read from its stdout.
+
+        Args:
+            t_start (float, optional): Start of the window, see export_muxed().
+            t_end (float, optional): End of the window.
+            snapshot (BufferSnapshot, optional): Snapshot to export. Defaults to a new one.
+            source (int): Index of the capture source to export.
+            silence (str): What to do with the audio between speech, see export_muxed().
+            min_speech_ratio (float): Leave the audio out when less of it than this is speech.
+            target_bytes (int, optional): Size the video must fit. Resolution, frame rate and
+                quality are then chosen by media_converter.encode_to_budget().
+
+        Returns:
+            bytes: The encoded mp4.
+
+        Raises:
+            ValueError: If the buffer holds no video or the window is empty.
+            FileNotFoundError: If ffmpeg is not installed.
+            RuntimeError: If the video cannot be fitted to target_bytes.
+        """
+        if snapshot is None:
+            snapshot = self.snapshot()
+        video, frame_rate, positions, audio, _ = self._export_window(snapshot, source, t_start, t_end, silence,
+                                                                     min_speech_ratio)
+        if target_bytes is not None:
+            data = media_converter.encode_to_budget(video, positions, frame_rate, target_bytes, audio,
+                                                    self.audio_rate, pool=self._encoder_pool).data
+            _warn_lost_frames(video)
+            return data
+        height, width, channels = video.frame_shape
+        settings = (width, height, frame_rate, "bgra" if channels == 4 else "bgr24",
+                    self.audio_rate if audio is not None else None)
+        if self._encoder_pool is not None:
+            encoder = self._encoder_pool.acquire(*settings, in_memory=True,
+                                                 audio_bitrate=media_converter.BUDGET_AUDIO_BITRATE)
+        else:
+            encoder = StreamingEncoder(*settings, in_memory=True, audio_bitrate=media_converter.BUDGET_AUDIO_BITRATE)
+        data = encoder.encode(video.iter_frames(positions), audio=audio)
+        _warn_lost_frames(video)
+        return data
+
+    def _export_window(self, snapshot, source, t_start, t_end, silence, min_speech_ratio):
+        """
+        Cuts a snapshot to an export window, see export_muxed().
+
+        Returns:
+            tuple: (video, frame_rate, positions, audio, duration). positions index the frames
+            of the constant-rate timeline; audio is None when the export gets no audio track.
+        """
+        video = snapshot.videos[source]
+        frame_rate = snapshot.frame_rates[source]
+        if not len(video):
+            raise ValueError("No video frames in the buffer to export.")
+
+        # Default to the span covered by both tracks, within the last video_duration seconds
+        window_start, window_end = snapshot.window(source)
+        audio_range = snapshot.audio.time_range(snapshot.audio_rate)
+        if t_start is None:
+            t_start = window_start if audio_range is None else max(window_start, audio_range[0])
+        t_start = max(t_start, window_start)
+        if t_end is None:
+            t_end = window_end
+            if audio_range is not None:
+                t_end = min(t_end, audio_range[1])
+        frame_count = int(round((t_end - t_start) * frame_rate))
+        if frame_count <= 0:
+            raise ValueError(f"Export window [{t_start:.3f}, {t_end:.3f}] holds no frames.")
+        duration = frame_count / frame_rate
+
+        positions = resample_positions(video.timestamps, frame_rate, t_start, t_start + (frame_count - 1) / frame_rate)
+        audio = None
+        if audio_range is not None:
+            audio = snapshot.audio.time_window(t_start, t_start + duration, snapshot.audio_rate)
+            if silence != "keep" or min_speech_ratio > 0:
+                spans = speech_segments(audio, snapshot.audio_rate)
+                ratio = speech_ratio(spans, len(audio))
+                logger.info(f"Export audio is {ratio:.0%} speech.")
+                if ratio < min_speech_ratio or not len(spans):
+                    audio = None
+                elif silence != "keep":
+                    audio = mute_silence(audio, spans)
+        return video, frame_rate, positions, audio, duration
+
+    def dump_async(self, video_filename=None, audio_filename=None):
+        """
+        Snapshots the buffer now and writes it to disk on a background worker.
+
+        Args:
+            video_filename (str, optional): Path for the mp4 video.
+            audio_filename (str, optional): Path for the WAV audio.
+
+        Returns:
+            concurrent.futures.Future: Completes when the files have been written.
+        """
+        snapshot = self.snapshot()
+        if self._dump_executor is None:
+            self._dump_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="buffer_dump")
+        return self._dump_executor.submit(self.dump_to_disk, video_filename, audio_filename, snapshot)
+
+    def get_video_buffer(self, source=0):
+        """
+        Returns a (frames, H, W, C) copy of a source's video buffer, oldest frame first. The
+        channels are BGRA when defer_color is set (see frame_format) and BGR otherwise.
+
+        Args:
+            source (int): Index into self.sources. Defaults to the primary source.
+        """
         with self.lock:
-            return list(self.video_buffer)
+            snapshot = self.sources[source].video_buffer.snapshot()
+        return snapshot.to_array()
+
+    def get_capture_stats(self, source=0):
+        """
+        Args:
+            source (int): Index into self.sources. Defaults to the primary source.
+
+        Returns:
+            dict: Capture counters, including the share of frames recorded as duplicates (dedup_hit_rate)
+            and the pacing results (achieved_fps, late_frames, dropped_frames).
+        """
+        video_source = self.sources[source]
+        with self.lock:
+            stats = dict(video_source.capture_stats)
+        stats["source"] = video_source.name
+        if video_source.pacer is not None:
+            stats.update(video_source.pacer.stats())
+        stats["dedup_hit_rate"] = stats["duplicate_frames"] / stats["frames_captured"] if stats["frames_captured"] else 0.0
+        return stats
+
+    def get_storage_report(self, source=0):
+        """
+        Args:
+            source (int): Index into self.sources. Defaults to the primary source.
+
+        Returns:
+            dict: Memory and encode cost of the source's video buffer (see EncodedFrameRing.storage_report()).
+        """
+        with self.lock:
+            return self.sources[source].video_buffer.storage_report()
+
+    def get_audio_stats(self):
+        """
+        Returns:
+            dict: Audio callback counters: blocks and samples received, input overflows and
+            underflows reported by the driver, and errors raised while storing a block.
+        """
+        with self.lock:
+            return dict(self.audio_stats)
 
     def get_audio_buffer(self):
+        """Returns a 1-D int16 copy of the audio buffer, oldest sample first."""
         with self.lock:
-            return list(self.audio_buffer)
+            snapshot = self.audio_buffer.snapshot()
+        return snapshot.to_array().ravel()
+
+
+def _run_capture_process(settings, video_rings, audio_ring, lock, stop_event):
+    """
+    Entry point of the capture process: runs an ordinary in-process buffer whose rings
+    and lock are the shared ones created by the parent, until stop_event is set.
+    """
+    buffer = RollingVideoBuffer(**settings)
+    for source, ring in zip(buffer.sources, video_rings):
+        source.video_buffer = ring
+    buffer.video_buffer = video_rings[0]
+    buffer.audio_buffer = audio_ring
+    buffer.lock = lock
+    buffer.frame_ready = threading.Condition(lock)
+    buffer.start()
+    try:
+        stop_event.wait()
+    finally:
+        buffer.stop()
+        for ring in video_rings + [audio_ring]:
+            ring.close()
+
+
+class BufferSnapshot:
+    """
+    An immutable view of a RollingVideoBuffer at one point in time, made of a
+    RingSnapshot per capture source and an AudioSnapshot of the samples.
+    """
+    def __init__(self, videos, frame_rates, audio, audio_rate, video_duration=None):
+        self.videos = videos  # RingSnapshot per source, primary first
+        self.frame_rates = frame_rates
+        self.audio = audio
+        self.audio_rate = audio_rate
+        self.video_duration = video_duration  # Seconds an export may cover, None for the whole ring
+
+    @property
+    def video(self):
+        """RingSnapshot of the primary source."""
+        return self.videos[0]
+
+    @property
+    def frame_rate(self):
+        """Frame rate of the primary source."""
+        return self.frame_rates[0]
+
+    def window(self, source=0):
+        """
+        The span exports of a source cover by default: up to the end of its newest frame, and
+        back to its oldest frame or video_duration seconds, whichever is shorter. A ring sized
+        for the adaptive rate's ceiling holds far more than video_duration at the floor rate.
+
+        Args:
+            source (int): Index of the capture source.
+
+        Returns:
+            tuple: (t_start, t_end) on the capture clock, or None if the source holds no frames.
+        """
+        video = self.videos[source]
+        if not len(video):
+            return None
+        t_start = video.timestamps[0]
+        t_end = video.timestamps[-1] + 1 / self.frame_rates[source]
+        if self.video_duration is not None:
+            t_start = max(t_start, t_end - self.video_duration)
+        return t_start, t_end
+
+
+class SegmentRecorder:
+    """
+    Continuously encodes the frames of a RollingVideoBuffer into short segment
+    files on local disk, deleting segments once they fall out of the window.
+
+    Encoding happens as frames arrive, so producing a recording of the last
+    window_duration seconds only means closing the open segment and handing
+    over the list of files.
+    """
+    def __init__(self, buffer, output_dir=None, segment_duration=2, window_duration=None):
+        """
+        Args:
+            buffer (RollingVideoBuffer): The buffer whose frames are recorded.
+            output_dir (str, optional): Directory for the segment files. Defaults to a new temporary directory.
+            segment_duration (float): Length of each segment in seconds.
+            window_duration (float, optional): Seconds of segments kept on disk. Defaults to the
+                buffer's video_duration.
+        """
+        self.buffer = buffer
+        self.frame_rate = buffer.sources[0].frame_rate
+        self.temporary_dir = output_dir is None  # The directory is removed by cleanup()
+        self.output_dir = output_dir or tempfile.mkdtemp(prefix="pyassistant_segments_")
+        self.segment_duration = segment_duration
+        self.window_duration = window_duration or buffer.video_duration
+        self.segments = []  # Closed segments still in the window: dicts with path, start and end
+        self.running = False
+        self._thread = None
+        self._lock = threading.Lock()  # Guards the open writer and self.segments
+        self._writer = None
+        self._writer_info = None  # Dict for the open segment
+        self._ticks_written = 0  # Constant-rate frames written to the open segment
+        self._segment_index = 0
+        self._bgr = None  # Reused conversion target for deferred BGRA frames
+        os.makedirs(self.output_dir, exist_ok=True)
+
+    def start(self):
+        """Starts the background encoding thread."""
+        if self.running:
+            return
+        self.running = True
+        self._thread = threading.Thread(target=self._record_loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops the encoding thread and closes the open segment."""
+        self.running = False
+        with self.buffer.frame_ready:
+            self.buffer.frame_ready.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            self._close_segment()
+
+    def _record_loop(self):
+        ring = self.buffer.video_buffer  # Primary source
+        last_sequence = ring.sequence
+        while self.running:
+            with self.buffer.frame_ready:
+                self.buffer.frame_ready.wait(timeout=1.0)
+                positions = ring.positions_since(last_sequence)
+                last_sequence = ring.sequence
+                if len(positions) == 0:
+                    continue
+                # Only the snapshot is taken under the lock; compressed frames are decoded after it
+                snapshot = ring.snapshot()
+
+            try:
+                for frame, timestamp in zip(snapshot.iter_frames(positions), snapshot.timestamps[positions]):
+                    self._write(frame, timestamp)
+            except Exception as e:
+                logger.error(f"Error writing video segment: {e}")
+
+    def _write(self, frame, timestamp):
+        with self._lock:
+            if self._writer_info is not None and timestamp - self._writer_info["start"] >= self.segment_duration:
+                self._close_segment()
+            if self._writer is None:
+                self._open_segment(frame, timestamp)
+
+            # Repeat or skip frames so the segment stays constant-rate in wall time
+            target_ticks = int((timestamp - self._writer_info["start"]) * self.frame_rate + 1e-6) + 1
+            if target_ticks > self._ticks_written:
+                if frame.shape[2] == 4:
+                    frame = to_bgr(frame, self._bgr)
+                for _ in range(target_ticks - self._ticks_written):
+                    self._writer.write(frame)
+                self._ticks_written = target_ticks
+            self._writer_info["end"] = timestamp
+
+    def _open_segment(self, frame, timestamp):
+        height, width = frame.shape[:2]
+        path = os.path.join(self.output_dir, f"segment_{self._segment_index:05d}.mp4")
+        self._segment_index += 1
+        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+        self._writer = cv2.VideoWriter(path, fourcc, self.frame_rate, (width, height))
+        self._writer_info = {"path": path, "start": timestamp, "end": timestamp}
+        self._ticks_written = 0
+        if frame.shape[2] == 4:
+            self._bgr = np.empty((height, width, 3), dtype=np.uint8)
+
+    def _close_segment(self):
+        # Caller holds self._lock
+        if self._writer is None:
+            return
+        self._writer.release()
+        self.segments.append(self._writer_info)
+        self._writer = None
+        self._writer_info = None
+        self._expire_segments()
+
+    def _expire_segments(self):
+        # Caller holds self._lock
+        if not self.segments:
+            return
+        cutoff = self.segments[-1]["end"] - self.window_duration
+        while self.segments and self.segments[0]["end"] < cutoff:
+            expired = self.segments.pop(0)
+            try:
+                os.remove(expired["path"])
+            except OSError as e:
+                logger.warning(f"Could not delete expired segment {expired['path']}: {e}")
+
+    def collect_segments(self):
+        """
+        Closes the open segment and hands over every segment in the window.
+
+        The returned files are removed from the rotation, so they are not deleted by
+        the recorder; the caller owns them. Recording continues into a new segment.
+
+        Returns:
+            list: Segment file paths, oldest first.
+        """
+        with self._lock:
+            self._close_segment()
+            segments, self.segments = self.segments, []
+        return [segment["path"] for segment in segments]
+
+    def cleanup(self):
+        """
+        Deletes the segments still in the rotation, and the output directory if the recorder
+        created it, including any collected segments left in it. Call after stop().
+        """
+        with self._lock:
+            segments, self.segments = self.segments, []
+        for segment in segments:
+            try:
+                os.remove(segment["path"])
+            except OSError as e:
+                logger.warning(f"Could not delete segment {segment['path']}: {e}")
+        if self.temporary_dir:
+            shutil.rmtree(self.output_dir, ignore_errors=True)
+
+
+class RecordingModule:
+    """
+    Recording front end used by main.py: a RollingVideoBuffer whose window is
+    encoded in memory on request. With the segment_recording setting, a
+    SegmentRecorder also keeps the capture encoded on disk, for debugging.
+    """
+    def __init__(self, settings=None, segment_duration=2, output_dir=None):
+        """
+        Args:
+            settings (dict, optional): Recording settings from config_module.get_recording_settings().
+                Defaults to config_module.DEFAULT_RECORDING_SETTINGS.
+            segment_duration (float): Length of each on-disk segment in seconds, with segment_recording set.
+            output_dir (str, optional): Directory for the segment files. Defaults to a temporary
+                directory that is removed at shutdown().
+        """
+        settings = settings or config_module.DEFAULT_RECORDING_SETTINGS
+        self.buffer = RollingVideoBuffer(video_duration=settings["video_duration"],
+                                         audio_duration=settings["audio_duration"],
+                                         frame_rate=settings["frame_rate"],
+                                         storage=settings["storage"],
+                                         quality=settings["quality"],
+                                         capture_resolution=settings["capture_resolution"],
+                                         interpolation=settings["interpolation"],
+                                         dedup=settings["dedup"],
+                                         dedup_threshold=settings["dedup_threshold"],
+                                         defer_color=settings["defer_color"],
+                                         sources=settings["sources"],
+                                         audio_backend=settings["audio_backend"],
+                                         audio_block_size=settings["audio_block_size"],
+                                         capture_process=settings["capture_process"],
+                                         video_backend=settings["video_backend"],
+                                         adaptive_rate=settings["adaptive_rate"],
+                                         encoder=settings["encoder"])
+        self.segment_recorder = None
+        if settings["segment_recording"]:
+            self.segment_recorder = SegmentRecorder(self.buffer, output_dir, segment_duration)
+
+    def start_recording(self):
+        """Starts capture, and segment encoding if enabled. Does nothing if they are already running."""
+        if not self.buffer.running:
+            self.buffer.start()
+            logger.info("Recording started.")
+        if self.segment_recorder is not None:
+            self.segment_recorder.start()
+
+    def stop_recording_and_get_files(self):
+        """
+        Closes the current segment and returns the recorded segment files.
+
+        Capture keeps running so no frames are lost while the files are processed; a
+        following start_recording() call is harmless.
+
+        Returns:
+            list: Segment file paths covering the last video_duration seconds, oldest first. Empty
+            unless the segment_recording setting is on.
+        """
+        if self.segment_recorder is None:
+            logger.warning("Segment recording is off; enable recording.segment_recording to keep segment files.")
+            return []
+        segment_list = self.segment_recorder.collect_segments()
+        logger.info(f"Collected {len(segment_list)} video segments.")
+        return segment_list
+
+    def export_recording(self, filename=None, duration=None, silence="keep", min_speech_ratio=0.0):
+        """
+        Exports the buffered video and audio as one synchronized file.
+
+        Args:
+            filename (str, optional): Output path (.mp4 or .mkv). Defaults to a new temporary mp4.
+            duration (float, optional): Seconds to export, ending at the newest frame. Defaults to
+                everything both tracks cover.
+            silence (str): What to do with the audio between speech, see RollingVideoBuffer.export_muxed().
+            min_speech_ratio (float): Leave the audio out when less of it than this is speech.
+
+        Returns:
+            str: The path of the muxed file.
+        """
+        if filename is None:
+            handle, filename = tempfile.mkstemp(suffix=".mp4", prefix="recording_")
+            os.close(handle)
+        snapshot = self.buffer.snapshot()
+        self.buffer.export_muxed(filename, t_start=self._window_start(snapshot, duration), snapshot=snapshot,
+                                 silence=silence, min_speech_ratio=min_speech_ratio)
+        logger.info(f"Exported recording to {filename}")
+        return filename
+
+    def export_media(self, duration=None, silence="keep", min_speech_ratio=0.0, debug_dir=None, target_bytes=None):
+        """
+        Encodes the buffered video and audio into memory, ready to upload, without
+        writing a file. See RollingVideoBuffer.export_bytes().
+
+        Args:
+            duration (float, optional): Seconds to export, ending at the newest frame. Defaults to
+                everything both tracks cover.
+            silence (str): What to do with the audio between speech, see RollingVideoBuffer.export_muxed().
+            min_speech_ratio (float): Leave the audio out when less of it than this is speech.
+            debug_dir (str, optional): Also save the encoded video to a timestamped file in this
+                directory, to inspect what was uploaded.
+            target_bytes (int, optional): Size the video must fit, see RollingVideoBuffer.export_bytes().
+
+        Returns:
+            bytes: The encoded mp4.
+        """
+        start = time.perf_counter()
+        snapshot = self.buffer.snapshot()
+        data = self.buffer.export_bytes(t_start=self._window_start(snapshot, duration), snapshot=snapshot,
+                                        silence=silence, min_speech_ratio=min_speech_ratio, target_bytes=target_bytes)
+        logger.info(f"Encoded {len(data) / 1024:.0f} KiB recording in memory in {time.perf_counter() - start:.2f} s.")
+        if debug_dir:
+            os.makedirs(debug_dir, exist_ok=True)
+            path = os.path.join(debug_dir, f"recording_{datetime.now():%Y%m%d_%H%M%S}.mp4")
+            with open(path, 'wb') as f:
+                f.write(data)
+            logger.info(f"Saved a copy of the recording to {path}")
+        return data
+
+    @staticmethod
+    def _window_start(snapshot, duration):
+        # Start of the last duration seconds of video, None for everything
+        if duration is None or not len(snapshot.video):
+            return None
+        return snapshot.video.timestamps[-1] + 1 / snapshot.frame_rate - duration
+
+    def shutdown(self):
+        """Stops segment encoding and capture, and deletes the segment files."""
+        if self.segment_recorder is not None:
+            self.segment_recorder.stop()
+            self.segment_recorder.cleanup()
+        self.buffer.stop()
+
 
 if __name__ == "__main__":
     buffer = RollingVideoBuffer()
@@ -0,0 +1,936 @@
+# ring_buffer_module.py
+import time
+from multiprocessing import shared_memory
+import cv2
+import numpy as np
+
+# Storage modes understood by make_frame_ring(), mapped to the cv2 encoder settings
+ENCODED_FORMATS = {
+    "jpeg": (".jpg", cv2.IMWRITE_JPEG_QUALITY),
+    "webp": (".webp", cv2.IMWRITE_WEBP_QUALITY),
+}
+
+
+class _EntryRing:
+    """
+    Bookkeeping shared by the frame rings: a fixed number of entries, each with a
+    capture timestamp, written in order and read back oldest first.
+    """
+    def __init__(self, capacity):
+        if capacity <= 0:
+            raise ValueError(f"Ring capacity must be greater than 0, but it was {capacity}")
+
+        self.capacity = int(capacity)
+        self.timestamps = np.zeros(self.capacity, dtype=np.float64)  # Per entry
+        self.write_index = 0  # Entry the next frame will be recorded in
+        self.count = 0  # Number of valid entries in the ring
+        self.sequence = 0  # Entries committed since the ring was created
+        self.duplicates = 0  # Entries recorded by commit_duplicate()
+
+    def _advance(self, timestamp):
+        self.timestamps[self.write_index] = timestamp
+        self.write_index = (self.write_index + 1) % self.capacity
+        self.sequence += 1
+        if self.count < self.capacity:
+            self.count += 1
+
+    def order(self):
+        """
+        Returns:
+            np.ndarray: Entry indices of the stored frames, oldest first.
+        """
+        start = (self.write_index - self.count) % self.capacity
+        return (start + np.arange(self.count)) % self.capacity
+
+    def ordered_timestamps(self):
+        """
+        Returns:
+            np.ndarray: Timestamps of the stored frames, oldest first.
+        """
+        return self.timestamps[self.order()]
+
+    def positions_since(self, sequence):
+        """
+        Returns the chronological positions of the entries committed after a given sequence number.
+
+        Args:
+            sequence (int): A previous value of self.sequence.
+
+        Returns:
+            np.ndarray: Positions (0 = oldest) of the newer entries still in the ring.
+        """
+        new = min(self.sequence - sequence, self.count)
+        return np.arange(self.count - new, self.count)
+
+    def __len__(self):
+        return self.count
+
+
+class FrameRing(_EntryRing):
+    """
+    Fixed-capacity store for video frames backed by a single preallocated
+    (capacity, height, width, channels) uint8 array.
+
+    Frames are written in place into the oldest slot, so steady-state capture
+    never allocates. Each entry carries a timestamp and a reference to the slot
+    holding its pixels, which lets an unchanged frame be recorded by pointing at
+    the previous slot instead of copying it again.
+    """
+    def __init__(self, capacity, frame_shape=None):
+        """
+        Args:
+            capacity (int): Maximum number of frames kept in the ring.
+            frame_shape (tuple, optional): (height, width, channels) of the frames. If None,
+                the storage is allocated on the first write.
+        """
+        _EntryRing.__init__(self, capacity)
+        self.frames = None  # (capacity, H, W, C) uint8, allocated lazily
+        self.refs = np.zeros(self.capacity, dtype=np.int64)  # Slot in self.frames each entry shows
+        self.frame_index = 0  # Slot the next unique frame will be written to
+        self.generations = np.zeros(self.capacity, dtype=np.int64)  # Bumped whenever a slot is handed out for writing
+        self.writing_slot = None  # Slot handed out by next_slot() and not yet committed
+
+        if frame_shape is not None:
+            self.allocate(frame_shape)
+
+    @property
+    def frame_shape(self):
+        """The (height, width, channels) of the stored frames, or None if not allocated."""
+        if self.frames is None:
+            return None
+        return self.frames.shape[1:]
+
+    @property
+    def nbytes(self):
+        """Bytes held by the frame storage."""
+        if self.frames is None:
+            return 0
+        return self.frames.nbytes
+
+    def allocate(self, frame_shape):
+        """
+        (Re)allocates the frame storage for the given frame shape and empties the ring.
+
+        Args:
+            frame_shape (tuple): (height, width, channels) of the frames.
+        """
+        self.frames = np.empty((self.capacity,) + tuple(frame_shape), dtype=np.uint8)
+        self.clear()
+
+    def clear(self):
+        """Drops every frame without releasing the storage."""
+        self.write_index = 0
+        self.frame_index = 0
+        self.count = 0
+
+    def next_slot(self, frame_shape):
+        """
+        Returns a writable view of the slot the next frame goes into.
+
+        The caller fills the view in place and then calls commit(); filling may happen
+        outside the buffer lock, since snapshots detect the slot's bumped generation.
+        If the frame shape differs from the current storage (e.g. the resolution
+        changed), the ring is reallocated and its contents are dropped.
+
+        Args:
+            frame_shape (tuple): (height, width, channels) of the frame about to be written.
+
+        Returns:
+            np.ndarray: A view into the ring storage.
+        """
+        if self.frames is None or self.frame_shape != tuple(frame_shape):
+            self.allocate(frame_shape)
+        self.generations[self.frame_index] += 1
+        self.writing_slot = self.frame_index
+        return self.frames[self.frame_index]
+
+    def seal(self):
+        """Nothing to prepare for raw frames; see EncodedFrameRing.seal()."""
+
+    def commit(self, timestamp):
+        """
+        Marks the slot returned by next_slot() as holding a valid frame.
+
+        Args:
+            timestamp (float): Capture time of the frame.
+        """
+        self.refs[self.write_index] = self.frame_index
+        self.frame_index = (self.frame_index + 1) % self.capacity
+        self.writing_slot = None
+        self._advance(timestamp)
+
+    def commit_duplicate(self, timestamp):
+        """
+        Records a frame identical to the newest one without copying any pixels.
+
+        Slots are reused strictly in order and there are as many slots as entries,
+        so a slot is only overwritten once every entry pointing at it has expired.
+
+        Args:
+            timestamp (float): Capture time of the frame.
+        """
+        if self.count == 0:
+            raise ValueError("Cannot record a duplicate frame in an empty ring.")
+        self.refs[self.write_index] = self.refs[(self.write_index - 1) % self.capacity]
+        self.duplicates += 1
+        self._advance(timestamp)
+
+    def append(self, frame, timestamp):
+        """
+        Copies a frame into the ring, overwriting the oldest one when full.
+
+        Args:
+            frame (np.ndarray): Frame of shape (height, width, channels).
+            timestamp (float): Capture time of the frame.
+        """
+        slot = self.next_slot(frame.shape)
+        np.copyto(slot, frame)
+        self.commit(timestamp)
+
+    def iter_frames(self, positions=None):
+        """
+        Yields the stored frames oldest first as views into the ring (no copies),
+        repeating the referenced slot for duplicate entries. The views are only
+        valid until the slot is overwritten.
+
+        Args:
+            positions (np.ndarray, optional): Chronological positions (0 = oldest) to yield,
+                possibly repeated, e.g. from resample_positions(). Defaults to every frame.
+        """
+        order = self.order()
+        if positions is not None:
+            order = order[positions]
+        for index in self.refs[order]:
+            yield self.frames[index]
+
+    def to_array(self):
+        """
+        Returns:
+            np.ndarray: A (count, H, W, C) copy of the stored frames, oldest first,
+            made with a single allocation.
+        """
+        if self.frames is None or self.count == 0:
+            return np.empty((0,), dtype=np.uint8)
+        return np.take(self.frames, self.refs[self.order()], axis=0)
+
+    def snapshot(self):
+        """
+        Captures which slots and generations make up the ring right now. Only index
+        arrays are copied, so this is cheap enough to call with the buffer lock held.
+
+        Returns:
+            RingSnapshot: A stable view of the current frames that can be read without the lock.
+        """
+        slots = self.refs[self.order()]
+        generations = self.generations[slots]
+        if self.writing_slot is not None:
+            # Entries still pointing at the slot being refilled are already stale
+            generations[slots == self.writing_slot] = -1
+        return RingSnapshot(self, self.frames, slots, self.ordered_timestamps(), generations)
+
+    def _read_slot(self, frames, slot, generation, out):
+        # Copies a slot and reports whether it was left untouched while being copied
+        if self.frames is frames and self.generations[slot] != generation:
+            return False
+        np.copyto(out, frames[slot])
+        return self.frames is not frames or self.generations[slot] == generation
+
+    def storage_report(self):
+        """
+        Returns:
+            dict: Memory use of the ring, in the same format as EncodedFrameRing.storage_report().
+        """
+        frame_bytes = int(np.prod(self.frame_shape)) if self.frames is not None else 0
+        return {
+            "mode": "raw",
+            "frames": self.count,
+            "capacity": self.capacity,
+            "stored_bytes": self.nbytes,
+            "raw_bytes": self.count * frame_bytes,
+            "avg_frame_bytes": frame_bytes,
+            "compression_ratio": 1.0,
+            "avg_encode_ms": 0.0,
+        }
+
+
+class EncodedFrameRing(_EntryRing):
+    """
+    Fixed-capacity store that keeps every frame as a compressed JPEG or WebP blob.
+
+    Frames are encoded when they are committed and only decoded again when read,
+    which trades capture CPU for a much smaller resident buffer. The interface
+    matches FrameRing, so the capture loop can fill either one.
+    """
+    def __init__(self, capacity, storage="jpeg", quality=80):
+        """
+        Args:
+            capacity (int): Maximum number of frames kept in the ring.
+            storage (str): Encoding to use, one of ENCODED_FORMATS.
+            quality (int): Encoder quality from 0 to 100.
+        """
+        if storage not in ENCODED_FORMATS:
+            raise ValueError(f"Unknown storage mode '{storage}'. Must be one of {sorted(ENCODED_FORMATS)}")
+        if not 0 <= quality <= 100:
+            raise ValueError(f"Quality must be between 0 and 100, but it was {quality}")
+
+        _EntryRing.__init__(self, capacity)
+        self.storage = storage
+        self.quality = quality
+        self.blobs = [None] * self.capacity  # Encoded bytes per entry
+        self._scratch = None  # Reused frame that next_slot() hands out
+        self._pending = None  # Blob produced by seal() for the next commit()
+        self._encode_seconds = 0.0  # Total time spent encoding, for storage_report()
+        self._encoded_frames = 0
+
+    @property
+    def frame_shape(self):
+        """The (height, width, channels) of the frames being stored, or None before the first write."""
+        if self._scratch is None:
+            return None
+        return self._scratch.shape
+
+    @property
+    def nbytes(self):
+        """Bytes held by the encoded frames. Duplicate entries share their blob and are counted once."""
+        unique = {id(blob): len(blob) for blob in self.blobs if blob is not None}
+        return sum(unique.values())
+
+    def clear(self):
+        """Drops every frame."""
+        self.blobs = [None] * self.capacity
+        self.write_index = 0
+        self.count = 0
+
+    def next_slot(self, frame_shape):
+        """
+        Returns a reusable scratch frame to fill before calling commit().
+
+        Args:
+            frame_shape (tuple): (height, width, channels) of the frame about to be written.
+
+        Returns:
+            np.ndarray: The scratch frame.
+        """
+        if self._scratch is None or self._scratch.shape != tuple(frame_shape):
+            if self._scratch is not None:
+                self.clear()  # Resolution changed, older frames can no longer be exported together
+            self._scratch = np.empty(frame_shape, dtype=np.uint8)
+        return self._scratch
+
+    def seal(self):
+        """
+        Encodes the scratch frame ahead of commit(), so the slow part can run
+        without holding the buffer lock.
+        """
+        extension, quality_flag = ENCODED_FORMATS[self.storage]
+        start = time.perf_counter()
+        success, blob = cv2.imencode(extension, self._scratch, [quality_flag, self.quality])
+        self._encode_seconds += time.perf_counter() - start
+        if not success:
+            raise RuntimeError(f"Failed to encode frame as {self.storage}")
+        self._encoded_frames += 1
+        self._pending = blob.tobytes()
+
+    def commit(self, timestamp):
+        """
+        Stores the scratch frame in the oldest slot, encoding it first unless seal() already did.
+
+        Args:
+            timestamp (float): Capture time of the frame.
+        """
+        if self._pending is None:
+            self.seal()
+        self.blobs[self.write_index] = self._pending
+        self._pending = None
+        self._advance(timestamp)
+
+    def commit_duplicate(self, timestamp):
+        """
+        Records a frame identical to the newest one by sharing its blob, without encoding.
+
+        Args:
+            timestamp (float): Capture time of the frame.
+        """
+        if self.count == 0:
+            raise ValueError("Cannot record a duplicate frame in an empty ring.")
+        self.blobs[self.write_index] = self.blobs[(self.write_index - 1) % self.capacity]
+        self.duplicates += 1
+        self._advance(timestamp)
+
+    def append(self, frame, timestamp):
+        """
+        Encodes a frame into the ring, overwriting the oldest one when full.
+
+        Args:
+            frame (np.ndarray): Frame of shape (height, width, channels).
+            timestamp (float): Capture time of the frame.
+        """
+        slot = self.next_slot(frame.shape)
+        np.copyto(slot, frame)
+        self.commit(timestamp)
+
+    def iter_frames(self, positions=None):
+        """
+        Yields the stored frames oldest first, decoding each one as it is reached.
+        A blob repeated back to back (duplicates or resampling) is decoded once.
+
+        Args:
+            positions (np.ndarray, optional): Chronological positions (0 = oldest) to yield,
+                possibly repeated, e.g. from resample_positions(). Defaults to every frame.
+        """
+        order = self.order()
+        if positions is not None:
+            order = order[positions]
+        last_blob, frame = None, None
+        for index in order:
+            blob = self.blobs[index]
+            if blob is not last_blob:
+                frame = cv2.imdecode(np.frombuffer(blob, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+                last_blob = blob
+            yield frame
+
+    def to_array(self):
+        """
+        Returns:
+            np.ndarray: A (count, H, W, C) array of the decoded frames, oldest first.
+        """
+        if self.count == 0:
+            return np.empty((0,), dtype=np.uint8)
+        out = np.empty((self.count,) + self.frame_shape, dtype=np.uint8)
+        for i, frame in enumerate(self.iter_frames()):
+            out[i] = frame.reshape(self.frame_shape)
+        return out
+
+    def snapshot(self):
+        """
+        Captures the blobs that make up the ring right now. Blobs are immutable,
+        so the snapshot stays valid however far capture moves on.
+
+        Returns:
+            RingSnapshot: A stable view of the current frames that can be read without the lock.
+        """
+        blobs = [self.blobs[index] for index in self.order()]
+        return RingSnapshot(self, None, blobs, self.ordered_timestamps(), None)
+
+    def storage_report(self):
+        """
+        Returns:
+            dict: Memory and CPU cost of the ring: stored bytes against the raw
+            equivalent, the compression ratio and the average encode time per frame.
+        """
+        stored_bytes = self.nbytes
+        frame_bytes = int(np.prod(self.frame_shape)) if self.frame_shape is not None else 0
+        raw_bytes = self.count * frame_bytes
+        return {
+            "mode": self.storage,
+            "frames": self.count,
+            "capacity": self.capacity,
+            "stored_bytes": stored_bytes,
+            "raw_bytes": raw_bytes,
+            "avg_frame_bytes": stored_bytes / self.count if self.count else 0,
+            "compression_ratio": raw_bytes / stored_bytes if stored_bytes else 0.0,
+            "avg_encode_ms": 1000 * self._encode_seconds / self._encoded_frames if self._encoded_frames else 0.0,
+        }
+
+
+class RingSnapshot:
+    """
+    A point-in-time view of a frame ring, taken under the buffer lock in
+    microseconds and read afterwards without it while capture carries on.
+
+    For raw rings the snapshot holds slot indices and their generations. Each
+    frame is copied into a reused buffer and checked against its generation, so
+    a slot that capture overwrote mid-read is detected. It is replaced by the
+    previous good frame and counted in lost_frames. Encoded snapshots hold the
+    immutable blobs themselves and never lose frames.
+    """
+    def __init__(self, ring, frames, entries, timestamps, generations):
+        self.ring = ring
+        self.frames = frames  # Raw storage array at snapshot time, None for encoded rings
+        self.entries = entries  # Slot indices (raw) or blobs (encoded), oldest first
+        self.timestamps = timestamps
+        self.generations = generations
+        self.frame_shape = ring.frame_shape
+        self.lost_frames = 0  # Frames overwritten by capture before they could be read
+
+    def __len__(self):
+        return len(self.entries)
+
+    def iter_frames(self, positions=None):
+        """
+        Yields the frames of the snapshot oldest first. Raw frames come from two
+        alternating reused buffers, so each one is only valid until the next-but-one
+        iteration; copy it if it must be kept.
+
+        Args:
+            positions (np.ndarray, optional): Chronological positions (0 = oldest) to yield,
+                possibly repeated. Defaults to every frame.
+        """
+        if positions is None:
+            positions = np.arange(len(self.entries))
+        if self.frames is None:
+            last_blob, frame = None, None
+            for position in positions:
+                blob = self.entries[position]
+                if blob is not last_blob:
+                    frame = cv2.imdecode(np.frombuffer(blob, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+                    last_blob = blob
+                yield frame
+            return
+
+        buffers = [np.empty(self.frame_shape, dtype=np.uint8) for _ in range(2)]
+        good = None  # Index into buffers of the last frame that read cleanly
+        last_position = None
+        for position in positions:
+            if position != last_position:
+                target = 1 if good == 0 else 0
+                slot = self.entries[position]
+                if self.ring._read_slot(self.frames, slot, self.generations[position], buffers[target]):
+                    good = target
+                else:
+                    self.lost_frames += 1
+                last_position = position
+            if good is not None:
+                yield buffers[good]
+
+    def to_array(self):
+        """
+        Returns:
+            np.ndarray: A (frames, H, W, C) copy of the snapshot, oldest first.
+        """
+        if len(self.entries) == 0:
+            return np.empty((0,), dtype=np.uint8)
+        out = np.empty((len(self.entries),) + tuple(self.frame_shape), dtype=np.uint8)
+        count = 0
+        for frame in self.iter_frames():
+            out[count] = frame.reshape(self.frame_shape)
+            count += 1
+        return out[:count]
+
+
+def resample_positions(timestamps, frame_rate, t_start=None, t_end=None):
+    """
+    Maps a constant-rate output timeline onto frames captured at irregular times.
+
+    Each output tick shows the newest frame captured at or before it, so late
+    captures are held and surplus captures are dropped, and the result plays
+    back in real time at frame_rate.
+
+    Args:
+        timestamps (np.ndarray): Capture times of the frames, oldest first.
+        frame_rate (float): Output frames per second.
+        t_start (float, optional): Start of the output window. Defaults to the first timestamp.
+        t_end (float, optional): End of the output window. Defaults to the last timestamp.
+
+    Returns:
+        np.ndarray: Chronological frame positions, one per output frame.
+    """
+    if len(timestamps) == 0:
+        return np.empty(0, dtype=np.int64)
+    t_start = timestamps[0] if t_start is None else t_start
+    t_end = timestamps[-1] if t_end is None else t_end
+    if t_end < t_start:
+        return np.empty(0, dtype=np.int64)
+
+    ticks = t_start + np.arange(int(np.floor((t_end - t_start) * frame_rate + 1e-9)) + 1) / frame_rate
+    # A small tolerance keeps rounding error from pushing a tick just before its frame
+    positions = np.searchsorted(timestamps, ticks + 1e-6, side="right") - 1
+    return np.clip(positions, 0, len(timestamps) - 1)
+
+
+def make_frame_ring(capacity, storage="raw", quality=80):
+    """
+    Creates the frame store for a storage mode.
+
+    Args:
+        capacity (int): Maximum number of frames kept.
+        storage (str): "raw" for a preallocated FrameRing, or "jpeg"/"webp" for an EncodedFrameRing.
+        quality (int): Encoder quality for the compressed modes.
+
+    Returns:
+        FrameRing or EncodedFrameRing: The frame store.
+    """
+    if storage == "raw":
+        return FrameRing(capacity)
+    return EncodedFrameRing(capacity, storage, quality)
+
+
+class AudioRing:
+    """
+    Fixed-size store for the most recent audio samples, backed by one contiguous
+    int16 array of exactly duration * rate samples per channel.
+
+    Writes copy into the array with at most two slice assignments, and reads
+    come back as the two halves of the ring, so memory use and read cost do not
+    depend on how long capture has been running.
+    """
+    def __init__(self, capacity, channels=1):
+        """
+        Args:
+            capacity (int): Number of samples (per channel) kept in the ring.
+            channels (int): Number of interleaved channels.
+        """
+        if capacity <= 0:
+            raise ValueError(f"Ring capacity must be greater than 0, but it was {capacity}")
+
+        self.capacity = int(capacity)
+        self.channels = channels
+        self.samples = np.zeros((self.capacity, channels), dtype=np.int16)
+        self.write_index = 0  # Row the next sample is written to
+        self.count = 0  # Number of valid samples in the ring
+        self.total_written = 0  # Samples written since the ring was created
+        self.anchor_sample = None  # Absolute index of the first sample of the newest timestamped block
+        self.anchor_time = None  # Capture time of that sample
+
+    @property
+    def nbytes(self):
+        """Bytes held by the sample storage."""
+        return self.samples.nbytes
+
+    def clear(self):
+        """Drops every sample without releasing the storage."""
+        self.write_index = 0
+        self.count = 0
+
+    def write(self, data, timestamp=None):
+        """
+        Copies samples into the ring, overwriting the oldest ones when full.
+
+        Args:
+            data (np.ndarray): int16 samples, either 1-D interleaved or shaped (n, channels).
+            timestamp (float, optional): Capture time of the first sample of the block, on the
+                same clock as the video frame timestamps.
+        """
+        data = np.asarray(data, dtype=np.int16).reshape(-1, self.channels)
+        n = len(data)
+        if n == 0:
+            return
+
+        if timestamp is not None:
+            self.anchor_sample = self.total_written
+            self.anchor_time = timestamp
+        self.total_written += n
+        if n >= self.capacity:
+            # Only the newest capacity samples survive
+            self.samples[:] = data[-self.capacity:]
+            self.write_index = 0
+            self.count = self.capacity
+            return
+
+        first = min(n, self.capacity - self.write_index)
+        self.samples[self.write_index:self.write_index + first] = data[:first]
+        if first < n:
+            self.samples[:n - first] = data[first:]
+        self.write_index = (self.write_index + n) % self.capacity
+        self.count = min(self.count + n, self.capacity)
+
+    def slices(self):
+        """
+        Returns:
+            tuple: Two views (older, newer) that together hold the stored samples in
+            chronological order. Either may be empty. They are only valid until the next write.
+        """
+        if self.count < self.capacity:
+            return self.samples[:0], self.samples[:self.count]
+        return self.samples[self.write_index:], self.samples[:self.write_index]
+
+    def to_array(self):
+        """
+        Returns:
+            np.ndarray: A (count, channels) copy of the stored samples, oldest first.
+        """
+        older, newer = self.slices()
+        out = np.empty((len(older) + len(newer), self.channels), dtype=np.int16)
+        out[:len(older)] = older
+        out[len(older):] = newer
+        return out
+
+    def snapshot(self):
+        """
+        Records the ring position so the samples can be copied out later without the lock.
+
+        Returns:
+            AudioSnapshot: The recorded position.
+        """
+        return AudioSnapshot(self, self.write_index, self.count, self.total_written,
+                             self.anchor_sample, self.anchor_time)
+
+    def __len__(self):
+        return self.count
+
+
+class AudioSnapshot:
+    """
+    A point-in-time position in an AudioRing. to_array() copies the samples
+    without the buffer lock, then drops the oldest samples that capture
+    overwrote during the copy, so the result is always clean.
+    """
+    def __init__(self, ring, write_index, count, total_written, anchor_sample=None, anchor_time=None):
+        self.ring = ring
+        self.write_index = write_index
+        self.count = count
+        self.total_written = total_written
+        self.anchor_sample = anchor_sample
+        self.anchor_time = anchor_time
+        self.trimmed_samples = 0  # Oldest samples dropped because capture overwrote them
+
+    def __len__(self):
+        return self.count
+
+    def to_array(self):
+        """
+        Returns:
+            np.ndarray: A (samples, channels) copy of the snapshot, oldest first.
+        """
+        ring = self.ring
+        start = (self.write_index - self.count) % ring.capacity
+        out = np.empty((self.count, ring.channels), dtype=np.int16)
+        first = min(self.count, ring.capacity - start)
+        out[:first] = ring.samples[start:start + first]
+        out[first:] = ring.samples[:self.count - first]
+
+        # Writes after the snapshot first fill unused space, then overwrite the oldest samples
+        overwritten = ring.total_written - self.total_written - (ring.capacity - self.count)
+        self.trimmed_samples = int(min(max(overwritten, 0), self.count))
+        return out[self.trimmed_samples:]
+
+    def time_range(self, rate):
+        """
+        Args:
+            rate (int): Sample rate of the ring.
+
+        Returns:
+            tuple: (start, end) capture times covered by the snapshot, or None if no block was timestamped.
+        """
+        if self.anchor_time is None:
+            return None
+        start = self.anchor_time + (self.total_written - self.count - self.anchor_sample) / rate
+        return start, start + self.count / rate
+
+    def time_window(self, t_start, t_end, rate):
+        """
+        Copies out the samples captured between two times. The result always holds exactly
+        round((t_end - t_start) * rate) samples; parts of the window the snapshot does not
+        cover are filled with silence so the audio stays aligned with the video.
+
+        Args:
+            t_start (float): Start of the window on the capture clock.
+            t_end (float): End of the window on the capture clock.
+            rate (int): Sample rate of the ring.
+
+        Returns:
+            np.ndarray: A (samples, channels) int16 array.
+
+        Raises:
+            ValueError: If the snapshot holds no timestamped audio.
+        """
+        if self.anchor_time is None:
+            raise ValueError("The audio snapshot has no timestamps to cut a window from.")
+
+        samples = self.to_array()
+        window = np.zeros((max(int(round((t_end - t_start) * rate)), 0), self.ring.channels), dtype=np.int16)
+
+        # Absolute index of samples[0], then the window start relative to it
+        first_sample = self.total_written - self.count + self.trimmed_samples
+        start = self.anchor_sample + int(round((t_start - self.anchor_time) * rate)) - first_sample
+        source_start, source_end = max(start, 0), min(start + len(window), len(samples))
+        if source_end > source_start:
+            window[source_start - start:source_end - start] = samples[source_start:source_end]
+        return window
+
+
+def _shared_int_field(index):
+    # Property that keeps a ring's integer bookkeeping in its shared header
+    def get(self):
+        return int(self._header[index])
+
+    def set(self, value):
+        self._header[index] = value
+
+    return property(get, set)
+
+
+class SharedFrameRing(FrameRing):
+    """
+    A FrameRing whose frames and bookkeeping live in one multiprocessing.shared_memory
+    block, so a capture process can fill it while another process reads it.
+
+    The frame shape is fixed when the block is created. The ring pickles as a
+    reference to the block, so passing it to a child process attaches to the same
+    memory instead of copying it, and every read hands out views into the block.
+    """
+    _HEADER_FIELDS = 6
+
+    write_index = _shared_int_field(0)
+    count = _shared_int_field(1)
+    sequence = _shared_int_field(2)
+    duplicates = _shared_int_field(3)
+    frame_index = _shared_int_field(4)
+
+    def __init__(self, capacity, frame_shape, name=None):
+        """
+        Args:
+            capacity (int): Maximum number of frames kept in the ring.
+            frame_shape (tuple): (height, width, channels) of the frames.
+            name (str, optional): Name of an existing block to attach to. Defaults to creating a new one.
+        """
+        if capacity <= 0:
+            raise ValueError(f"Ring capacity must be greater than 0, but it was {capacity}")
+
+        self.capacity = int(capacity)
+        self._frame_shape = tuple(frame_shape)
+        index_bytes = 8 * (self._HEADER_FIELDS + 3 * self.capacity)
+        size = index_bytes + self.capacity * int(np.prod(self._frame_shape))
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size)
+
+        buffer = self.shm.buf
+        self._header = np.ndarray(self._HEADER_FIELDS, dtype=np.int64, buffer=buffer)
+        offset = self._header.nbytes
+        self.timestamps = np.ndarray(self.capacity, dtype=np.float64, buffer=buffer, offset=offset)
+        self.refs = np.ndarray(self.capacity, dtype=np.int64, buffer=buffer, offset=offset + 8 * self.capacity)
+        self.generations = np.ndarray(self.capacity, dtype=np.int64, buffer=buffer, offset=offset + 16 * self.capacity)
+        self.frames = np.ndarray((self.capacity,) + self._frame_shape, dtype=np.uint8, buffer=buffer,
+                                 offset=index_bytes)
+        if self.owner:
+            self._header[:] = 0
+            self.writing_slot = None
+            self.timestamps[:] = 0
+            self.refs[:] = 0
+            self.generations[:] = 0
+
+    @property
+    def name(self):
+        """Name of the shared memory block."""
+        return self.shm.name
+
+    @property
+    def writing_slot(self):
+        slot = int(self._header[5])
+        return None if slot < 0 else slot
+
+    @writing_slot.setter
+    def writing_slot(self, slot):
+        self._header[5] = -1 if slot is None else slot
+
+    def allocate(self, frame_shape):
+        """
+        Empties the ring. The shared storage cannot be reallocated, so the shape must not change.
+
+        Raises:
+            ValueError: If frame_shape differs from the shape the block was created with.
+        """
+        if tuple(frame_shape) != self._frame_shape:
+            raise ValueError(f"Shared frame ring holds {self._frame_shape} frames, cannot store {tuple(frame_shape)}")
+        self.clear()
+
+    def detach(self):
+        """
+        Returns:
+            FrameRing: An ordinary in-process ring holding a copy of this one, which stays
+            readable after the block has been freed.
+        """
+        ring = FrameRing(self.capacity)
+        ring.frames = self.frames.copy()
+        ring.timestamps = self.timestamps.copy()
+        ring.refs = self.refs.copy()
+        ring.generations = self.generations.copy()
+        ring.write_index, ring.count, ring.sequence = self.write_index, self.count, self.sequence
+        ring.duplicates, ring.frame_index = self.duplicates, self.frame_index
+        return ring
+
+    def close(self):
+        """Releases this process's views of the block. The ring cannot be used afterwards."""
+        self._header = self.timestamps = self.refs = self.generations = self.frames = None
+        self.shm.close()
+
+    def unlink(self):
+        """Frees the block once every process has closed it. Only the creating process calls this."""
+        if self.owner:
+            self.shm.unlink()
+
+    def __reduce__(self):
+        return (SharedFrameRing, (self.capacity, self._frame_shape, self.shm.name))
+
+
+class SharedAudioRing(AudioRing):
+    """
+    An AudioRing held in a multiprocessing.shared_memory block, pickled as a reference
+    to the block like SharedFrameRing.
+    """
+    write_index = _shared_int_field(0)
+    count = _shared_int_field(1)
+    total_written = _shared_int_field(2)
+
+    def __init__(self, capacity, channels=1, name=None):
+        """
+        Args:
+            capacity (int): Number of samples (per channel) kept in the ring.
+            channels (int): Number of interleaved channels.
+            name (str, optional): Name of an existing block to attach to. Defaults to creating a new one.
+        """
+        if capacity <= 0:
+            raise ValueError(f"Ring capacity must be greater than 0, but it was {capacity}")
+
+        self.capacity = int(capacity)
+        self.channels = channels
+        self.owner = name is None
+        size = 8 * 5 + 2 * self.capacity * channels
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size)
+
+        buffer = self.shm.buf
+        self._header = np.ndarray(4, dtype=np.int64, buffer=buffer)
+        self._anchor_time = np.ndarray(1, dtype=np.float64, buffer=buffer, offset=32)
+        self.samples = np.ndarray((self.capacity, channels), dtype=np.int16, buffer=buffer, offset=40)
+        if self.owner:
+            self._header[:] = 0
+            self.anchor_sample = None
+            self.samples[:] = 0
+
+    @property
+    def name(self):
+        """Name of the shared memory block."""
+        return self.shm.name
+
+    @property
+    def anchor_sample(self):
+        sample = int(self._header[3])
+        return None if sample < 0 else sample
+
+    @anchor_sample.setter
+    def anchor_sample(self, sample):
+        self._header[3] = -1 if sample is None else sample
+
+    @property
+    def anchor_time(self):
+        return None if self.anchor_sample is None else float(self._anchor_time[0])
+
+    @anchor_time.setter
+    def anchor_time(self, timestamp):
+        if timestamp is not None:
+            self._anchor_time[0] = timestamp
+
+    def detach(self):
+        """
+        Returns:
+            AudioRing: An ordinary in-process ring holding a copy of this one, which stays
+            readable after the block has been freed.
+        """
+        ring = AudioRing(self.capacity, self.channels)
+        ring.samples = self.samples.copy()
+        ring.write_index, ring.count, ring.total_written = self.write_index, self.count, self.total_written
+        ring.anchor_sample, ring.anchor_time = self.anchor_sample, self.anchor_time
+        return ring
+
+    def close(self):
+        """Releases this process's views of the block. The ring cannot be used afterwards."""
+        self._header = self._anchor_time = self.samples = None
+        self.shm.close()
+
+    def unlink(self):
+        """Frees the block once every process has closed it. Only the creating process calls this."""
+        if self.owner:
+            self.shm.unlink()
+
+    def __reduce__(self):
+        return (SharedAudioRing, (self.capacity, self.channels, self.shm.name))
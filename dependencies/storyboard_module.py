@@ -0,0 +1,222 @@
+# storyboard_module.py
+import io
+import logging
+import wave
+import cv2
+import numpy as np
+from dependencies.recording_module import frame_difference, frame_signature
+from dependencies.vad_module import mute_silence, speech_clips, speech_ratio, speech_segments
+
+logger = logging.getLogger(__name__)
+
+# Gemini resamples audio to 16 kHz mono, so sending more only adds upload time
+STORYBOARD_AUDIO_RATE = 16000
+
+
+def scene_scores(video):
+    """
+    Measures how much the screen changed at every frame of a snapshot.
+
+    Args:
+        video (RingSnapshot): Frames to score.
+
+    Returns:
+        np.ndarray: Per frame, the fraction of sampled pixels that differ from the previous
+        frame (see frame_difference()). The first frame scores 1. Oldest frames that capture
+        overwrote before they could be read are left out, so the scores line up with the
+        end of the snapshot.
+    """
+    scores = np.empty(len(video), dtype=np.float64)
+    previous = None
+    count = 0
+    for count, frame in enumerate(video.iter_frames(), start=1):
+        signature = frame_signature(frame)
+        scores[count - 1] = frame_difference(signature, previous)
+        previous = signature
+    return scores[:count]
+
+
+def select_keyframes(timestamps, scores, count, threshold=0.02):
+    """
+    Picks frames that cover the whole window and land on scene changes.
+
+    The window is split into count equal spans of time. Each span contributes the
+    frame right after its largest change, or its last frame if nothing changed in
+    it. A pick is dropped when the screen has not changed since the previous pick,
+    so a static recording yields fewer frames.
+
+    Args:
+        timestamps (np.ndarray): Capture times of the frames, oldest first.
+        scores (np.ndarray): Change score of each frame, see scene_scores().
+        count (int): Maximum number of frames to pick.
+        threshold (float): Change score below which a frame counts as unchanged.
+
+    Returns:
+        np.ndarray: Chronological positions of the picked frames.
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    if len(timestamps) == 0 or count <= 0:
+        return np.empty(0, dtype=np.int64)
+    edges = np.linspace(timestamps[0], timestamps[-1], count + 1)
+    bounds = np.searchsorted(timestamps, edges[1:-1], side="right")
+    changed = np.cumsum(np.asarray(scores) > threshold)  # Changes seen up to each frame
+
+    picks = []
+    for start, stop in zip(np.concatenate(([0], bounds)), np.concatenate((bounds, [len(timestamps)]))):
+        if start == stop:
+            continue  # No frame was captured in this span
+        span = scores[start:stop]
+        pick = start + int(np.argmax(span)) if span.max() > threshold else stop - 1
+        if picks and changed[pick] == changed[picks[-1]]:
+            continue  # Same screen as the previous pick
+        picks.append(pick)
+    return np.array(picks, dtype=np.int64)
+
+
+def encode_jpeg(frame, max_dimension=1024, target_bytes=100_000, quality=85, min_quality=40, attempts=5):
+    """
+    JPEG-encodes a frame, shrinking it until it fits a byte budget.
+
+    The frame is first scaled so its longer side is at most max_dimension. The quality
+    is then lowered in steps down to min_quality, and below that the image is scaled
+    down by the remaining overshoot. At most attempts encodes are made.
+
+    Args:
+        frame (np.ndarray): BGR or BGRA frame.
+        max_dimension (int): Longest side of the encoded image in pixels.
+        target_bytes (int): Size the encoded image should not exceed.
+        quality (int): Starting JPEG quality.
+        min_quality (int): Lowest quality used before scaling down further.
+        attempts (int): Maximum number of encodes.
+
+    Returns:
+        bytes: The JPEG image.
+    """
+    image = frame[:, :, :3] if frame.shape[2] == 4 else frame
+    height, width = image.shape[:2]
+    scale = min(1.0, max_dimension / max(height, width))
+    for _ in range(attempts):
+        size = (max(1, int(width * scale)), max(1, int(height * scale)))
+        resized = image if size == (width, height) else cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+        success, blob = cv2.imencode(".jpg", resized, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if not success:
+            raise RuntimeError("Failed to encode keyframe as JPEG")
+        if blob.nbytes <= target_bytes:
+            break
+        if quality > min_quality:
+            quality = max(min_quality, quality - 15)
+        else:
+            scale *= 0.9 * np.sqrt(target_bytes / blob.nbytes)  # Bytes grow roughly with the pixel count
+    return blob.tobytes()
+
+
+def wav_bytes(samples, rate):
+    """
+    Returns:
+        bytes: The int16 samples as an in-memory mono WAV file.
+    """
+    data = io.BytesIO()
+    with wave.open(data, 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)  # 16-bit samples
+        wf.setframerate(rate)
+        wf.writeframes(np.ascontiguousarray(samples, dtype=np.int16).tobytes())
+    return data.getvalue()
+
+
+def resample_audio(samples, rate, target_rate):
+    """
+    Linearly resamples int16 audio, averaging channels to mono.
+
+    Returns:
+        np.ndarray: 1-D int16 samples at target_rate.
+    """
+    samples = np.asarray(samples)
+    if samples.ndim > 1:
+        samples = samples.mean(axis=1)
+    if rate == target_rate or len(samples) == 0:
+        return samples.astype(np.int16)
+    count = int(round(len(samples) * target_rate / rate))
+    positions = np.arange(count) * (rate / target_rate)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.int16)
+
+
+class Storyboard:
+    """
+    A handful of JPEG keyframes standing in for a recording, each with its time
+    from the start of the window, plus optional audio clips of the same window.
+    """
+    def __init__(self, frames, duration, audio=None, speech_ratio=None):
+        self.frames = frames  # (seconds from the start, JPEG bytes) per keyframe, oldest first
+        self.duration = duration  # Seconds covered by the storyboard
+        self.audio = audio or []  # (seconds from the start, WAV bytes) per clip, oldest first
+        self.speech_ratio = speech_ratio  # Share of the window holding speech, None without audio
+
+    @property
+    def payload_bytes(self):
+        """Bytes of image and audio data sent with a request."""
+        return sum(len(jpeg) for _, jpeg in self.frames) + sum(len(wav) for _, wav in self.audio)
+
+
+def build_storyboard(snapshot, count=8, max_dimension=1024, target_bytes=100_000, audio=True, source=0,
+                     threshold=0.02, silence="keep", min_speech_ratio=0.0):
+    """
+    Builds a Storyboard from a buffer snapshot.
+
+    Args:
+        snapshot (BufferSnapshot): Snapshot of a RollingVideoBuffer.
+        count (int): Maximum number of keyframes, see select_keyframes().
+        max_dimension (int): Longest side of each keyframe in pixels.
+        target_bytes (int): Byte budget of each keyframe.
+        audio (bool): Whether to include the audio of the window, resampled to 16 kHz mono.
+        source (int): Index of the capture source to use.
+        threshold (float): Change score below which a frame counts as unchanged.
+        silence (str): One of vad_module.SILENCE_MODES. "keep" sends the whole window as one
+            clip, "mute" zeroes the silence in it, "drop" sends only the speech spans, each
+            as a clip with its own start time.
+        min_speech_ratio (float): The audio is left out when less of the window than this
+            holds speech.
+
+    Returns:
+        Storyboard: The keyframes, with times relative to the start of the snapshot's default
+        window (see BufferSnapshot.window()).
+
+    Raises:
+        ValueError: If the buffer holds no video.
+    """
+    video = snapshot.videos[source]
+    if not len(video):
+        raise ValueError("No video frames in the buffer to build a storyboard from.")
+    timestamps = video.timestamps
+    t_start, t_end = snapshot.window(source)
+
+    scores = scene_scores(video)
+    skipped = len(timestamps) - len(scores)
+    # Start from the frame on screen at t_start; older frames are outside the window
+    first = max(skipped, int(np.searchsorted(timestamps, t_start, side="right")) - 1)
+    positions = first + select_keyframes(timestamps[first:], scores[first - skipped:], count, threshold)
+    jpegs = [encode_jpeg(frame, max_dimension, target_bytes) for frame in video.iter_frames(positions)]
+    positions = positions[len(positions) - len(jpegs):]  # Again, only leading frames can be lost
+    frames = [(float(max(timestamps[position] - t_start, 0.0)), jpeg) for position, jpeg in zip(positions, jpegs)]
+
+    clips, ratio = [], None
+    if audio and snapshot.audio.time_range(snapshot.audio_rate) is not None:
+        samples = snapshot.audio.time_window(t_start, t_end, snapshot.audio_rate)
+        samples = resample_audio(samples, snapshot.audio_rate, STORYBOARD_AUDIO_RATE)
+        clips = [(0.0, samples)]
+        if silence != "keep" or min_speech_ratio > 0:
+            spans = speech_segments(samples, STORYBOARD_AUDIO_RATE)
+            ratio = speech_ratio(spans, len(samples))
+            if ratio < min_speech_ratio or not len(spans):
+                clips = []  # Nothing worth uploading
+            elif silence == "mute":
+                clips = [(0.0, mute_silence(samples, spans))]
+            elif silence == "drop":
+                clips = speech_clips(samples, spans, STORYBOARD_AUDIO_RATE)
+        clips = [(seconds, wav_bytes(clip, STORYBOARD_AUDIO_RATE)) for seconds, clip in clips]
+
+    storyboard = Storyboard(frames, float(t_end - t_start), clips, ratio)
+    speech = f", {ratio:.0%} speech" if ratio is not None else ""
+    logger.info(f"Storyboard of {len(frames)} keyframes and {len(clips)} audio clips over "
+                f"{storyboard.duration:.1f} s{speech}, {storyboard.payload_bytes / 1024:.0f} KiB.")
+    return storyboard
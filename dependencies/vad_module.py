@@ -0,0 +1,116 @@
+# vad_module.py
+import numpy as np
+
+# What export and upload do with the silence between speech: keep it, replace it with
+# digital silence (same length, so it stays aligned and costs the audio encoder almost
+# nothing), or drop it and send the speech spans with their times
+SILENCE_MODES = ["keep", "mute", "drop"]
+
+
+def frame_features(samples, rate, frame_ms=20):
+    """
+    Computes the short-term energy and zero-crossing rate of audio, one value per
+    frame, in a few array operations over the whole signal.
+
+    Args:
+        samples (np.ndarray): int16 samples, 1-D or (n, channels). Channels are averaged.
+        rate (int): Sample rate in Hz.
+        frame_ms (float): Frame length in milliseconds.
+
+    Returns:
+        tuple: (energy, zcr, frame_length). energy is the RMS level of each frame in dBFS,
+        zcr the fraction of adjacent sample pairs that change sign. A trailing partial
+        frame is not measured.
+    """
+    samples = np.asarray(samples)
+    if samples.ndim > 1:
+        samples = samples.mean(axis=1)
+    frame_length = max(2, int(rate * frame_ms / 1000))
+    count = len(samples) // frame_length
+    frames = samples[:count * frame_length].reshape(count, frame_length).astype(np.float32)
+
+    power = np.mean(np.square(frames / 32768.0), axis=1)
+    energy = 10 * np.log10(power + 1e-10)
+    centred = frames - frames.mean(axis=1, keepdims=True)  # A DC offset would hide every crossing
+    signs = np.signbit(centred)
+    zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (frame_length - 1)
+    return energy, zcr, frame_length
+
+
+def speech_segments(samples, rate, frame_ms=20, margin_db=12, floor_db=-50, ceiling_db=-30, zcr_threshold=0.25,
+                    padding_ms=200):
+    """
+    Finds the spans of audio that hold speech.
+
+    A frame is voiced when its energy is margin_db above the noise floor (the 10th
+    percentile of frame energies), clamped between floor_db and ceiling_db so that
+    neither near-digital silence nor a window full of speech moves the threshold too
+    far. Quieter frames with many zero crossings count too, which keeps fricatives
+    like "s" and "f". Speech frames are then widened by padding_ms on both sides,
+    which also merges spans separated by short pauses.
+
+    Args:
+        samples (np.ndarray): int16 samples, 1-D or (n, channels).
+        rate (int): Sample rate in Hz.
+        frame_ms (float): Analysis frame length in milliseconds.
+        margin_db (float): Level above the noise floor that counts as speech.
+        floor_db (float): Lowest speech threshold, in dBFS.
+        ceiling_db (float): Highest speech threshold, in dBFS.
+        zcr_threshold (float): Zero-crossing rate above which frames up to 6 dB under
+            the threshold still count as (unvoiced) speech.
+        padding_ms (float): Audio kept before and after each speech span.
+
+    Returns:
+        np.ndarray: (spans, 2) array of [start, end) sample indices, oldest first.
+    """
+    energy, zcr, frame_length = frame_features(samples, rate, frame_ms)
+    if len(energy) == 0:
+        return np.empty((0, 2), dtype=np.int64)
+
+    noise_floor = np.percentile(energy, 10)
+    level = min(max(noise_floor + margin_db, floor_db), ceiling_db)
+    speech = (energy > level) | ((energy > level - 6) & (zcr > zcr_threshold))
+
+    pad = int(round(padding_ms / frame_ms))
+    if pad:
+        speech = np.convolve(speech, np.ones(2 * pad + 1), mode="same") > 0
+
+    # Rising and falling edges of the frame mask, as sample indices
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], speech.astype(np.int8), [0]))))
+    spans = edges.reshape(-1, 2) * frame_length
+    if len(spans) and spans[-1, 1] == len(energy) * frame_length:
+        spans[-1, 1] = len(samples)  # Speech running into the end keeps the unmeasured tail
+    return spans
+
+
+def speech_ratio(spans, total_samples):
+    """
+    Returns:
+        float: Share of total_samples covered by the speech spans, from 0 to 1.
+    """
+    if total_samples <= 0:
+        return 0.0
+    return float(np.sum(spans[:, 1] - spans[:, 0])) / total_samples
+
+
+def mute_silence(samples, spans):
+    """
+    Returns:
+        np.ndarray: A copy of the samples with everything outside the speech spans set to 0.
+        The length is unchanged, so the audio stays aligned with the video.
+    """
+    muted = np.zeros_like(samples)
+    for start, end in spans:
+        muted[start:end] = samples[start:end]
+    return muted
+
+
+def speech_clips(samples, spans, rate):
+    """
+    Cuts the speech spans out of the audio.
+
+    Returns:
+        list: (seconds from the start of samples, samples) per speech span. The offsets
+        keep each clip placed on the video's timeline.
+    """
+    return [(start / rate, samples[start:end]) for start, end in spans]
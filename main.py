@@ -5,7 +5,7 @@ import sys
 import os
 import threading
 from collections import deque
-from dependencies import hotkey_module, tts_module, media_converter, gemini_api_module, recording_module, error_handling_module, config_module
+from dependencies import hotkey_module, tts_module, media_converter, gemini_api_module, recording_module, error_handling_module, config_module, storyboard_module
 import signal
 
 # --- Logging Setup ---
@@ -54,7 +54,7 @@ def main():
        hotkey_module.start_listening_thread() # Start listening for the hotkey in the background.
 
         # Start recording module
-       recording_module_instance = recording_module.RecordingModule()
+       recording_module_instance = recording_module.RecordingModule(config_module.get_recording_settings(config))
        recording_module_instance.start_recording() # Starts recording in the background thread
 
         # Set up signal handlers
@@ -68,6 +68,8 @@ def main():
         error_handling_module.handle_exception(e, "main.py")
     finally:
         is_recording = False # Signal that the recording should end.
+        if recording_module_instance:
+            recording_module_instance.shutdown()
         logger.info("Application finished.")
         # save_buffer_on_exit() # Save the buffer, if any. REMOVE - buffer no longer in use
 
@@ -97,22 +99,31 @@ def process_recording():
         logger.info("Hotkey triggered. Processing recording...")
         global recording_module_instance
         config = config_module.load_config()
-
-        # Get List of video files from recording module
-        segment_list = recording_module_instance.stop_recording_and_get_files()
-
-        if not segment_list:
-             logger.error("Failed to get video segments from the recording module. Cannot send to Gemini API.")
-             return
-        # Convert the video files
-        video_filepath = media_converter.combine_videos(segment_list)
-        if not video_filepath:
-            logger.error("Failed to combine videos. Cannot send to Gemini API.")
-            return
-        
-        # Get AI String response from Gemini API
+        request_settings = config_module.get_request_settings(config)
         prompt = "Please summarize the contents of this video." # TODO Make prompt configurable in config.json
-        response = gemini_api_module.generate_text(prompt, video_filepath)
+
+        if request_settings["mode"] == "keyframes":
+            # Send a few representative frames (and the audio) instead of the whole video
+            storyboard = storyboard_module.build_storyboard(recording_module_instance.buffer.snapshot(),
+                                                            count=request_settings["keyframes"],
+                                                            max_dimension=request_settings["max_dimension"],
+                                                            target_bytes=request_settings["target_bytes"],
+                                                            audio=request_settings["audio"],
+                                                            silence=request_settings["silence"],
+                                                            min_speech_ratio=request_settings["min_speech_ratio"])
+            response = gemini_api_module.generate_text_from_storyboard(prompt, storyboard)
+        else:
+            # Encode the buffered video and audio in memory; disk is only written with debug_dir set
+            video_data = recording_module_instance.export_media(silence=request_settings["silence"],
+                                                                min_speech_ratio=request_settings["min_speech_ratio"],
+                                                                debug_dir=request_settings["debug_dir"],
+                                                                target_bytes=request_settings["max_video_bytes"])
+            if not video_data:
+                logger.error("Failed to export the recording. Cannot send to Gemini API.")
+                return
+
+            # Get AI String response from Gemini API
+            response = gemini_api_module.generate_text_from_media(prompt, video_data)
 
         if response:
            # Read AI response to user with TTS
@@ -134,19 +145,5 @@ def signal_handler(sig, frame):
     exit_event.set() # Set the exit signal for all threads to recognize.
 
 
-# def save_buffer_on_exit(): # REMOVE
-#      """Saves the buffer on exit, only if it contains something."""
-#      global rolling_buffer
-#      if rolling_buffer:
-#          logger.info("Saving rolling buffer to video file.")
-#          video_filepath = media_converter.convert_to_mp4(rolling_buffer)
-#          if video_filepath:
-#              logger.info(f"Video saved to: {video_filepath}")
-#          else:
-#              logger.error("Failed to save video on exit.")
-#      else:
-#         logger.info("Rolling buffer empty, not saving.")
-
-
 if __name__ == '__main__':
     main()
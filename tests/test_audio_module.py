@@ -0,0 +1,52 @@
+import os
+import time
+import unittest
+import sys
+import numpy as np
+# Adjust the sys.path for the location of the python files
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from dependencies.capture_backend_module import SyntheticAudioBackend
+try:
+    from dependencies import audio_module
+except ImportError:  # sounddevice, soundfile and keyboard are needed to import it
+    audio_module = None
+
+
+@unittest.skipUnless(audio_module, "audio_module's dependencies are not installed")
+class TestCallbackRecording(unittest.TestCase):
+
+    def setUp(self):
+        audio_module.audio_ring.clear()
+        audio_module.stream_stats.update(blocks=0, overflows=0, callback_errors=0)
+
+    def tearDown(self):
+        audio_module.stop_recording()
+
+    def test_blocks_are_recorded_without_gaps(self):
+        backend = SyntheticAudioBackend(frequency=440, amplitude=0.5)
+        self.assertTrue(audio_module.start_recording(None, backend))
+        deadline = time.monotonic() + 5
+        while audio_module.stream_stats["blocks"] < 5 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        audio_module.stop_recording()
+
+        blocks = audio_module.stream_stats["blocks"]
+        self.assertGreaterEqual(blocks, 5)
+        self.assertEqual(audio_module.stream_stats["callback_errors"], 0)
+        samples = audio_module.snapshot_audio()
+        # Every block lands right after the previous one: the ring holds one continuous tone
+        expected = backend.block(0, audio_module.SAMPLE_RATE, blocks * audio_module.BLOCK_SIZE)
+        np.testing.assert_array_equal(samples.ravel(), expected)
+
+    def test_snapshot_keeps_the_newest_audio(self):
+        ring_samples = audio_module.audio_ring.capacity
+        audio_module.store_block(np.zeros(ring_samples, dtype=np.int16), 0, False, False)
+        audio_module.store_block(np.ones(1000, dtype=np.int16), 0, True, False)
+        samples = audio_module.snapshot_audio()
+        self.assertEqual(len(samples), ring_samples)
+        self.assertTrue(np.all(samples[-1000:] == 1))
+        self.assertEqual(audio_module.stream_stats["overflows"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import threading
+import unittest
+import sys
+import numpy as np
+# Adjust the sys.path for the location of the python files
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from dependencies.benchmark_module import TimedLock, _per_sample_frames, compare, run_case
+from dependencies.media_converter import AudioArrayClip
+
+
+def make_results(**metrics):
+    case = {"resolution": "640x360", "frame_rate": 5, "buffer_seconds": 10, "storage": "raw"}
+    case.update(metrics)
+    return {"cases": [case]}
+
+
+class TestCompare(unittest.TestCase):
+
+    def test_detects_regressions_in_both_directions(self):
+        baseline = make_results(achieved_fps=5.0, dump_ms=100.0)
+        regressions = compare(make_results(achieved_fps=4.0, dump_ms=150.0), baseline, tolerance=0.1)
+        self.assertEqual(sorted(r["metric"] for r in regressions), ["achieved_fps", "dump_ms"])
+
+    def test_improvements_and_noise_pass(self):
+        baseline = make_results(achieved_fps=5.0, dump_ms=100.0)
+        self.assertEqual(compare(make_results(achieved_fps=5.5, dump_ms=105.0), baseline, tolerance=0.1), [])
+
+    def test_unmatched_cases_are_skipped(self):
+        baseline = {"cases": [dict(make_results(dump_ms=1.0)["cases"][0], resolution="1920x1080")]}
+        self.assertEqual(compare(make_results(dump_ms=100.0), baseline), [])
+
+
+class TestTimedLock(unittest.TestCase):
+
+    def test_records_hold_times(self):
+        lock = TimedLock()
+        with lock:
+            pass
+        condition = threading.Condition(lock)
+        with condition:
+            condition.notify_all()
+        self.assertEqual(len(lock.hold_times), 2)
+
+
+class TestRunCase(unittest.TestCase):
+
+    def test_short_run(self):
+        case = run_case(64, 48, 20, buffer_seconds=1, run_seconds=0.5)
+        self.assertGreater(case["frames_captured"], 0)
+        self.assertGreater(case["append_p50_ms"], 0)
+        self.assertGreater(case["audio_blocks"], 0)
+
+
+class TestAudioClipLookup(unittest.TestCase):
+
+    def test_vectorized_lookup_matches_the_per_sample_loop(self):
+        rng = np.random.default_rng(0)
+        clip = AudioArrayClip(rng.integers(-32768, 32768, (8000, 2), dtype=np.int16), 8000)
+        times = np.concatenate([np.arange(len(clip.arr)) / 8000, [-1.0, -1e-6, 1.5, 100.0]])
+        for chunk in np.array_split(times, 7):
+            np.testing.assert_array_equal(clip.make_frame(chunk), _per_sample_frames(clip, chunk))
+        np.testing.assert_array_equal(clip.make_frame(0.5), _per_sample_frames(clip, [0.5])[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
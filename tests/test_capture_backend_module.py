@@ -0,0 +1,85 @@
+import os
+import threading
+import unittest
+import sys
+import numpy as np
+# Adjust the sys.path for the location of the python files
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from dependencies.capture_backend_module import (SyntheticAudioBackend, SyntheticVideoBackend, make_audio_backend,
+                                                 make_video_backend)
+
+
+class FakeSource:
+    def __init__(self, area):
+        self.area = area
+
+
+class TestSyntheticVideoBackend(unittest.TestCase):
+
+    def test_frames_are_deterministic(self):
+        first = SyntheticVideoBackend(64, 48, motion=4, noise=5, seed=3).open(FakeSource({"monitor": 1}))
+        second = SyntheticVideoBackend(64, 48, motion=4, noise=5, seed=3).open(FakeSource({"monitor": 1}))
+        for _ in range(6):
+            np.testing.assert_array_equal(first.grab(), second.grab())
+
+    def test_frame_format(self):
+        grabber = SyntheticVideoBackend(64, 48).open(FakeSource({"monitor": 1}))
+        frame = grabber.grab()
+        self.assertEqual(grabber.size, (64, 48))
+        self.assertEqual(frame.shape, (48, 64, 4))
+        self.assertEqual(frame.dtype, np.uint8)
+
+    def test_region_sets_size(self):
+        grabber = SyntheticVideoBackend(64, 48).open(FakeSource({"region": (10, 10, 30, 20)}))
+        self.assertEqual(grabber.grab().shape, (20, 30, 4))
+
+    def test_motion(self):
+        moving = SyntheticVideoBackend(64, 48, motion=4).open(FakeSource({"monitor": 1}))
+        self.assertFalse(np.array_equal(moving.grab().copy(), moving.grab()))
+        static = SyntheticVideoBackend(64, 48, motion=0).open(FakeSource({"monitor": 1}))
+        self.assertTrue(np.array_equal(static.grab().copy(), static.grab()))
+
+
+class TestSyntheticAudioBackend(unittest.TestCase):
+
+    def test_blocks_are_continuous(self):
+        backend = SyntheticAudioBackend(frequency=100, amplitude=0.5)
+        joined = np.concatenate([backend.block(0, 8000, 40), backend.block(1, 8000, 40)])
+        np.testing.assert_array_equal(joined, backend.block(0, 8000, 80))
+        self.assertLessEqual(np.abs(joined).max(), 0.5 * 32767)
+
+    def test_delivers_blocks(self):
+        received = []
+        done = threading.Event()
+
+        def callback(samples, latency, overflow, underflow):
+            received.append(samples)
+            if len(received) == 3:
+                done.set()
+
+        backend = SyntheticAudioBackend()
+        backend.start(8000, 80, callback)
+        self.assertTrue(done.wait(timeout=2))
+        backend.stop()
+        self.assertEqual(received[0].dtype, np.int16)
+        self.assertEqual(len(received[0]), 80)
+
+
+class TestBackendFactory(unittest.TestCase):
+
+    def test_options_from_dict(self):
+        backend = make_video_backend({"type": "synthetic", "width": 32, "height": 16})
+        self.assertIsInstance(backend, SyntheticVideoBackend)
+        self.assertEqual((backend.width, backend.height), (32, 16))
+
+    def test_instance_passes_through(self):
+        backend = SyntheticAudioBackend()
+        self.assertIs(make_audio_backend(backend), backend)
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            make_audio_backend("alsa")
+
+
+if __name__ == '__main__':
+    unittest.main()
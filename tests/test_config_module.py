@@ -5,7 +5,7 @@ import sys
 from unittest.mock import patch
 # Adjust the sys.path for the location of the python files
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from config_module import load_config
+from config_module import load_config, get_recording_settings, get_request_settings
 
 
 class TestConfigModule(unittest.TestCase):
@@ -112,6 +112,77 @@ class TestConfigModule(unittest.TestCase):
             load_config(self.CONFIG_FILE)
         self.assertIn("Invalid hotkey format", str(context.exception))
 
+    def test_recording_settings_defaults(self):
+        settings = get_recording_settings(load_config(self.CONFIG_FILE))
+        self.assertEqual(settings['frame_rate'], 5)
+        self.assertEqual(settings['capture_resolution'], {"mode": "native"})
+        self.assertEqual(settings['interpolation'], 'area')
+        self.assertFalse(settings['segment_recording'])
+        self.assertEqual(settings['encoder']['workers'], 1)
+        self.assertFalse(settings['dedup'])
+        self.assertFalse(settings['defer_color'])
+
+    def test_recording_settings_auto_resolution(self):
+        config = dict(self.test_config_data, recording={"capture_resolution": {"mode": "auto", "byte_budget": 300000000}})
+        settings = get_recording_settings(config)
+        self.assertEqual(settings['capture_resolution']['byte_budget'], 300000000)
+        self.assertEqual(settings['video_duration'], 30)
+
+    def test_recording_settings_invalid_resolution(self):
+        config = dict(self.test_config_data, recording={"capture_resolution": {"mode": "width"}})
+        with self.assertRaises(ValueError) as context:
+            get_recording_settings(config)
+        self.assertIn("requires a positive 'width' value", str(context.exception))
+
+    def test_recording_settings_invalid_audio_backend(self):
+        config = dict(self.test_config_data, recording={"audio_backend": "alsa"})
+        with self.assertRaises(ValueError) as context:
+            get_recording_settings(config)
+        self.assertIn("Invalid audio_backend", str(context.exception))
+
+    def test_recording_settings_backend_with_options(self):
+        config = dict(self.test_config_data, recording={"video_backend": {"type": "synthetic", "width": 640}})
+        settings = get_recording_settings(config)
+        self.assertEqual(settings['video_backend']['width'], 640)
+        self.assertEqual(settings['audio_backend'], 'pyaudio')
+
+    def test_request_settings_defaults(self):
+        settings = get_request_settings(self.test_config_data)
+        self.assertEqual(settings['mode'], 'video')
+        self.assertEqual(settings['keyframes'], 8)
+        self.assertIsNone(settings['debug_dir'])
+        self.assertEqual(settings['max_video_bytes'], 14000000)
+
+    def test_request_settings_invalid_mode(self):
+        config = dict(self.test_config_data, request={"mode": "gif"})
+        with self.assertRaises(ValueError) as context:
+            get_request_settings(config)
+        self.assertIn("Invalid request mode", str(context.exception))
+
+    def test_request_settings_invalid_speech_ratio(self):
+        config = dict(self.test_config_data, request={"silence": "drop", "min_speech_ratio": 5})
+        with self.assertRaises(ValueError) as context:
+            get_request_settings(config)
+        self.assertIn("min_speech_ratio", str(context.exception))
+
+    def test_recording_settings_invalid_dedup_threshold(self):
+        config = dict(self.test_config_data, recording={"dedup": True, "dedup_threshold": 1.5})
+        with self.assertRaises(ValueError) as context:
+            get_recording_settings(config)
+        self.assertIn("dedup_threshold", str(context.exception))
+
+    def test_recording_settings_defer_color_needs_raw_storage(self):
+        config = dict(self.test_config_data, recording={"defer_color": True, "storage": "jpeg"})
+        with self.assertRaises(ValueError) as context:
+            get_recording_settings(config)
+        self.assertIn("defer_color", str(context.exception))
+
+    def test_recording_settings_invalid_encoder_workers(self):
+        config = dict(self.test_config_data, recording={"encoder": {"codec": "libx264", "workers": 0}})
+        with self.assertRaises(ValueError) as context:
+            get_recording_settings(config)
+        self.assertIn("'workers'", str(context.exception))
+
     
     
 def run_test():
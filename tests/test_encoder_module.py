@@ -0,0 +1,164 @@
+import os
+import shutil
+import tempfile
+import unittest
+import sys
+import cv2
+import numpy as np
+# Adjust the sys.path for the location of the python files
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from dependencies import encoder_module
+from dependencies.encoder_module import EncoderPool, SegmentEncoder, StreamingEncoder, video_codec_arguments
+from dependencies.ring_buffer_module import FrameRing, SharedFrameRing, make_frame_ring
+
+HAVE_FFMPEG = shutil.which(encoder_module.FFMPEG_BINARY) is not None
+
+
+class TestCodecArguments(unittest.TestCase):
+
+    def test_rate_controlled_codec(self):
+        arguments = video_codec_arguments("libx264", "fast", 30)
+        self.assertEqual(arguments[:6], ["-c:v", "libx264", "-preset", "fast", "-crf", "30"])
+
+    def test_other_codec_has_no_crf(self):
+        self.assertNotIn("-crf", video_codec_arguments("mpeg4"))
+
+
+@unittest.skipUnless(HAVE_FFMPEG, "ffmpeg is not installed")
+class TestStreamingEncoder(unittest.TestCase):
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def frames(self, count, channels=3):
+        return (np.full((48, 64, channels), value * 20, dtype=np.uint8) for value in range(count))
+
+    def test_video_only(self):
+        filename = os.path.join(self.output_dir, "video.mp4")
+        encoder = StreamingEncoder(64, 48, 10)
+        self.assertEqual(encoder.encode(self.frames(10), filename), filename)
+        self.assertGreater(os.path.getsize(filename), 0)
+        self.assertFalse(os.path.exists(encoder.temp_path))
+
+    def test_video_with_audio(self):
+        filename = os.path.join(self.output_dir, "video.mkv")
+        encoder = StreamingEncoder(64, 48, 10, pixel_format="bgra", audio_rate=8000, container="mkv")
+        audio = (np.sin(np.arange(8000) / 5) * 5000).astype(np.int16)
+        encoder.encode(self.frames(10, channels=4), filename, audio)
+        self.assertGreater(os.path.getsize(filename), 0)
+
+    def test_in_memory(self):
+        encoder = StreamingEncoder(64, 48, 10, audio_rate=8000, in_memory=True)
+        self.assertIsNone(encoder.temp_path)
+        audio = (np.sin(np.arange(8000) / 5) * 5000).astype(np.int16)
+        data = encoder.encode(self.frames(10), audio=audio)
+        self.assertEqual(data[4:8], b"ftyp")
+        self.assertIn(b"moof", data)  # Fragmented: a pipe cannot be seeked back to write the index
+        filename = os.path.join(self.output_dir, "memory.mp4")
+        with open(filename, 'wb') as f:
+            f.write(data)
+        capture = cv2.VideoCapture(filename)
+        frames = 0
+        while capture.read()[0]:
+            frames += 1
+        capture.release()
+        self.assertEqual(frames, 10)
+
+    def test_pool_separates_memory_and_file_encoders(self):
+        pool = EncoderPool()
+        pool.prepare(64, 48, 10, in_memory=True)
+        spare = pool._spare
+        encoder = pool.acquire(64, 48, 10)
+        self.assertIsNot(encoder, spare)
+        self.assertIsNotNone(encoder.temp_path)
+        encoder.close()
+        self.assertIsInstance(pool.acquire(64, 48, 10, in_memory=True).encode(self.frames(3)), bytes)
+        pool.close()
+
+    def test_wrong_frame_size(self):
+        encoder = StreamingEncoder(64, 48, 10)
+        with self.assertRaises(ValueError):
+            encoder.encode([np.zeros((10, 10, 3), dtype=np.uint8)], os.path.join(self.output_dir, "bad.mp4"))
+
+    def test_pool_keeps_a_spare(self):
+        pool = EncoderPool()
+        pool.prepare(64, 48, 10)
+        spare = pool._spare
+        encoder = pool.acquire(64, 48, 10)
+        self.assertIs(encoder, spare)
+        self.assertIsNotNone(pool._spare)
+        encoder.encode(self.frames(3), os.path.join(self.output_dir, "pooled.mp4"))
+        pool.close()
+        self.assertIsNone(pool._spare)
+
+
+class TestSegmentCount(unittest.TestCase):
+
+    def test_short_exports_stay_whole(self):
+        encoder = SegmentEncoder(workers=4, min_segment_seconds=2)
+        self.assertEqual(encoder.segment_count(30, 10), 1)
+        self.assertEqual(encoder.segment_count(50, 10), 2)
+        self.assertEqual(encoder.segment_count(3000, 10), 4)
+
+
+@unittest.skipUnless(HAVE_FFMPEG, "ffmpeg is not installed")
+class TestSegmentEncoder(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.encoder = SegmentEncoder(workers=3, min_segment_seconds=1)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.encoder.close()
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def encode_and_read(self, ring, positions, audio=None):
+        for value in range(40):
+            ring.append(np.full((48, 64, 3), value * 6, dtype=np.uint8), value / 10)
+        filename = os.path.join(self.output_dir, "segments.mp4")
+        lost = self.encoder.encode(ring.snapshot(), positions, 10, filename, audio, 8000 if audio is not None else None)
+        self.assertEqual(lost, 0)
+        capture = cv2.VideoCapture(filename)
+        means = []
+        while True:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            means.append(frame.mean())
+        capture.release()
+        return np.array(means)
+
+    def assert_frames(self, means, positions):
+        self.assertEqual(len(means), len(positions))
+        np.testing.assert_allclose(means, np.asarray(positions) * 6, atol=5)
+
+    def test_in_process_ring_is_staged(self):
+        positions = np.repeat(np.arange(5, 40), 2)[:60]
+        audio = np.zeros(6 * 8000, dtype=np.int16)
+        self.assert_frames(self.encode_and_read(FrameRing(40), positions, audio), positions)
+
+    def test_shared_ring(self):
+        ring = SharedFrameRing(40, (48, 64, 3))
+        try:
+            positions = np.arange(40)
+            self.assert_frames(self.encode_and_read(ring, positions), positions)
+        finally:
+            ring.close()
+            ring.unlink()
+
+    def test_compressed_ring(self):
+        positions = np.arange(40)
+        self.assert_frames(self.encode_and_read(make_frame_ring(40, "jpeg"), positions), positions)
+
+
+if __name__ == '__main__':
+    unittest.main()
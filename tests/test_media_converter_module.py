@@ -1,9 +1,18 @@
 import os
+import shutil
+import struct
 import subprocess
 import sys
 import tempfile
+import unittest
 import cv2
 import numpy as np
+# Adjust the sys.path for the location of the python files
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from dependencies import encoder_module
+from dependencies.media_converter import (BUDGET_AUDIO_BITRATE, KEYFRAME_INTERVAL, AudioArrayClip, _estimate_bytes,
+                                          _frame_sizes, _select_segments, combine_videos, encode_to_budget, probe_video)
+from dependencies.ring_buffer_module import FrameRing
 
 # Project directories (assuming the test file is in 'tests' dir)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -14,6 +23,8 @@ RED = '\033[91m'
 GREEN = '\033[92m'
 RESET = '\033[0m'
 
+HAVE_FFMPEG = shutil.which(encoder_module.FFMPEG_BINARY) is not None
+
 def run_test():
     results = {"tests": [], "success": True}
     media_converter_path = os.path.join(DEPENDENCIES_DIR, "media_converter.py")
@@ -112,6 +123,174 @@ def run_test():
     return results
 
 
+def write_segment(path, first_value, frame_count=30, size=(64, 48), fourcc='mp4v'):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), 30, size)
+    for index in range(frame_count):
+        writer.write(np.full((size[1], size[0], 3), (first_value + index) * 4 % 256, dtype=np.uint8))
+    writer.release()
+    return path
+
+
+def read_frames(path):
+    capture = cv2.VideoCapture(path)
+    frames = []
+    while True:
+        success, frame = capture.read()
+        if not success:
+            break
+        frames.append(frame)
+    capture.release()
+    return frames
+
+
+class TestSelectSegments(unittest.TestCase):
+
+    def test_whole_timeline(self):
+        self.assertEqual(_select_segments([2.0, 2.0, 2.0], None, None), ([0, 1, 2], None, None))
+
+    def test_window_cuts_into_segments(self):
+        indices, inpoint, outpoint = _select_segments([2.0, 2.0, 2.0, 2.0], 2.5, 5.0)
+        self.assertEqual(indices, [1, 2])
+        self.assertAlmostEqual(inpoint, 0.5)
+        self.assertAlmostEqual(outpoint, 1.0)
+
+    def test_window_on_segment_boundaries(self):
+        self.assertEqual(_select_segments([2.0, 2.0, 2.0], 2.0, 4.0), ([1], None, None))
+
+    def test_empty_window(self):
+        with self.assertRaises(ValueError):
+            _select_segments([2.0], 3.0, None)
+
+
+@unittest.skipUnless(HAVE_FFMPEG, "ffmpeg is not installed")
+class TestCombineVideos(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.output = os.path.join(self.directory, "combined.mp4")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def segments(self, count, **options):
+        return [write_segment(os.path.join(self.directory, f"segment_{index}.mp4"), index * 30, **options)
+                for index in range(count)]
+
+    def test_stream_copy(self):
+        self.assertEqual(combine_videos(self.segments(3), self.output), self.output)
+        info = probe_video(self.output)
+        self.assertEqual(info["codec"], "FMP4")  # Copied, not re-encoded to H.264
+        frames = read_frames(self.output)
+        self.assertEqual(len(frames), 90)
+        np.testing.assert_allclose([frame[0, 0, 0] for frame in frames[::30]], [0, 120, 240], atol=6)
+
+    def test_trimmed_window(self):
+        combine_videos(self.segments(3), self.output, t_start=0.5, t_end=2.5)
+        frames = read_frames(self.output)
+        self.assertEqual(len(frames), 60)
+        self.assertAlmostEqual(int(frames[0][0, 0, 0]), 15 * 4, delta=6)
+
+    def test_mismatched_segments_are_reencoded(self):
+        paths = self.segments(2)
+        paths.append(write_segment(os.path.join(self.directory, "larger.mp4"), 60, size=(128, 96)))
+        combine_videos(paths, self.output)
+        info = probe_video(self.output)
+        self.assertEqual(info["codec"], "h264")
+        self.assertEqual((info["width"], info["height"]), (64, 48))
+        self.assertEqual(len(read_frames(self.output)), 90)
+
+    def test_unreadable_segments_are_skipped(self):
+        empty = os.path.join(self.directory, "empty.mp4")
+        open(empty, 'wb').close()
+        self.assertEqual(combine_videos([empty] + self.segments(1), self.output), self.output)
+        self.assertIsNone(combine_videos([empty], self.output))
+
+
+class TestSizeEstimate(unittest.TestCase):
+
+    def test_frame_sizes(self):
+        boxes = b"".join(struct.pack(">I4s", 8 + len(payload), kind) + payload
+                         for kind, payload in [(b"moof", b"x" * 4), (b"mdat", b"y" * 10), (b"moof", b""),
+                                               (b"mdat", b"z" * 3)])
+        self.assertEqual(_frame_sizes(boxes).tolist(), [10, 3])
+
+    def test_keyframes_are_scaled_separately(self):
+        sizes = np.array([100.0, 1, 1, 1, 100, 1, 1, 1])
+        frame_count = 2 * KEYFRAME_INTERVAL
+        self.assertEqual(_estimate_bytes(sizes, 4, frame_count), 2 * 100 + (frame_count - 2) * 1)
+
+
+class TestAudioArrayClip(unittest.TestCase):
+
+    def setUp(self):
+        self.arr = np.arange(20, dtype=np.int16).reshape(10, 2) + 1  # 10 stereo frames, none silent
+        self.clip = AudioArrayClip(self.arr, 10)
+
+    def test_single_time(self):
+        frame = self.clip.make_frame(0.35)
+        self.assertIsInstance(frame, np.ndarray)
+        self.assertEqual(frame.tolist(), [7, 8])
+
+    def test_array_of_times(self):
+        frames = self.clip.make_frame(np.array([-0.1, 0.0, 0.55, 1.0, 1.2]))
+        self.assertEqual(frames.shape, (5, 2))
+        # Silence outside the clip, and the end of the clip holds the last frame
+        self.assertEqual(frames.tolist(), [[0, 0], [1, 2], [11, 12], [19, 20], [0, 0]])
+
+    def test_source_is_not_modified(self):
+        self.clip.make_frame(np.array([-1.0, 5.0]))
+        self.assertEqual(self.arr.min(), 1)
+
+    def test_invalid_arrays(self):
+        with self.assertRaises(ValueError):
+            AudioArrayClip(np.zeros(10), 10)
+        with self.assertRaises(ValueError):
+            AudioArrayClip(np.zeros((10, 0)), 10)
+        with self.assertRaises(ValueError):
+            AudioArrayClip(np.zeros((0, 2)), 10)
+
+
+@unittest.skipUnless(HAVE_FFMPEG, "ffmpeg is not installed")
+class TestEncodeToBudget(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        ring = FrameRing(50)
+        for index in range(50):
+            ring.append(rng.integers(0, 256, (120, 160, 3), dtype=np.uint8), index / 10)
+        self.video = ring.snapshot()
+        self.positions = np.arange(50)
+
+    def test_generous_budget_keeps_the_best_settings(self):
+        result = encode_to_budget(self.video, self.positions, 10, 50_000_000)
+        self.assertEqual((result.width, result.height, result.frame_rate, result.crf), (160, 120, 10, 23))
+        self.assertEqual(result.attempts, 1)
+        self.assertIsNone(result.estimate)  # Small enough not to probe
+        self.assertEqual(result.data[4:8], b"ftyp")
+
+    def test_tight_budget_shrinks_the_video(self):
+        full = encode_to_budget(self.video, self.positions, 10, 50_000_000).size
+        result = encode_to_budget(self.video, self.positions, 10, full // 4)
+        self.assertLessEqual(result.size, full // 4)
+        self.assertLess((result.width, result.frame_rate, -result.crf), (160, 10, -23))
+        self.assertIsNotNone(result.estimate)
+        self.assertIn("fps", str(result))
+
+    def test_pool_spare_is_used_for_the_best_rung(self):
+        pool = encoder_module.EncoderPool(crf=30)
+        pool.prepare(160, 120, 10, in_memory=True, audio_bitrate=BUDGET_AUDIO_BITRATE)
+        spare = pool._spare
+        result = encode_to_budget(self.video, self.positions, 10, 50_000_000, pool=pool)
+        self.assertEqual(result.crf, 30)
+        self.assertIsNotNone(spare.process.poll())  # Encoded and finished
+        self.assertIsNot(pool._spare, spare)
+        pool.close()
+
+    def test_budget_smaller_than_the_audio(self):
+        with self.assertRaises(ValueError):
+            encode_to_budget(self.video, self.positions, 10, 1000, np.zeros(8000 * 5, dtype=np.int16), 8000)
+
+
 if __name__ == "__main__":
     test_results = run_test()
     if test_results:
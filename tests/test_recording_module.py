@@ -1,6 +1,19 @@
+import multiprocessing
 import os
+import shutil
 import subprocess
+import tempfile
+import time
+import unittest
 import sys
+import cv2
+import numpy as np
+# Adjust the sys.path for the location of the python files
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from dependencies import config_module
+from dependencies.recording_module import (AdaptiveRate, FramePacer, RecordingModule, RollingVideoBuffer,
+                                           SegmentRecorder, VideoSource, compute_capture_size, frame_difference,
+                                           frame_signature, normalize_source, to_bgr)
 
 # Project directories (assuming the test file is in 'tests' dir)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -61,6 +74,353 @@ def run_test():
     return results
 
 
+class TestComputeCaptureSize(unittest.TestCase):
+
+    def test_native(self):
+        self.assertEqual(compute_capture_size(1920, 1080), (1920, 1080))
+        self.assertEqual(compute_capture_size(1920, 1080, {"mode": "native"}), (1920, 1080))
+
+    def test_width(self):
+        self.assertEqual(compute_capture_size(1920, 1080, {"mode": "width", "width": 1280}), (1280, 720))
+
+    def test_max_pixels(self):
+        width, height = compute_capture_size(1920, 1080, {"mode": "max_pixels", "max_pixels": 1000000})
+        self.assertLessEqual(width * height, 1000000)
+        self.assertEqual((width, height), (1332, 750))
+
+    def test_scale_rounds_to_even(self):
+        self.assertEqual(compute_capture_size(1366, 768, {"mode": "scale", "scale": 0.5}), (682, 384))
+
+    def test_auto_fits_the_byte_budget(self):
+        policy = {"mode": "auto", "byte_budget": 300000000}
+        width, height = compute_capture_size(1920, 1080, policy, frame_count=150)
+        self.assertLessEqual(width * height * 3 * 150, 300000000)
+        self.assertGreater(width * height * 3 * 150, 0.95 * 300000000)
+        # Four bytes per pixel leave room for fewer pixels
+        bgra_width, bgra_height = compute_capture_size(1920, 1080, policy, frame_count=150, channels=4)
+        self.assertLessEqual(bgra_width * bgra_height * 4 * 150, 300000000)
+        self.assertLess(bgra_width, width)
+
+    def test_never_upscales(self):
+        self.assertEqual(compute_capture_size(640, 480, {"mode": "width", "width": 1280}), (640, 480))
+        self.assertEqual(compute_capture_size(640, 480, {"mode": "auto", "byte_budget": 10 ** 12}), (640, 480))
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            compute_capture_size(1920, 1080, {"mode": "fit"})
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestFramePacer(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.pacer = FramePacer(8, clock=self.clock, sleep=self.clock.sleep)  # 0.125 s period
+
+    def test_work_is_absorbed_into_the_period(self):
+        for _ in range(16):
+            self.clock.now += 0.0625  # Capture work
+            self.assertEqual(self.pacer.wait(), 0)
+        # Deadlines are absolute, so the loop ends exactly on the 16th tick instead of drifting
+        self.assertEqual(self.clock.now, 2.0)
+        self.assertEqual(self.clock.sleeps, [0.0625] * 16)
+        self.assertEqual(self.pacer.stats()["achieved_fps"], 8)
+
+    def test_overrun_skips_missed_ticks(self):
+        self.clock.now += 0.4  # Work overran the first deadline by more than two periods
+        self.assertEqual(self.pacer.wait(), 2)
+        self.assertEqual(self.clock.sleeps, [])
+        self.assertEqual(self.pacer.next_deadline, 0.5)  # Back on the original grid
+        self.clock.now += 0.0625
+        self.assertEqual(self.pacer.wait(), 0)
+        self.assertEqual(self.clock.now, 0.5)
+        stats = self.pacer.stats()
+        self.assertEqual((stats["late_frames"], stats["dropped_frames"]), (1, 2))
+
+    def test_set_rate(self):
+        self.pacer.set_rate(4)
+        self.assertEqual(self.pacer.next_deadline, 0.25)
+        self.clock.now = 1.0
+        self.pacer.set_rate(2)  # The moved deadline has passed, so it restarts from now
+        self.assertEqual(self.pacer.next_deadline, 1.5)
+
+
+class TestAdaptiveRate(unittest.TestCase):
+
+    def setUp(self):
+        self.rate = AdaptiveRate(floor=1, ceiling=5, saturation=0.02, hold=1.0)
+
+    def test_rate_follows_motion_between_floor_and_ceiling(self):
+        self.assertEqual(self.rate.rate, 5)  # Starts high until the first comparison
+        self.assertEqual(self.rate.update(0.5, 0.0), 5)  # Saturated
+        self.assertEqual(self.rate.update(0.0, 2.0), 1)
+        self.assertEqual(self.rate.update(0.01, 3.0), 3)  # Half of the saturation
+        self.assertEqual(self.rate.update(0.1, 3.2), 5)  # Increases apply at once
+
+    def test_rate_is_held_after_motion(self):
+        self.rate.update(0.5, 10.0)
+        self.assertEqual(self.rate.update(0.0, 10.5), 5)
+        self.assertEqual(self.rate.update(0.0, 10.99), 5)
+        self.assertEqual(self.rate.update(0.0, 11.0), 1)
+        # Motion at the held rate restarts the hold
+        self.rate.update(0.02, 20.0)
+        self.rate.update(0.0, 20.8)
+        self.rate.update(0.03, 20.9)
+        self.assertEqual(self.rate.update(0.0, 21.5), 5)
+        self.assertEqual(self.rate.update(0.0, 21.9), 1)
+
+    def test_invalid_bounds(self):
+        for floor, ceiling in [(0, 5), (6, 5)]:
+            with self.assertRaises(ValueError):
+                AdaptiveRate(floor, ceiling)
+
+
+def run_buffer(frames=3, **options):
+    # Captures a few frames from the synthetic backends and stops
+    options = dict({"video_backend": {"type": "synthetic", "width": 64, "height": 48},
+                    "audio_backend": "synthetic", "frame_rate": 20}, **options)
+    buffer = RollingVideoBuffer(video_duration=2, audio_duration=2, **options)
+    buffer.start()
+    try:
+        with buffer.frame_ready:
+            buffer.frame_ready.wait_for(lambda: all(len(source.video_buffer) >= frames for source in buffer.sources),
+                                        timeout=5)
+    finally:
+        buffer.stop()
+    return buffer
+
+
+class TypingBackend:
+    # Changes one more sampled pixel of a 64x48 screen per grab, like text being typed
+    def open(self, source):
+        return self
+
+    size = (64, 48)
+
+    def __init__(self):
+        self.frame = np.zeros((48, 64, 4), dtype=np.uint8)
+        self.index = 0
+
+    def grab(self):
+        row, column = divmod(self.index % 48, 8)
+        self.frame[row * 8, column * 8] ^= 255
+        self.index += 1
+        return self.frame
+
+    def close(self):
+        pass
+
+
+class TestDedup(unittest.TestCase):
+
+    def test_gradual_changes_are_stored(self):
+        # Every grab changes 1/48 of the sample, under the threshold; every third adds up past it
+        buffer = run_buffer(frames=12, video_backend=TypingBackend(), dedup=True, dedup_threshold=0.05)
+        self.assertGreater(buffer.sources[0].capture_stats["duplicate_frames"], 0)
+        signatures = [frame_signature(frame) for frame in buffer.get_video_buffer()]
+        # Duplicates repeat the stored frame; every change between stored frames passed the threshold
+        changes = [frame_difference(signature, previous) for previous, signature in zip(signatures, signatures[1:])]
+        stored_changes = [change for change in changes if change > 0]
+        self.assertGreaterEqual(len(stored_changes), 2)
+        self.assertTrue(all(change > 0.05 for change in stored_changes))
+
+
+class TestDeferredColor(unittest.TestCase):
+
+    def test_to_bgr(self):
+        bgr = np.random.default_rng(0).integers(0, 256, (4, 6, 3), dtype=np.uint8)
+        self.assertIs(to_bgr(bgr), bgr)
+        bgra = cv2.cvtColor(bgr, cv2.COLOR_BGR2BGRA)
+        out = np.empty_like(bgr)
+        self.assertIs(to_bgr(bgra, out), out)
+        np.testing.assert_array_equal(out, bgr)
+
+    def test_grabs_are_stored_as_bgra(self):
+        buffer = run_buffer(defer_color=True)
+        self.assertEqual(buffer.frame_format, "bgra")
+        frames = buffer.get_video_buffer()
+        self.assertEqual(frames.shape[1:], (48, 64, 4))
+        # Converting on export gives the same frame as converting at capture
+        grab = buffer.video_backend.open(buffer.sources[0]).grab()
+        np.testing.assert_array_equal(to_bgr(frames[0]), cv2.cvtColor(grab, cv2.COLOR_BGRA2BGR))
+
+    def test_auto_resolution_counts_four_channels(self):
+        budget = 64 * 48 * 3 * 40  # The full frame fits at three bytes per pixel, not at four
+        self.assertEqual(run_buffer(capture_resolution={"mode": "auto", "byte_budget": budget}).sources[0].capture_size,
+                         (64, 48))
+        source = run_buffer(defer_color=True, capture_resolution={"mode": "auto", "byte_budget": budget}).sources[0]
+        width, height = source.capture_size
+        self.assertLessEqual(width * height * 4 * source.video_buffer.capacity, budget)
+
+    def test_requires_raw_storage(self):
+        with self.assertRaises(ValueError):
+            RollingVideoBuffer(defer_color=True, storage="jpeg", video_backend="synthetic", audio_backend="synthetic")
+
+
+class TestCaptureProcess(unittest.TestCase):
+
+    def test_child_fills_the_shared_rings(self):
+        buffer = RollingVideoBuffer(video_duration=2, audio_duration=2, frame_rate=20, capture_process=True,
+                                    video_backend={"type": "synthetic", "width": 64, "height": 48},
+                                    audio_backend="synthetic")
+        buffer.start()
+        try:
+            self.assertIsInstance(buffer._process, multiprocessing.context.SpawnProcess)
+            deadline = time.monotonic() + 30  # The spawned child imports the modules afresh
+            while time.monotonic() < deadline and len(buffer.video_buffer) < 3:
+                time.sleep(0.1)
+            with buffer.lock:
+                snapshot = buffer.video_buffer.snapshot()
+            self.assertGreaterEqual(len(snapshot), 3)
+            self.assertEqual(snapshot.to_array().shape[1:], (48, 64, 3))
+            # Frames committed by the child wake waiters in this process
+            with buffer.frame_ready:
+                self.assertTrue(buffer.frame_ready.wait(timeout=0.5))
+        finally:
+            buffer.stop()
+        self.assertIsNone(buffer._process)
+        # The rings are copied out of shared memory, so the buffer stays readable
+        self.assertGreaterEqual(len(buffer.get_video_buffer()), 3)
+        self.assertGreater(len(buffer.get_audio_buffer()), 0)
+
+
+class TestSources(unittest.TestCase):
+
+    def test_normalize_source(self):
+        self.assertEqual(normalize_source(2, 5), ({"monitor": 2}, 5))
+        self.assertEqual(normalize_source("all", 5), ({"monitor": 0}, 5))
+        self.assertEqual(normalize_source({"region": [10, 20, 300, 200.0], "frame_rate": 15}, 5),
+                         ({"region": (10, 20, 300, 200)}, 15))
+
+    def test_invalid_sources(self):
+        for spec in ["main", {"region": [0, 0, 0, 100]}, {"monitor": 1, "frame_rate": 0}, {"frame_rate": 5}]:
+            with self.assertRaises(ValueError):
+                normalize_source(spec, 5)
+
+    def test_names(self):
+        self.assertEqual(VideoSource({"monitor": 2}, 5, None).name, "monitor_2")
+        self.assertEqual(VideoSource({"monitor": 0}, 5, None).name, "all_monitors")
+        self.assertEqual(VideoSource({"region": (10, 20, 300, 200)}, 5, None).name, "region_10_20_300x200")
+
+    def test_dump_writes_a_file_per_source(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        buffer = run_buffer(sources=[1, {"region": [0, 0, 32, 24], "frame_rate": 10}])
+        self.assertEqual(buffer.sources[1].frame_rate, 10)
+        buffer.dump_to_disk(os.path.join(directory, "screen.mp4"))
+        self.assertEqual(sorted(os.listdir(directory)), ["screen.mp4", "screen_region_0_0_32x24.mp4"])
+        capture = cv2.VideoCapture(os.path.join(directory, "screen_region_0_0_32x24.mp4"))
+        self.assertEqual(int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)), 32)
+        capture.release()
+
+
+class TestExportWindow(unittest.TestCase):
+
+    def test_windows_are_limited_to_the_video_duration(self):
+        # The ring is sized for the 5 fps ceiling, so at the floor rate it holds 300 s of history
+        buffer = RollingVideoBuffer(video_duration=30, frame_rate=5, adaptive_rate={"floor": 0.5},
+                                    video_backend="synthetic", audio_backend="synthetic")
+        for index in range(150):
+            buffer.video_buffer.append(np.full((48, 64, 3), index, dtype=np.uint8), index * 2.0)
+        snapshot = buffer.snapshot()
+        self.assertEqual(snapshot.window(), (268.2, 298.2))
+        self.assertEqual(buffer._export_window(snapshot, 0, None, None, "keep", 0.0)[4], 30.0)
+        self.assertEqual(buffer._export_window(snapshot, 0, 100.0, None, "keep", 0.0)[4], 30.0)
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, "screen.mp4")
+        buffer.dump_to_disk(path, snapshot=snapshot)
+        capture = cv2.VideoCapture(path)
+        self.assertEqual(int(capture.get(cv2.CAP_PROP_FRAME_COUNT)), 150)
+        capture.release()
+
+
+class TestRecordingModule(unittest.TestCase):
+
+    def make_module(self, **settings):
+        settings = dict(config_module.DEFAULT_RECORDING_SETTINGS, video_duration=2, audio_duration=2, frame_rate=20,
+                        video_backend={"type": "synthetic", "width": 64, "height": 48}, audio_backend="synthetic",
+                        encoder=None, **settings)
+        return RecordingModule(settings, segment_duration=0.25)
+
+    def test_segments_are_off_by_default(self):
+        recording = self.make_module()
+        self.assertIsNone(recording.segment_recorder)
+        recording.start_recording()
+        time.sleep(0.2)
+        self.assertEqual(recording.stop_recording_and_get_files(), [])
+        recording.shutdown()
+
+    def test_dedup_settings_reach_the_buffer(self):
+        recording = self.make_module(dedup=True, dedup_threshold=0.1)
+        self.assertTrue(recording.buffer.dedup)
+        self.assertEqual(recording.buffer.dedup_threshold, 0.1)
+        recording.shutdown()
+
+    def test_defer_color_setting_reaches_the_buffer(self):
+        recording = self.make_module(defer_color=True)
+        self.assertEqual(recording.buffer.frame_format, "bgra")
+        recording.shutdown()
+
+    def test_default_encoder_has_no_worker_pool(self):
+        recording = RecordingModule(dict(config_module.DEFAULT_RECORDING_SETTINGS, video_backend="synthetic",
+                                         audio_backend="synthetic"))
+        self.assertIsNotNone(recording.buffer._encoder_pool)
+        self.assertIsNone(recording.buffer._segment_encoder)
+
+    def test_segment_directory_is_removed_at_shutdown(self):
+        recording = self.make_module(segment_recording=True)
+        recording.start_recording()
+        time.sleep(0.6)
+        self.assertTrue(recording.stop_recording_and_get_files())
+        output_dir = recording.segment_recorder.output_dir
+        recording.shutdown()
+        self.assertFalse(os.path.exists(output_dir))
+
+
+class TestSegmentRecorder(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_compressed_frames_are_segmented(self):
+        buffer = RollingVideoBuffer(video_duration=2, frame_rate=20, storage="jpeg", video_backend="synthetic",
+                                    audio_backend="synthetic")
+        recorder = SegmentRecorder(buffer, self.directory, segment_duration=0.5)
+        recorder.start()
+        time.sleep(0.1)  # Let the recorder start waiting for frames
+        with buffer.frame_ready:
+            for index in range(30):
+                buffer.video_buffer.append(np.full((48, 64, 3), index * 8, dtype=np.uint8), index / 20)
+            buffer.frame_ready.notify_all()
+        recorder.stop()
+
+        segments = recorder.collect_segments()
+        self.assertEqual(len(segments), 3)
+        for number, path in enumerate(segments):
+            capture = cv2.VideoCapture(path)
+            self.assertEqual(int(capture.get(cv2.CAP_PROP_FRAME_COUNT)), 10)
+            success, frame = capture.read()
+            capture.release()
+            self.assertAlmostEqual(int(frame[0, 0, 0]), number * 80, delta=4)
+
+
 if __name__ == "__main__":
     test_results = run_test()
     if test_results:
@@ -0,0 +1,387 @@
+import os
+import pickle
+import unittest
+import sys
+import numpy as np
+# Adjust the sys.path for the location of the python files
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from dependencies.ring_buffer_module import (FrameRing, AudioRing, EncodedFrameRing, SharedFrameRing, SharedAudioRing,
+                                             make_frame_ring, resample_positions)
+
+
+class TestFrameRing(unittest.TestCase):
+
+    def make_frame(self, value):
+        return np.full((4, 6, 3), value, dtype=np.uint8)
+
+    def test_empty_ring(self):
+        ring = FrameRing(3)
+        self.assertEqual(len(ring), 0)
+        self.assertIsNone(ring.frame_shape)
+        self.assertEqual(list(ring.iter_frames()), [])
+
+    def test_preallocates_storage(self):
+        ring = FrameRing(5, (4, 6, 3))
+        self.assertEqual(ring.frames.shape, (5, 4, 6, 3))
+        self.assertEqual(ring.nbytes, 5 * 4 * 6 * 3)
+
+    def test_chronological_order_after_wraparound(self):
+        ring = FrameRing(3)
+        for value in range(5):
+            ring.append(self.make_frame(value), float(value))
+
+        self.assertEqual(len(ring), 3)
+        self.assertEqual([int(frame[0, 0, 0]) for frame in ring.iter_frames()], [2, 3, 4])
+        self.assertEqual(ring.ordered_timestamps().tolist(), [2.0, 3.0, 4.0])
+        self.assertEqual(ring.to_array()[:, 0, 0, 0].tolist(), [2, 3, 4])
+
+    def test_writes_in_place(self):
+        ring = FrameRing(2)
+        ring.append(self.make_frame(1), 0.0)
+        storage = ring.frames
+        slot = ring.next_slot((4, 6, 3))
+        slot[:] = 9
+        ring.commit(1.0)
+
+        self.assertIs(ring.frames, storage)
+        self.assertTrue(np.shares_memory(slot, storage))
+        self.assertEqual(ring.to_array()[:, 0, 0, 0].tolist(), [1, 9])
+
+    def test_duplicates_reference_previous_slot(self):
+        ring = FrameRing(4)
+        ring.append(self.make_frame(1), 0.0)
+        ring.commit_duplicate(1.0)
+        ring.commit_duplicate(2.0)
+        ring.append(self.make_frame(2), 3.0)
+
+        self.assertEqual(ring.duplicates, 2)
+        self.assertEqual([int(frame[0, 0, 0]) for frame in ring.iter_frames()], [1, 1, 1, 2])
+        self.assertEqual(ring.ordered_timestamps().tolist(), [0.0, 1.0, 2.0, 3.0])
+
+    def test_duplicates_survive_slot_reuse(self):
+        ring = FrameRing(3)
+        expected = []
+        for step in range(20):
+            if step % 3 == 2:
+                ring.commit_duplicate(float(step))
+                expected.append(expected[-1])
+            else:
+                ring.append(self.make_frame(step), float(step))
+                expected.append(step)
+            self.assertEqual([int(frame[0, 0, 0]) for frame in ring.iter_frames()], expected[-3:])
+
+    def test_duplicate_in_empty_ring(self):
+        with self.assertRaises(ValueError):
+            FrameRing(2).commit_duplicate(0.0)
+
+    def test_positions_since(self):
+        ring = FrameRing(4)
+        for value in range(3):
+            ring.append(self.make_frame(value), float(value))
+        sequence = ring.sequence
+        for value in range(3, 6):
+            ring.append(self.make_frame(value), float(value))
+
+        positions = ring.positions_since(sequence)
+        self.assertEqual(ring.ordered_timestamps()[positions].tolist(), [3.0, 4.0, 5.0])
+        self.assertEqual(len(ring.positions_since(0)), 4)
+        self.assertEqual(len(ring.positions_since(ring.sequence)), 0)
+
+    def test_shape_change_reallocates(self):
+        ring = FrameRing(2)
+        ring.append(self.make_frame(1), 0.0)
+        ring.append(np.zeros((2, 2, 3), dtype=np.uint8), 1.0)
+
+        self.assertEqual(ring.frame_shape, (2, 2, 3))
+        self.assertEqual(len(ring), 1)
+
+    def test_invalid_capacity(self):
+        with self.assertRaises(ValueError):
+            FrameRing(0)
+
+
+class TestEncodedFrameRing(unittest.TestCase):
+
+    def make_frame(self, value):
+        return np.full((16, 24, 3), value, dtype=np.uint8)
+
+    def test_round_trip_in_order(self):
+        ring = EncodedFrameRing(3, "jpeg", quality=95)
+        for value in range(0, 250, 50):
+            ring.append(self.make_frame(value), float(value))
+
+        frames = list(ring.iter_frames())
+        self.assertEqual(len(frames), 3)
+        for frame, value in zip(frames, [100, 150, 200]):
+            self.assertEqual(frame.shape, (16, 24, 3))
+            self.assertLessEqual(abs(int(frame.mean()) - value), 2)
+        self.assertEqual(ring.ordered_timestamps().tolist(), [100.0, 150.0, 200.0])
+        self.assertEqual(ring.to_array().shape, (3, 16, 24, 3))
+
+    def test_duplicates_share_blob(self):
+        ring = EncodedFrameRing(3, "jpeg")
+        ring.append(self.make_frame(10), 0.0)
+        size = ring.nbytes
+        ring.commit_duplicate(1.0)
+
+        self.assertEqual(ring.nbytes, size)
+        self.assertEqual(len(list(ring.iter_frames())), 2)
+
+    def test_webp_storage(self):
+        ring = EncodedFrameRing(2, "webp", quality=50)
+        ring.append(self.make_frame(80), 0.0)
+        self.assertEqual(next(ring.iter_frames()).shape, (16, 24, 3))
+
+    def test_storage_report(self):
+        ring = EncodedFrameRing(4, "jpeg")
+        for value in range(4):
+            ring.append(self.make_frame(value), float(value))
+
+        report = ring.storage_report()
+        self.assertEqual(report["mode"], "jpeg")
+        self.assertEqual(report["frames"], 4)
+        self.assertEqual(report["raw_bytes"], 4 * 16 * 24 * 3)
+        self.assertLess(report["stored_bytes"], report["raw_bytes"])
+        self.assertGreater(report["compression_ratio"], 1.0)
+
+    def test_invalid_settings(self):
+        with self.assertRaises(ValueError):
+            EncodedFrameRing(2, "gif")
+        with self.assertRaises(ValueError):
+            EncodedFrameRing(2, "jpeg", quality=101)
+
+    def test_make_frame_ring(self):
+        self.assertIsInstance(make_frame_ring(2), FrameRing)
+        self.assertIsInstance(make_frame_ring(2, "webp"), EncodedFrameRing)
+
+
+class TestResamplePositions(unittest.TestCase):
+
+    def test_regular_capture_is_unchanged(self):
+        timestamps = np.arange(10) / 5.0
+        self.assertEqual(resample_positions(timestamps, 5).tolist(), list(range(10)))
+
+    def test_slow_capture_holds_frames(self):
+        # Captured at 2.5 fps, exported at 5 fps: every frame is shown twice
+        timestamps = np.arange(4) * 0.4
+        self.assertEqual(resample_positions(timestamps, 5).tolist(), [0, 0, 1, 1, 2, 2, 3])
+
+    def test_fast_capture_drops_frames(self):
+        timestamps = np.arange(9) * 0.1
+        self.assertEqual(resample_positions(timestamps, 5).tolist(), [0, 2, 4, 6, 8])
+
+    def test_window(self):
+        timestamps = np.arange(10) / 5.0
+        self.assertEqual(resample_positions(timestamps, 5, 0.4, 1.0).tolist(), [2, 3, 4, 5])
+
+    def test_iter_frames_with_positions(self):
+        ring = FrameRing(3)
+        for value in range(3):
+            ring.append(np.full((2, 2, 3), value, dtype=np.uint8), float(value))
+        self.assertEqual([int(f[0, 0, 0]) for f in ring.iter_frames(np.array([0, 0, 2]))], [0, 0, 2])
+
+    def test_empty(self):
+        self.assertEqual(len(resample_positions(np.empty(0), 5)), 0)
+
+
+class TestRingSnapshot(unittest.TestCase):
+
+    def make_frame(self, value):
+        return np.full((4, 6, 3), value, dtype=np.uint8)
+
+    def test_raw_snapshot_reads_frames(self):
+        ring = FrameRing(3)
+        for value in range(4):
+            ring.append(self.make_frame(value), float(value))
+        snapshot = ring.snapshot()
+
+        self.assertEqual(snapshot.timestamps.tolist(), [1.0, 2.0, 3.0])
+        self.assertEqual([int(frame[0, 0, 0]) for frame in snapshot.iter_frames()], [1, 2, 3])
+        self.assertEqual(snapshot.lost_frames, 0)
+
+    def test_raw_snapshot_detects_overwritten_slot(self):
+        ring = FrameRing(3)
+        for value in range(3):
+            ring.append(self.make_frame(value), float(value))
+        snapshot = ring.snapshot()
+        ring.append(self.make_frame(9), 3.0)  # Overwrites the oldest frame after the snapshot
+
+        frames = [int(frame[0, 0, 0]) for frame in snapshot.iter_frames()]
+        self.assertEqual(frames, [1, 2])
+        self.assertEqual(snapshot.lost_frames, 1)
+
+    def test_slot_being_written_is_excluded(self):
+        ring = FrameRing(2)
+        for value in range(2):
+            ring.append(self.make_frame(value), float(value))
+        slot = ring.next_slot((4, 6, 3))  # Writer has claimed the oldest slot but not committed
+        snapshot = ring.snapshot()
+        slot[:] = 7
+        ring.commit(2.0)
+
+        self.assertEqual([int(frame[0, 0, 0]) for frame in snapshot.iter_frames()], [1])
+        self.assertEqual(snapshot.lost_frames, 1)
+
+    def test_encoded_snapshot_is_immutable(self):
+        ring = EncodedFrameRing(2, "jpeg", quality=95)
+        ring.append(self.make_frame(50), 0.0)
+        ring.append(self.make_frame(100), 1.0)
+        snapshot = ring.snapshot()
+        ring.append(self.make_frame(200), 2.0)
+
+        means = [int(frame.mean()) for frame in snapshot.iter_frames()]
+        self.assertEqual(len(means), 2)
+        self.assertLessEqual(abs(means[0] - 50), 2)
+        self.assertEqual(snapshot.to_array().shape, (2, 4, 6, 3))
+
+    def test_audio_snapshot_trims_overwritten_samples(self):
+        ring = AudioRing(6)
+        ring.write(np.arange(6, dtype=np.int16))
+        snapshot = ring.snapshot()
+        ring.write(np.array([100, 101], dtype=np.int16))
+
+        self.assertEqual(snapshot.to_array().ravel().tolist(), [2, 3, 4, 5])
+        self.assertEqual(snapshot.trimmed_samples, 2)
+
+    def test_audio_snapshot_uses_free_space_first(self):
+        ring = AudioRing(6)
+        ring.write(np.arange(3, dtype=np.int16))
+        snapshot = ring.snapshot()
+        ring.write(np.array([100, 101], dtype=np.int16))
+
+        self.assertEqual(snapshot.to_array().ravel().tolist(), [0, 1, 2])
+
+    def test_audio_time_window(self):
+        ring = AudioRing(10)
+        ring.write(np.arange(1, 6, dtype=np.int16), timestamp=100.0)
+        ring.write(np.arange(6, 11, dtype=np.int16), timestamp=100.5)
+        snapshot = ring.snapshot()
+
+        self.assertEqual(snapshot.time_range(10), (100.0, 101.0))
+        self.assertEqual(snapshot.time_window(100.2, 100.5, 10).ravel().tolist(), [3, 4, 5])
+        # Parts of the window outside the snapshot are silence
+        self.assertEqual(snapshot.time_window(99.8, 100.1, 10).ravel().tolist(), [0, 0, 1])
+        self.assertEqual(snapshot.time_window(100.9, 101.2, 10).ravel().tolist(), [10, 0, 0])
+
+    def test_audio_time_window_after_wraparound(self):
+        ring = AudioRing(4)
+        for block in range(3):
+            ring.write(np.arange(block * 2, block * 2 + 2, dtype=np.int16), timestamp=10.0 + block * 0.2)
+        snapshot = ring.snapshot()
+
+        start, end = snapshot.time_range(10)
+        self.assertAlmostEqual(start, 10.2)
+        self.assertAlmostEqual(end, 10.6)
+        self.assertEqual(snapshot.time_window(10.2, 10.6, 10).ravel().tolist(), [2, 3, 4, 5])
+
+    def test_audio_without_timestamps(self):
+        ring = AudioRing(4)
+        ring.write(np.arange(2, dtype=np.int16))
+        self.assertIsNone(ring.snapshot().time_range(10))
+        with self.assertRaises(ValueError):
+            ring.snapshot().time_window(0.0, 1.0, 10)
+
+
+class TestAudioRing(unittest.TestCase):
+
+    def test_capacity_is_in_samples(self):
+        ring = AudioRing(10)
+        for _ in range(20):
+            ring.write(np.arange(4, dtype=np.int16))
+        self.assertEqual(len(ring), 10)
+        self.assertEqual(ring.nbytes, 10 * 2)
+        self.assertEqual(ring.total_written, 80)
+
+    def test_wraparound_keeps_newest_samples_in_order(self):
+        ring = AudioRing(5)
+        ring.write(np.arange(0, 3, dtype=np.int16))
+        ring.write(np.arange(3, 7, dtype=np.int16))
+        self.assertEqual(ring.to_array().ravel().tolist(), [2, 3, 4, 5, 6])
+
+        older, newer = ring.slices()
+        self.assertEqual(np.concatenate([older, newer]).ravel().tolist(), [2, 3, 4, 5, 6])
+
+    def test_partial_fill(self):
+        ring = AudioRing(8)
+        ring.write(np.array([1, 2, 3], dtype=np.int16))
+        self.assertEqual(ring.to_array().ravel().tolist(), [1, 2, 3])
+
+    def test_write_larger_than_capacity(self):
+        ring = AudioRing(4)
+        ring.write(np.arange(10, dtype=np.int16))
+        self.assertEqual(ring.to_array().ravel().tolist(), [6, 7, 8, 9])
+
+    def test_stereo_samples(self):
+        ring = AudioRing(3, channels=2)
+        ring.write(np.arange(8, dtype=np.int16))
+        self.assertEqual(ring.to_array().tolist(), [[2, 3], [4, 5], [6, 7]])
+
+
+class TestSharedRings(unittest.TestCase):
+
+    def test_attached_frame_ring_sees_writes(self):
+        ring = SharedFrameRing(3, (4, 6, 3))
+        attached = pickle.loads(pickle.dumps(ring))
+        try:
+            for value in range(4):
+                ring.append(np.full((4, 6, 3), value, dtype=np.uint8), float(value))
+            ring.commit_duplicate(4.0)
+
+            self.assertEqual(attached.name, ring.name)
+            self.assertEqual([int(frame[0, 0, 0]) for frame in attached.iter_frames()], [2, 3, 3])
+            self.assertEqual(attached.ordered_timestamps().tolist(), [2.0, 3.0, 4.0])
+            self.assertTrue(np.shares_memory(next(attached.iter_frames()), attached.frames))
+            self.assertEqual(attached.snapshot().lost_frames, 0)
+        finally:
+            attached.close()
+            ring.close()
+            ring.unlink()
+
+    def test_frame_shape_is_fixed(self):
+        ring = SharedFrameRing(2, (4, 6, 3))
+        try:
+            with self.assertRaises(ValueError):
+                ring.append(np.zeros((2, 2, 3), dtype=np.uint8), 0.0)
+        finally:
+            ring.close()
+            ring.unlink()
+
+    def test_detach_copies_the_ring(self):
+        ring = SharedFrameRing(3, (4, 6, 3))
+        for value in range(4):
+            ring.append(np.full((4, 6, 3), value, dtype=np.uint8), float(value))
+        detached = ring.detach()
+        ring.close()
+        ring.unlink()
+        self.assertIsInstance(detached, FrameRing)
+        self.assertEqual([int(frame[0, 0, 0]) for frame in detached.iter_frames()], [1, 2, 3])
+        detached.append(np.full((4, 6, 3), 9, dtype=np.uint8), 4.0)
+        self.assertEqual(detached.ordered_timestamps().tolist(), [2.0, 3.0, 4.0])
+
+    def test_attached_audio_ring_sees_writes(self):
+        ring = SharedAudioRing(5)
+        attached = pickle.loads(pickle.dumps(ring))
+        try:
+            self.assertIsNone(attached.anchor_time)
+            ring.write(np.arange(7, dtype=np.int16), timestamp=3.0)
+
+            self.assertEqual(attached.to_array().ravel().tolist(), [2, 3, 4, 5, 6])
+            self.assertEqual(attached.snapshot().time_range(10), (3.2, 3.7))
+        finally:
+            attached.close()
+            ring.close()
+            ring.unlink()
+
+    def test_detach_copies_the_audio_ring(self):
+        ring = SharedAudioRing(5)
+        ring.write(np.arange(7, dtype=np.int16), timestamp=3.0)
+        detached = ring.detach()
+        ring.close()
+        ring.unlink()
+        self.assertIsInstance(detached, AudioRing)
+        self.assertEqual(detached.to_array().ravel().tolist(), [2, 3, 4, 5, 6])
+        self.assertEqual(detached.snapshot().time_range(10), (3.2, 3.7))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import io
+import os
+import unittest
+import sys
+import wave
+import cv2
+import numpy as np
+# Adjust the sys.path for the location of the python files
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from dependencies.recording_module import BufferSnapshot
+from dependencies.ring_buffer_module import AudioRing, FrameRing
+from dependencies.storyboard_module import (build_storyboard, encode_jpeg, resample_audio, scene_scores,
+                                            select_keyframes)
+
+
+class TestSelectKeyframes(unittest.TestCase):
+
+    def test_covers_the_window(self):
+        timestamps = np.arange(100) / 10
+        scores = np.where(np.arange(100) % 7 == 0, 0.5, 0.0)
+        picks = select_keyframes(timestamps, scores, 5)
+        self.assertEqual(len(picks), 5)
+        # One pick per fifth of the window
+        np.testing.assert_array_equal(np.floor(timestamps[picks] / 2), np.arange(5))
+
+    def test_prefers_scene_changes(self):
+        scores = np.zeros(40)
+        scores[[0, 13, 31]] = [1.0, 0.3, 0.6]
+        picks = select_keyframes(np.arange(40.0), scores, 2)
+        self.assertEqual(picks.tolist(), [0, 31])
+
+    def test_static_screen_yields_one_frame(self):
+        scores = np.zeros(50)
+        scores[0] = 1.0
+        self.assertEqual(select_keyframes(np.arange(50.0), scores, 8).tolist(), [0])
+
+    def test_empty(self):
+        self.assertEqual(len(select_keyframes(np.empty(0), np.empty(0), 8)), 0)
+
+
+class TestEncodeJpeg(unittest.TestCase):
+
+    def test_fits_the_budget(self):
+        frame = np.random.default_rng(0).integers(0, 256, (720, 1280, 3), dtype=np.uint8)
+        jpeg = encode_jpeg(frame, max_dimension=640, target_bytes=30_000)
+        self.assertLessEqual(len(jpeg), 30_000)
+        image = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+        self.assertLessEqual(max(image.shape[:2]), 640)
+
+    def test_bgra_frames(self):
+        jpeg = encode_jpeg(np.zeros((48, 64, 4), dtype=np.uint8))
+        self.assertEqual(cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR).shape, (48, 64, 3))
+
+
+class TestStoryboard(unittest.TestCase):
+
+    def make_snapshot(self):
+        ring = FrameRing(50)
+        for index in range(50):
+            frame = np.zeros((48, 64, 3), dtype=np.uint8)
+            frame[:, :, 1] = (index // 10) * 50  # A new scene every second
+            ring.append(frame, 100 + index / 10)
+        audio = AudioRing(8000 * 6)
+        audio.write(np.ones(8000 * 6, dtype=np.int16), timestamp=99.5)
+        return BufferSnapshot([ring.snapshot()], [10], audio.snapshot(), 8000)
+
+    def test_scene_scores(self):
+        scores = scene_scores(self.make_snapshot().video)
+        self.assertEqual(np.flatnonzero(scores).tolist(), [0, 10, 20, 30, 40])
+
+    def test_build(self):
+        storyboard = build_storyboard(self.make_snapshot(), count=5)
+        self.assertEqual([seconds for seconds, _ in storyboard.frames], [0.0, 1.0, 2.0, 3.0, 4.0])
+        self.assertAlmostEqual(storyboard.duration, 5.0)
+        self.assertEqual(len(storyboard.audio), 1)
+        seconds, wav = storyboard.audio[0]
+        self.assertEqual(seconds, 0.0)
+        with wave.open(io.BytesIO(wav), 'rb') as wf:
+            self.assertEqual(wf.getframerate(), 16000)
+            self.assertEqual(wf.getnframes(), 5 * 16000)
+        self.assertEqual(storyboard.payload_bytes,
+                         sum(len(jpeg) for _, jpeg in storyboard.frames) + len(wav))
+
+    def test_without_audio(self):
+        self.assertEqual(build_storyboard(self.make_snapshot(), count=3, audio=False).audio, [])
+
+    def test_silent_audio_is_left_out(self):
+        storyboard = build_storyboard(self.make_snapshot(), count=3, silence="drop", min_speech_ratio=0.1)
+        self.assertEqual(storyboard.audio, [])
+        self.assertEqual(storyboard.speech_ratio, 0.0)
+
+    def test_window_is_limited_to_the_video_duration(self):
+        # A ring sized for 5 fps over 30 s holds 300 s of frames captured at 0.5 fps
+        ring = FrameRing(150)
+        for index in range(150):
+            ring.append(np.full((48, 64, 3), index, dtype=np.uint8), index * 2.0)
+        audio = AudioRing(8000 * 30)
+        audio.write(np.ones(8000 * 30, dtype=np.int16), timestamp=270.0)
+        storyboard = build_storyboard(BufferSnapshot([ring.snapshot()], [5], audio.snapshot(), 8000, 30), count=4)
+        self.assertAlmostEqual(storyboard.duration, 30.0)
+        self.assertTrue(all(0 <= seconds < 30 for seconds, _ in storyboard.frames))
+        with wave.open(io.BytesIO(storyboard.audio[0][1]), 'rb') as wf:
+            self.assertEqual(wf.getnframes(), 30 * 16000)
+
+
+class TestResampleAudio(unittest.TestCase):
+
+    def test_length_and_mono(self):
+        stereo = np.ones((44100, 2), dtype=np.int16)
+        resampled = resample_audio(stereo, 44100, 16000)
+        self.assertEqual(resampled.shape, (16000,))
+        self.assertTrue(np.all(resampled == 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import os
+import unittest
+import sys
+import numpy as np
+# Adjust the sys.path for the location of the python files
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from dependencies.vad_module import frame_features, mute_silence, speech_clips, speech_ratio, speech_segments
+
+RATE = 16000
+
+
+def room_noise(seconds, seed=0):
+    return np.random.default_rng(seed).normal(0, 30, int(seconds * RATE)).astype(np.int16)
+
+
+def add_tone(samples, start, end, amplitude=4000):
+    t = np.arange(int((end - start) * RATE)) / RATE
+    samples[int(start * RATE):int(end * RATE)] += (np.sin(2 * np.pi * 180 * t) * amplitude).astype(np.int16)
+
+
+class TestFrameFeatures(unittest.TestCase):
+
+    def test_energy_and_zero_crossings(self):
+        t = np.arange(RATE) / RATE
+        tone = (np.sin(2 * np.pi * 1000 * t) * 16384).astype(np.int16)
+        energy, zcr, frame_length = frame_features(tone, RATE, frame_ms=20)
+        self.assertEqual(frame_length, 320)
+        self.assertEqual(len(energy), 50)
+        np.testing.assert_allclose(energy, -9.0, atol=0.2)  # Half-scale sine: -6 dB peak, -3 dB for RMS
+        np.testing.assert_allclose(zcr, 2000 / RATE, atol=0.01)
+
+    def test_stereo_is_averaged(self):
+        stereo = np.zeros((RATE, 2), dtype=np.int16)
+        self.assertEqual(len(frame_features(stereo, RATE)[0]), 50)
+
+
+class TestSpeechSegments(unittest.TestCase):
+
+    def test_finds_padded_speech(self):
+        samples = room_noise(10)
+        add_tone(samples, 2, 4)
+        add_tone(samples, 7, 7.5)
+        spans = speech_segments(samples, RATE, padding_ms=200) / RATE
+        np.testing.assert_allclose(spans, [[1.8, 4.2], [6.8, 7.7]], atol=0.03)
+        self.assertAlmostEqual(speech_ratio(speech_segments(samples, RATE), len(samples)), 0.33, places=2)
+
+    def test_short_pauses_merge(self):
+        samples = room_noise(4)
+        add_tone(samples, 1, 1.5)
+        add_tone(samples, 1.7, 2.2)
+        self.assertEqual(len(speech_segments(samples, RATE, padding_ms=150)), 1)
+
+    def test_silence_and_noise_hold_no_speech(self):
+        self.assertEqual(len(speech_segments(np.zeros(RATE, dtype=np.int16), RATE)), 0)
+        self.assertEqual(len(speech_segments(room_noise(5), RATE)), 0)
+
+    def test_continuous_speech(self):
+        samples = room_noise(3)
+        add_tone(samples, 0, 3)
+        self.assertEqual(speech_segments(samples, RATE).tolist(), [[0, len(samples)]])
+
+
+class TestTrimming(unittest.TestCase):
+
+    def setUp(self):
+        self.samples = room_noise(6)
+        add_tone(self.samples, 3, 4)
+        self.spans = speech_segments(self.samples, RATE)
+
+    def test_mute_keeps_alignment(self):
+        muted = mute_silence(self.samples, self.spans)
+        self.assertEqual(len(muted), len(self.samples))
+        self.assertFalse(muted[:2 * RATE].any())
+        np.testing.assert_array_equal(muted[3 * RATE:4 * RATE], self.samples[3 * RATE:4 * RATE])
+
+    def test_clips_carry_their_offsets(self):
+        clips = speech_clips(self.samples, self.spans, RATE)
+        self.assertEqual(len(clips), 1)
+        seconds, clip = clips[0]
+        self.assertAlmostEqual(seconds, 2.8, places=2)
+        np.testing.assert_array_equal(clip, self.samples[self.spans[0, 0]:self.spans[0, 1]])
+
+
+if __name__ == '__main__':
+    unittest.main()